@@ -0,0 +1,83 @@
+"""
+Benchmark: HGVS parsing over every variant name in the CIViC export
+Times parse() one name at a time and parse_many() over the whole column,
+and lists the most common names the grammar does not recognise
+
+Usage:
+    python3 scripts/benchmark_hgvs_parsing.py [--data-file export.xlsx] [--column variant_names]
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.normalizers.hgvs_parser import parse, parse_many
+
+DATA_FILE = ROOT.parent / "all_combined_extracted_data_with_source_counts.xlsx"
+
+
+def load_names(data_file: Path, column: str):
+    """Every name in the column; cells hold comma-delimited lists"""
+    df = pd.read_excel(data_file)
+    names = []
+    for cell in df[column].dropna():
+        names.extend(name.strip() for name in str(cell).split(",") if name.strip())
+    return names
+
+
+def best_of(repeat: int, function, *args):
+    """Return (best wall-clock seconds, result) over `repeat` runs"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--data-file", default=str(DATA_FILE))
+    arg_parser.add_argument("--column", default="variant_names")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    names = load_names(Path(args.data_file), args.column)
+    distinct = list(dict.fromkeys(names))
+
+    one_s, _ = best_of(args.repeat, lambda: [parse(name) for name in names])
+    many_s, parsed = best_of(args.repeat, parse_many, names)
+
+    print("=" * 80)
+    print(f"HGVS PARSE BENCHMARK ({args.column}, best of {args.repeat})")
+    print("=" * 80)
+    print(f"Names: {len(names):,} ({len(distinct):,} distinct)")
+    print(f"Parsed: {sum(v is not None for v in parsed):,} "
+          f"({sum(v is not None for v in parsed) / max(len(names), 1):.1%})")
+    print(f"parse() per name:   {one_s / len(names) * 1e6:8.2f} µs "
+          f"({len(names) / one_s:,.0f} names/s)")
+    print(f"parse_many() column: {many_s * 1e3:7.2f} ms "
+          f"({len(names) / many_s:,.0f} names/s)")
+
+    print("-" * 80)
+    print("Variant types:")
+    for variant_type, count in Counter(v.variant_type for v in parsed if v).most_common():
+        print(f"  {str(variant_type):<14}{count:>8,}")
+    print("Most common unparsed names:")
+    unparsed = Counter(name for name, v in zip(names, parsed) if v is None)
+    for name, count in unparsed.most_common(15):
+        print(f"  {name:<40}{count:>8,}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: serial vs process-pool OBO parsing
+Parses each of the five Tier 2 ontologies both ways and checks they agree
+
+Usage:
+    python3 scripts/benchmark_obo_parsing.py [--ontology-dir data/ontologies] [--workers N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.normalizers.local_ontology_parsers import OBOParser
+
+ONTOLOGY_FILES = ["doid.obo", "so.obo", "go.obo", "hp.obo", "mondo.obo"]
+
+
+def time_parse(filepath: Path, workers: int, repeat: int):
+    """Return (best wall-clock seconds, parser) over `repeat` runs"""
+    best = None
+    parser = None
+    for _ in range(repeat):
+        parser = OBOParser(str(filepath))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser.parse(workers=workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, parser
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--ontology-dir", default="data/ontologies")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    ontology_dir = Path(args.ontology_dir)
+
+    print("=" * 80)
+    print(f"OBO PARSE BENCHMARK (serial vs {args.workers} workers, best of {args.repeat})")
+    print("=" * 80)
+    print(f"{'file':<12}{'MB':>8}{'terms':>10}{'serial s':>12}{'parallel s':>12}{'speedup':>10}")
+    print("-" * 80)
+
+    for filename in ONTOLOGY_FILES:
+        filepath = ontology_dir / filename
+        if not filepath.exists():
+            print(f"{filename:<12}  not found, skipping")
+            continue
+
+        serial_s, serial = time_parse(filepath, 1, args.repeat)
+        parallel_s, parallel = time_parse(filepath, args.workers, args.repeat)
+
+        if (list(serial.terms) != list(parallel.terms)
+                or serial.name_to_id != parallel.name_to_id
+                or serial.synonym_to_id != parallel.synonym_to_id):
+            print(f"❌ {filename}: parallel result differs from serial result")
+            sys.exit(1)
+
+        size_mb = filepath.stat().st_size / 1e6
+        print(f"{filename:<12}{size_mb:>8.1f}{len(serial.terms):>10,}"
+              f"{serial_s:>12.3f}{parallel_s:>12.3f}{serial_s / parallel_s:>9.2f}x")
+
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -78,15 +78,14 @@ else
 fi
 echo ""
 
-# 6. ClinVar (Variant Summary) - ~1 GB compressed
+# 6. ClinVar (Variant Summary) - kept gzip-compressed; the database
+#    builder streams .gz input directly
 echo "[6/6] Downloading ClinVar Variant Summary..."
-if [ ! -f "clinvar_summary.txt" ]; then
+if [ ! -f "clinvar_summary.txt.gz" ] && [ ! -f "clinvar_summary.txt" ]; then
     echo "⏳ This may take a few minutes (downloading ~1 GB)..."
     wget -q --show-progress -O clinvar_summary.txt.gz \
         https://ftp.ncbi.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz
-    echo "📦 Decompressing ClinVar..."
-    gunzip clinvar_summary.txt.gz
-    echo "✅ ClinVar downloaded and decompressed successfully"
+    echo "✅ ClinVar downloaded successfully"
 else
     echo "⏭️  ClinVar already exists, skipping"
 fi
@@ -116,7 +115,7 @@ du -h so.obo 2>/dev/null      || echo "  so.obo: not found"
 du -h go.obo 2>/dev/null      || echo "  go.obo: not found"
 du -h hp.obo 2>/dev/null      || echo "  hp.obo: not found"
 du -h mondo.obo 2>/dev/null   || echo "  mondo.obo: not found"
-du -h clinvar_summary.txt 2>/dev/null || echo "  clinvar_summary.txt: not found"
+du -h clinvar_summary.txt.gz 2>/dev/null || du -h clinvar_summary.txt 2>/dev/null || echo "  clinvar_summary.txt.gz: not found"
 echo ""
 
 echo "Total Size:"
@@ -0,0 +1,393 @@
+"""
+HGVS Variant Parser for OncoCITE Tier 2 Normalization
+Parses protein, cDNA and genomic variant descriptions with precompiled grammars
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# ============================================================================
+# GRAMMAR
+# ============================================================================
+
+AA3_TO_1 = {
+    "Ala": "A", "Arg": "R", "Asn": "N", "Asp": "D", "Cys": "C",
+    "Gln": "Q", "Glu": "E", "Gly": "G", "His": "H", "Ile": "I",
+    "Leu": "L", "Lys": "K", "Met": "M", "Phe": "F", "Pro": "P",
+    "Ser": "S", "Thr": "T", "Trp": "W", "Tyr": "Y", "Val": "V",
+    "Sec": "U", "Pyl": "O", "Ter": "*",
+}
+AA1_TO_3 = {one: three for three, one in AA3_TO_1.items()}
+
+# One residue token: a three-letter code, a one-letter code, or a stop
+# ("*", or the legacy "X" still common in CIViC names such as R213X).
+# Matched by shape and checked against _RESIDUES afterwards, which is
+# several times faster than an alternation of the 23 codes
+_AA = r"(?:[A-Z][a-z]{2}|[A-Z*])"
+_AA_TOKEN_RE = re.compile(_AA)
+_TER = r"(?:Ter|\*|X)"
+
+# Optional reference sequence (NM_005228.5, NC_000007.14, ENST00000275493.7)
+# with its gene in brackets, or a bare gene symbol ("BRAF V600E"), then the
+# coordinate type
+_PREFIX_RE = re.compile(r"""
+    (?:
+        (?P<accession>[A-Z]{2}_\d+(?:\.\d+)?|ENS[A-Z]*\d+(?:\.\d+)?)
+        (?:\((?P<accession_gene>[^()\s]+)\))?:
+      | (?P<gene>[A-Z][A-Z0-9-]*)(?:\s+|:(?=[cgmnp]\.))
+    )?
+    (?:(?P<level>[cgmnp])\.)?
+""", re.X)
+
+_PROTEIN_RE = re.compile(rf"""
+    (?P<ref>{_AA})(?P<start>\d+)
+    (?:_(?P<end_ref>{_AA})(?P<end>\d+))?
+    (?:
+        (?P<fs_alt>{_AA})?(?P<fs>fs)(?:{_TER}(?P<fs_ter>\d+|\?)?)?
+      | (?P<ext_alt>{_AA})?(?P<ext>ext)(?:{_TER}?(?P<ext_ter>-?\d+|\?))?
+      | (?P<edit>delins|del|dup|ins)(?P<seq>{_AA}+)?
+      | (?P<same>=)
+      | (?P<unknown>\?)
+      | (?P<alt>{_AA})
+    )?
+""", re.X)
+
+_NUCLEOTIDE_RE = re.compile(r"""
+    (?P<start>-?\d+)(?P<start_offset>[+-]\d+)?
+    (?:_(?P<end>-?\d+)(?P<end_offset>[+-]\d+)?)?
+    (?:
+        (?P<ref>[ACGTN]+)>(?P<alt>[ACGTN]+)
+      | (?P<edit>delins|del|dup|ins|inv)(?P<seq>[ACGTN]+|\d+)?
+      | (?P<same>=)
+    )
+""", re.X)
+
+# chr7:55249071A>G, chr7:55249071 A>G, 7:55249071A>G, chrX:g.73103A>G
+_CHROMOSOME_RE = re.compile(
+    r"(?P<chr>chr)?(?P<chromosome>\d{1,2}|X|Y|MT?):(?:g\.)?(?P<start>\d+)\s*"
+    r"(?P<ref>[ACGTN]+)\s*>\s*(?P<alt>[ACGTN]+)", re.I)
+
+# RefSeq chromosome accessions: NC_000001-NC_000024, NC_012920 (mitochondrion)
+_REFSEQ_CHROMOSOMES = {f"NC_{number:06d}": str(number) for number in range(1, 23)}
+_REFSEQ_CHROMOSOMES.update({"NC_000023": "X", "NC_000024": "Y", "NC_012920": "MT"})
+
+_NUCLEOTIDE_LEVELS = ("c", "g", "m", "n")
+_EDITS_NEEDING_SEQUENCE = ("ins", "delins")
+
+# HGVS keyword <-> edit name; these edits are also their own variant type
+_EDIT_NAMES = {
+    "del": "deletion", "ins": "insertion", "delins": "delins",
+    "dup": "duplication", "inv": "inversion",
+}
+_EDIT_KEYWORDS = {name: keyword for keyword, name in _EDIT_NAMES.items()}
+
+
+
+# Residue token -> one-letter code, for every token _AA matches
+_RESIDUES = dict(AA3_TO_1, X="*")
+_RESIDUES.update((one, one) for one in AA1_TO_3)
+
+
+def _residues(text: Optional[str]) -> Optional[str]:
+    """
+    'LeuArg' / 'LR' / 'X' -> one-letter residues ('*' for stops)
+
+    Raises KeyError for a token that is not a residue (e.g. 'B', 'Foo')
+    """
+    if text is None:
+        return None
+    residue = _RESIDUES.get(text)
+    if residue is not None:
+        return residue
+    return "".join(_RESIDUES[token] for token in _AA_TOKEN_RE.findall(text))
+
+
+# ============================================================================
+# PARSED VARIANT
+# ============================================================================
+
+class HGVSVariant:
+    """
+    One parsed variant description
+
+    level is the HGVS coordinate type ("p", "c", "g", "n" or "m"); bare
+    protein changes such as V600E parse as "p". Positions are integers:
+    codons for proteins, bases otherwise, with intronic offsets (c.1234+5)
+    kept apart. Protein residues are stored as one-letter codes with "*"
+    for stop, whatever notation the input used.
+    """
+
+    __slots__ = ("text", "gene", "accession", "chromosome", "level", "start", "end",
+                 "start_offset", "end_offset", "ref", "end_ref", "alt", "edit", "ter")
+
+    def __init__(self, text: str, level: str, start: int, end: Optional[int] = None,
+                 edit: Optional[str] = None, ref: Optional[str] = None,
+                 alt: Optional[str] = None, end_ref: Optional[str] = None,
+                 start_offset: int = 0, end_offset: Optional[int] = None,
+                 ter: Optional[int] = None, gene: Optional[str] = None,
+                 accession: Optional[str] = None, chromosome: Optional[str] = None):
+        self.text = text
+        self.gene = gene
+        self.accession = accession
+        self.chromosome = chromosome
+        self.level = level
+        self.start = start
+        self.start_offset = start_offset
+        if end is None:
+            self.end, self.end_offset = start, start_offset
+        else:
+            self.end, self.end_offset = end, end_offset or 0
+        self.ref = ref
+        self.end_ref = end_ref
+        self.alt = alt
+        self.edit = edit
+        self.ter = ter
+
+    @property
+    def variant_type(self) -> Optional[str]:
+        """
+        Consequence class: missense, nonsense, synonymous, frameshift,
+        stop_lost, start_lost, SNV, MNV, deletion, insertion, delins,
+        duplication or inversion (None for a bare position like V600)
+        """
+        edit = self.edit
+        if edit == "substitution":
+            if self.level != "p":
+                return "SNV" if len(self.alt) == 1 else "MNV"
+            if self.alt == self.ref:
+                return "synonymous"
+            return "nonsense" if self.alt == "*" else "missense"
+        if edit == "synonymous":
+            return "synonymous"
+        if edit == "frameshift":
+            return "frameshift"
+        if edit == "extension":
+            return "stop_lost" if self.ref == "*" else "start_lost"
+        return edit if edit in _EDIT_KEYWORDS else None
+
+    def format(self, three_letter: bool = False) -> str:
+        """
+        Canonical HGVS for the change itself (no reference or gene):
+        p.L858R or, with three_letter=True, p.Leu858Arg; c.2573T>G;
+        g.55191822_55191823insA
+        """
+        if self.level == "p":
+            return "p." + self._format_protein(three_letter)
+        position = self._position(self.start, self.start_offset)
+        if (self.end, self.end_offset) != (self.start, self.start_offset):
+            position += "_" + self._position(self.end, self.end_offset)
+        if self.edit == "substitution":
+            return f"{self.level}.{position}{self.ref}>{self.alt}"
+        if self.edit == "synonymous":
+            return f"{self.level}.{position}="
+        sequence = self.alt if self.edit in ("insertion", "delins") else ""
+        return f"{self.level}.{position}{_EDIT_KEYWORDS[self.edit]}{sequence}"
+
+    def _format_protein(self, three_letter: bool) -> str:
+        def residues(sequence):
+            if not three_letter:
+                return sequence
+            return "".join(AA1_TO_3.get(residue, residue) for residue in sequence)
+
+        text = f"{residues(self.ref)}{self.start}"
+        if self.end != self.start:
+            text += f"_{residues(self.end_ref)}{self.end}"
+        stop = residues("*")
+        edit = self.edit
+        if edit == "substitution":
+            return text + residues(self.alt)
+        if edit == "synonymous":
+            return text + "="
+        if edit == "unknown":
+            return text + "?"
+        if edit == "frameshift":
+            return (text + residues(self.alt or "") + "fs"
+                    + ("" if self.ter is None else f"{stop}{self.ter}"))
+        if edit == "extension":
+            if self.ter is None:
+                return text + residues(self.alt or "") + "ext"
+            marker = stop if self.ter > 0 else ""
+            return text + residues(self.alt or "") + f"ext{marker}{self.ter}"
+        if edit is None:
+            return text
+        return text + _EDIT_KEYWORDS[edit] + residues(self.alt or "")
+
+    @staticmethod
+    def _position(position: int, offset: int) -> str:
+        if not offset:
+            return str(position)
+        return f"{position}{offset:+d}"
+
+    def as_dict(self) -> Dict:
+        """Plain-dict form (JSON-serialisable) including variant_type"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields["variant_type"] = self.variant_type
+        return fields
+
+    def __eq__(self, other):
+        if not isinstance(other, HGVSVariant):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"HGVSVariant('{self.text}', {self.format()!r})"
+
+
+# ============================================================================
+# PARSER
+# ============================================================================
+
+def parse(text: str) -> Optional[HGVSVariant]:
+    """
+    Parse one variant description, or return None if it is not one
+
+    Accepts HGVS with or without a reference sequence and gene
+    (NM_005228.5(EGFR):c.2573T>G, p.(Leu858Arg)), CIViC-style protein
+    changes (BRAF V600E, E746_A750del, P95fs, R213X) and chromosome
+    positions (chr7:55249071A>G, 7:55249071 A>G).
+    """
+    text = text.strip()
+    if not text:
+        return None
+
+    if ":" in text:
+        match = _CHROMOSOME_RE.fullmatch(text)
+        if match:
+            _, chromosome, start, ref, alt = match.groups()
+            start, ref = int(start), ref.upper()
+            return HGVSVariant(text, "g", start, start + len(ref) - 1, "substitution",
+                               ref, alt.upper(), chromosome=chromosome.upper())
+
+    if text[1:2] == ".":
+        accession = accession_gene = gene = None
+        level, body = text[0], text[2:]
+    elif " " not in text and ":" not in text:
+        accession = accession_gene = gene = level = None
+        body = text
+    else:
+        prefix = _PREFIX_RE.match(text)
+        accession, accession_gene, gene, level = prefix.groups()
+        body = text[prefix.end():]
+    if body[:1] == "(" and body[-1:] == ")":
+        body = body[1:-1]   # predicted consequence, p.(Leu858Arg)
+
+    gene = accession_gene or gene
+    chromosome = _REFSEQ_CHROMOSOMES.get(accession.partition(".")[0]) if accession else None
+    if level is None or level == "p":
+        try:
+            return _parse_protein(text, body, gene, accession, chromosome)
+        except KeyError:    # shaped like a residue but is not one
+            return None
+    if level in _NUCLEOTIDE_LEVELS:
+        return _parse_nucleotide(text, level, body, gene, accession, chromosome)
+    return None
+
+
+def parse_many(texts: Iterable[Optional[str]]) -> List[Optional[HGVSVariant]]:
+    """
+    parse() over a column of descriptions, parsing each distinct one once
+
+    Missing values (None, NaN) parse as None. Repeated inputs share one
+    HGVSVariant, so treat results as read-only.
+    """
+    texts = list(texts)
+    parsed = {}
+    for text in texts:
+        if isinstance(text, str) and text not in parsed:
+            parsed[text] = parse(text)
+    return [parsed.get(text) if isinstance(text, str) else None for text in texts]
+
+
+def parse_clinvar_name(name: str) -> Tuple[Optional[HGVSVariant], Optional[HGVSVariant]]:
+    """
+    (nucleotide change, protein change) of a ClinVar variant Name
+
+    "NM_005228.5(EGFR):c.2573T>G (p.Leu858Arg)" gives the c. variant
+    (with its transcript and gene) and the p. variant; either is None
+    when missing or unparsable (copy-number names, for instance).
+    """
+    head, bracket, tail = name.partition(" (p.")
+    nucleotide = parse(head)
+    protein = None
+    if bracket and tail.endswith(")"):
+        protein = parse("p." + tail[:-1])
+        if protein is not None and nucleotide is not None:
+            protein.gene = nucleotide.gene
+    return nucleotide, protein
+
+
+def _parse_protein(text: str, body: str, gene: Optional[str], accession: Optional[str],
+                   chromosome: Optional[str]) -> Optional[HGVSVariant]:
+    match = _PROTEIN_RE.fullmatch(body)
+    if not match:
+        return None
+    (ref, start, end_ref, end, fs_alt, fs, fs_ter, ext_alt, ext, ext_ter,
+     keyword, sequence, same, unknown, alt) = match.groups()
+    start = int(start)
+    if end is not None:
+        end = int(end)
+        # A range must run forwards and carry a range edit (E746_A750del)
+        if end <= start or keyword is None:
+            return None
+
+    ref = _residues(ref)
+    ter = None
+    if alt:
+        edit, alt = "substitution", _residues(alt)
+    elif keyword:
+        if keyword in _EDITS_NEEDING_SEQUENCE and not sequence:
+            return None
+        edit, alt = _EDIT_NAMES[keyword], _residues(sequence)
+    elif fs:
+        edit, alt, ter = "frameshift", _residues(fs_alt), _count(fs_ter)
+    elif ext:
+        edit, alt, ter = "extension", _residues(ext_alt), _count(ext_ter)
+    elif same:
+        edit, alt = "synonymous", ref
+    elif unknown:
+        edit = "unknown"
+    else:
+        edit = None     # a bare position, V600
+    return HGVSVariant(text, "p", start, end, edit, ref, alt, _residues(end_ref),
+                       0, None, ter, gene, accession, chromosome)
+
+
+def _parse_nucleotide(text: str, level: str, body: str, gene: Optional[str],
+                      accession: Optional[str], chromosome: Optional[str]) -> Optional[HGVSVariant]:
+    match = _NUCLEOTIDE_RE.fullmatch(body)
+    if not match:
+        return None
+    start, start_offset, end, end_offset, ref, alt, keyword, sequence, same = match.groups()
+    start = int(start)
+    start_offset = int(start_offset) if start_offset else 0
+    if end is not None:
+        end = int(end)
+        end_offset = int(end_offset) if end_offset else 0
+        if (end, end_offset) < (start, start_offset):
+            return None
+
+    if alt:
+        edit = "substitution"
+        if end is None and len(ref) > 1:
+            end, end_offset = start + len(ref) - 1, start_offset
+    elif same:
+        edit = "synonymous"
+    else:
+        has_sequence = sequence is not None and sequence.isalpha()
+        if keyword in _EDITS_NEEDING_SEQUENCE:
+            if not has_sequence:
+                return None
+            alt = sequence
+        elif has_sequence:
+            ref = sequence      # c.2235_2249delGGAATTAAGAGAAGC
+        edit = _EDIT_NAMES[keyword]
+    return HGVSVariant(text, level, start, end, edit, ref, alt, None,
+                       start_offset, end_offset, None, gene, accession, chromosome)
+
+
+def _count(text: Optional[str]) -> Optional[int]:
+    """'23' -> 23, '-5' -> -5, '?' or missing -> None"""
+    return int(text) if text and text != "?" else None
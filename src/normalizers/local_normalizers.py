@@ -3,38 +3,1078 @@ Local Normalizer Agents for OncoCITE Tier 2
 Uses local ontology databases instead of API calls
 """
 
+import os
+import sys
+import json
+import bisect
 import sqlite3
+import string
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 import re
 
+import numpy as np
+
+try:
+    from . import hgvs_parser
+except ImportError:     # run as a script from src/normalizers
+    import hgvs_parser
+
+
+# ============================================================================
+# CONNECTION MANAGER
+# ============================================================================
+
+# Memory-map up to 256 MB of the database file (the built DB is ~110 MB)
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+class ConnectionManager:
+    """
+    Process-wide pool of read-only SQLite connections
+
+    Connections are opened once per (thread, database file) with
+    `mode=ro&immutable=1` (no locking or change detection) and memory-mapped
+    I/O, then reused by every normalizer on that thread. The file's size
+    and mtime are part of the key, so a rebuilt database gets a fresh
+    connection instead of an immutable view of the old file, and the
+    thread's connection to the old file is closed. After a fork the child
+    opens its own connections.
+    """
+
+    def __init__(self, mmap_size: int = MMAP_SIZE):
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened: List[sqlite3.Connection] = []
+        self._resolved: Dict[Path, str] = {}
+        self._pid = os.getpid()
+
+    def get(self, db_path: Path) -> sqlite3.Connection:
+        """Return this thread's connection to db_path, opening it on first use"""
+        resolved = self._resolved.get(db_path)
+        if resolved is None:
+            resolved = self._resolved[db_path] = str(db_path.resolve())
+        stat = os.stat(resolved)
+        key = (resolved, stat.st_size, stat.st_mtime_ns)
+
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+            self._local.fingerprints = {}
+
+        conn = connections.get(key)
+        if conn is None:
+            for stale in [other for other in connections if other[0] == resolved]:
+                self._discard(connections.pop(stale))
+            conn = self._open(db_path)
+            connections[key] = conn
+        return conn
+
+    def fingerprint(self, conn: sqlite3.Connection, db_path: Path) -> str:
+        """Build fingerprint of a pooled connection's database, computed once"""
+        fingerprints = self._local.fingerprints
+        if conn not in fingerprints:
+            fingerprints[conn] = database_fingerprint(conn, db_path)
+        return fingerprints[conn]
+
+    def _open(self, db_path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path.resolve().as_uri() + "?mode=ro&immutable=1",
+                               uri=True)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        """Close one of this thread's connections, superseded by a rebuild"""
+        with self._lock:
+            self._opened.remove(conn)
+        self._local.fingerprints.pop(conn, None)
+        conn.close()
+
+    def _reset_after_fork(self):
+        # The parent's connections must not be used (or closed) in the child
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = []
+        self._pid = os.getpid()
+
+    def close_all(self):
+        """Close every pooled connection (all threads)"""
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Owned by another, still-running thread; it is dropped below
+                pass
+        self._local = threading.local()
+
+
+# Shared by all normalizers in this process
+connection_manager = ConnectionManager()
+
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+# Part of every cache key; bump when a normalizer's output changes for the
+# same database, so persisted results from older code are not served
+RESULT_CACHE_VERSION = 1
+
+# Distinct inputs kept in memory (CIViC repeats a few thousand strings)
+RESULT_CACHE_SIZE = 50_000
+
+BUILD_FINGERPRINT_SQL = """
+    SELECT source, version, sha256, parser_version, row_count
+    FROM sources
+    ORDER BY source
+"""
+
+
+def database_fingerprint(conn: sqlite3.Connection, db_path: Path) -> str:
+    """
+    Identify the build a database holds
+
+    Digest of the per-source releases and file hashes in the sources table,
+    so any rebuild or incremental refresh that changes an input changes the
+    fingerprint. Databases without source metadata fall back on the file's
+    size and mtime.
+    """
+    try:
+        rows = [tuple(row) for row in conn.execute(BUILD_FINGERPRINT_SQL)]
+    except sqlite3.OperationalError:
+        rows = []
+    if not rows:
+        stat = db_path.stat()
+        rows = [("file", stat.st_size, stat.st_mtime_ns)]
+    digest = hashlib.sha256(json.dumps([RESULT_CACHE_VERSION, rows]).encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Memoized normalizer results: a bounded in-process LRU, optionally
+    backed by a persistent SQLite table
+
+    Entries are keyed by (namespace, database fingerprint, call arguments)
+    and stored as JSON, so every hit returns a fresh copy the caller may
+    modify. With a path, misses in memory fall through to the
+    `result_cache` table in that file (never ontologies.db, which is
+    opened read-only); a rebuilt database has a new fingerprint, and its
+    stale rows are replaced on write and pruned once per namespace.
+    """
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._pruned = set()
+        self.hits = self.disk_hits = self.misses = 0
+        self.configure(maxsize, path)
+
+    def configure(self, maxsize: int = RESULT_CACHE_SIZE, path: Optional[str] = None):
+        """Resize the LRU (0 disables it) and attach or detach the persistent table"""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+            self.path = Path(path) if path else None
+            if self.path:
+                self._disk = self._open_disk(self.path)
+            self._pruned.clear()
+
+    @staticmethod
+    def _open_disk(path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS result_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+        return conn
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 or self._disk is not None
+
+    def get(self, namespace: str, fingerprint: str, key: str) -> Optional[Dict]:
+        """Cached result for a call, or None (counted as a hit or a miss)"""
+        entry = (namespace, fingerprint, key)
+        with self._lock:
+            result = self._entries.get(entry)
+            if result is not None:
+                self._entries.move_to_end(entry)
+                self.hits += 1
+                return json.loads(result)
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT result FROM result_cache "
+                    "WHERE namespace = ? AND key = ? AND fingerprint = ?",
+                    (namespace, key, fingerprint)
+                ).fetchone()
+                if row:
+                    self.disk_hits += 1
+                    self._remember(entry, row[0])
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, namespace: str, fingerprint: str, key: str, result: Dict):
+        self.put_many(namespace, fingerprint, [(key, result)])
+
+    def put_many(self, namespace: str, fingerprint: str, items: List[Tuple[str, Dict]]):
+        """Store computed results; persistent writes share one transaction"""
+        encoded = [(key, json.dumps(result)) for key, result in items]
+        with self._lock:
+            for key, result in encoded:
+                self._remember((namespace, fingerprint, key), result)
+
+            if self._disk is not None and encoded:
+                with self._disk:
+                    if (namespace, fingerprint) not in self._pruned:
+                        self._disk.execute(
+                            "DELETE FROM result_cache WHERE namespace = ? AND fingerprint != ?",
+                            (namespace, fingerprint))
+                        self._pruned.add((namespace, fingerprint))
+                    self._disk.executemany(
+                        "INSERT OR REPLACE INTO result_cache "
+                        "(namespace, key, fingerprint, result) VALUES (?, ?, ?, ?)",
+                        [(namespace, key, fingerprint, result) for key, result in encoded])
+
+    def _remember(self, entry: Tuple[str, str, str], result: str):
+        if self.maxsize <= 0:
+            return
+        self._entries[entry] = result
+        self._entries.move_to_end(entry)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and the current LRU size"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Drop the in-memory entries and reset the counters (the table is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+
+# Shared by all normalizers in this process; configure() to resize it or
+# to persist results across runs
+result_cache = ResultCache()
+
+
+def memoized(method):
+    """
+    Serve a normalizer method from its ResultCache
+
+    The key is the class and method name, the connection's build
+    fingerprint and the JSON-encoded arguments. Classes with
+    `memoize = False` always compute.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self.cache
+        if (cache is None or not self.memoize or not cache.enabled
+                or getattr(self._local, "computing", False)):
+            return method(self, *args, **kwargs)
+
+        namespace, fingerprint = self._cache_scope(method.__name__)
+        key = json.dumps([args, kwargs], sort_keys=True)
+        result = cache.get(namespace, fingerprint, key)
+        if result is None:
+            result = method(self, *args, **kwargs)
+            cache.put(namespace, fingerprint, key, result)
+        return result
+
+    return wrapper
+
+
+# ============================================================================
+# INDEXED LOOKUPS
+# ============================================================================
+
+# Each WHERE clause matches an expression index built by
+# OntologyDatabaseBuilder.finalize(), so these are index searches, not scans
+
+TERM_BY_NAME_SQL = """
+    SELECT term_id, name, definition
+    FROM terms
+    WHERE ontology = :ontology
+      AND LOWER(name) = LOWER(:name)
+      AND is_obsolete = 0
+    LIMIT 1
+"""
+
+TERM_BY_SYNONYM_SQL = """
+    SELECT t.term_id, t.name, s.synonym
+    FROM synonyms s
+    JOIN terms t ON t.term_id = s.term_id
+    WHERE LOWER(s.synonym) = LOWER(:name)
+      AND t.ontology = :ontology
+      AND t.is_obsolete = 0
+    LIMIT 1
+"""
+
+# Set-based versions of the two lookups above for normalize_many(): every
+# distinct query string in one statement (:names is a JSON array), each
+# resolved by the single lookup as a correlated LIMIT 1 subquery, so both
+# paths pick the same row; CROSS JOIN keeps the query list outermost.
+# (A plain join lets SQLite 3.40 put a Bloom filter on the expression
+# index, which drops every match.)
+TERMS_BY_NAMES_SQL = """
+    SELECT q.value AS query, t.term_id, t.name, t.definition
+    FROM json_each(:names) q
+    CROSS JOIN terms t ON t.rowid = (
+        SELECT rowid FROM terms
+        WHERE ontology = :ontology
+          AND LOWER(name) = LOWER(q.value)
+          AND is_obsolete = 0
+        LIMIT 1
+    )
+"""
+
+TERMS_BY_SYNONYMS_SQL = """
+    SELECT q.value AS query, t.term_id, t.name, s.synonym
+    FROM json_each(:names) q
+    CROSS JOIN synonyms s ON s.rowid = (
+        SELECT s2.rowid
+        FROM synonyms s2
+        JOIN terms t2 ON t2.term_id = s2.term_id
+        WHERE LOWER(s2.synonym) = LOWER(q.value)
+          AND t2.ontology = :ontology
+          AND t2.is_obsolete = 0
+        LIMIT 1
+    )
+    JOIN terms t ON t.term_id = s.term_id
+"""
+
+# Partial matches: full-text search over names and synonyms, ranked by
+# each term's best bm25 label score (a name hit weighs 10x a synonym hit)
+TERM_SEARCH_SQL = """
+    WITH hits AS MATERIALIZED (
+        SELECT term_id, bm25(term_search, 0.0, 0.0, 10.0, 1.0) AS score
+        FROM term_search
+        WHERE term_search MATCH :query
+    )
+    SELECT t.term_id, t.name
+    FROM hits
+    JOIN terms t ON t.term_id = hits.term_id
+    GROUP BY t.term_id
+    ORDER BY MIN(hits.score), t.term_id
+    LIMIT :limit
+"""
+
+# ClinVar name substring search through the variant_names trigram index
+# (CROSS JOIN keeps the index as the outer loop, whatever the gene)
+VARIANTS_BY_NAME_SQL = """
+    SELECT v.variation_id, v.name, v.clinical_significance, v.rs_id,
+           v.chromosome, v.position, v.ref_allele, v.alt_allele, v.type
+    FROM variant_names f
+    CROSS JOIN variants v ON v.rowid = f.rowid
+    WHERE f.name LIKE :pattern
+      AND UPPER(v.gene_symbol) = UPPER(:gene)
+    LIMIT 10
+"""
+
+# Exact lookups on the changes parsed from ClinVar Names at build time
+# (idx_variant_protein_change / idx_variant_cdna_change)
+VARIANTS_BY_PROTEIN_SQL = """
+    SELECT variation_id, name, clinical_significance, rs_id,
+           chromosome, position, ref_allele, alt_allele, type
+    FROM variants
+    WHERE UPPER(hgvs_gene) = UPPER(:gene)
+      AND protein_change = :change
+    LIMIT 10
+"""
+
+VARIANTS_BY_CDNA_SQL = """
+    SELECT variation_id, name, clinical_significance, rs_id,
+           chromosome, position, ref_allele, alt_allele, type
+    FROM variants
+    WHERE UPPER(hgvs_gene) = UPPER(:gene)
+      AND cdna_change = :change
+    LIMIT 10
+"""
+
+# The same lookups for a whole batch in one statement: :changes is a JSON
+# array of [gene, change] and q.key its position; each change is resolved
+# by the single lookup as a correlated LIMIT 10 subquery
+VARIANTS_BY_PROTEINS_SQL = """
+    SELECT q.key AS query, v.variation_id, v.name, v.clinical_significance, v.rs_id,
+           v.chromosome, v.position, v.ref_allele, v.alt_allele, v.type
+    FROM json_each(:changes) q
+    CROSS JOIN variants v ON v.rowid IN (
+        SELECT rowid FROM variants
+        WHERE UPPER(hgvs_gene) = UPPER(json_extract(q.value, '$[0]'))
+          AND protein_change = json_extract(q.value, '$[1]')
+        LIMIT 10
+    )
+    ORDER BY q.key, v.rowid
+"""
+
+VARIANTS_BY_CDNAS_SQL = """
+    SELECT q.key AS query, v.variation_id, v.name, v.clinical_significance, v.rs_id,
+           v.chromosome, v.position, v.ref_allele, v.alt_allele, v.type
+    FROM json_each(:changes) q
+    CROSS JOIN variants v ON v.rowid IN (
+        SELECT rowid FROM variants
+        WHERE UPPER(hgvs_gene) = UPPER(json_extract(q.value, '$[0]'))
+          AND cdna_change = json_extract(q.value, '$[1]')
+        LIMIT 10
+    )
+    ORDER BY q.key, v.rowid
+"""
+
+# Scans one gene's variants: cheaper than the trigram index for genes with
+# few variants, whose fragments ("c.1", "Arg") hit all of ClinVar, and the
+# only option for patterns without a 3-character literal run
+VARIANTS_BY_GENE_SQL = """
+    SELECT variation_id, name, clinical_significance, rs_id,
+           chromosome, position, ref_allele, alt_allele, type
+    FROM variants
+    WHERE UPPER(gene_symbol) = UPPER(:gene)
+      AND name LIKE :pattern
+    LIMIT 10
+"""
+
+# Genes with at least this many ClinVar variants are searched by trigram
+TRIGRAM_MIN_GENE_VARIANTS = 2000
+
+GENE_VARIANT_COUNT_SQL = """
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM variants WHERE UPPER(gene_symbol) = UPPER(:gene) LIMIT :cap
+    )
+"""
+
+# Coordinate lookups on variant_locations, which is clustered on
+# (assembly, chromosome, start). A range scan starts :span bases early,
+# :span being the longest location (LOCATION_SPAN_SQL), so records that
+# begin before the range and reach into it are found too.
+VARIANTS_IN_RANGE_SQL = """
+    SELECT l.variation_id, v.name, v.gene_symbol, v.clinical_significance, v.rs_id,
+           l.chromosome, l.start, l.stop, l.ref_allele, l.alt_allele, v.type
+    FROM variant_locations l
+    LEFT JOIN variants v ON v.variation_id = l.variation_id
+    WHERE l.assembly = :assembly
+      AND l.chromosome = :chromosome
+      AND l.start BETWEEN :start - :span AND :stop
+      AND l.stop >= :start
+    ORDER BY l.start, l.variation_id
+"""
+
+LOCATION_SPAN_SQL = "SELECT COALESCE(MAX(stop - start), 0) FROM variant_locations"
+
+# Exact VCF positions for a whole batch in one statement: :records is a
+# JSON array of [key, chromosome, position, ref, alt], where a null allele
+# matches any. CROSS JOIN keeps the records as the outer loop.
+VARIANTS_AT_POSITIONS_SQL = """
+    SELECT json_extract(q.value, '$[0]') AS query, l.variation_id, v.name,
+           v.gene_symbol, v.clinical_significance, v.rs_id, l.chromosome,
+           l.start, l.stop, l.ref_allele, l.alt_allele, v.type
+    FROM json_each(:records) q
+    CROSS JOIN variant_locations l
+    LEFT JOIN variants v ON v.variation_id = l.variation_id
+    WHERE l.assembly = :assembly
+      AND l.chromosome = json_extract(q.value, '$[1]')
+      AND l.start = json_extract(q.value, '$[2]')
+      AND l.ref_allele = COALESCE(json_extract(q.value, '$[3]'), l.ref_allele)
+      AND l.alt_allele = COALESCE(json_extract(q.value, '$[4]'), l.alt_allele)
+    ORDER BY q.key, l.variation_id
+"""
+
+# Genome build names -> ClinVar's Assembly values
+GENOME_ASSEMBLIES = {
+    "hg38": "GRCh38", "grch38": "GRCh38",
+    "hg19": "GRCh37", "grch37": "GRCh37", "b37": "GRCh37",
+    "hg18": "NCBI36", "ncbi36": "NCBI36",
+}
+
+
+def clinvar_assembly(build: str) -> str:
+    """ClinVar Assembly for a genome build name (hg38, GRCh37, ...)"""
+    try:
+        return GENOME_ASSEMBLIES[build.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown genome build: {build}") from None
+
+
+def clinvar_chromosome(chromosome: str) -> str:
+    """ClinVar's spelling of a chromosome: chr7 -> 7, chrM -> MT"""
+    chromosome = str(chromosome).upper()
+    if chromosome.startswith("CHR"):
+        chromosome = chromosome[3:]
+    return "MT" if chromosome == "M" else chromosome
+
+
+# is_a hierarchy (tables filled by OntologyDatabaseBuilder.index_term_closure;
+# closure rows are keyed by post-order numbers, unique across ontologies):
+# ancestors come from the closure table's descendant prefix, descendants
+# from a post-order range scan per interval of the ancestor. CROSS JOIN
+# pins those orders; on small tables the planner would scan the closure.
+ANCESTORS_SQL = """
+    SELECT a.term_id, t.name, c.depth
+    FROM term_order d
+    CROSS JOIN term_closure c ON c.descendant = d.post
+    CROSS JOIN term_order a ON a.post = c.ancestor
+    JOIN terms t ON t.term_id = a.term_id
+    WHERE d.term_id = :term_id
+    ORDER BY c.depth, a.term_id
+"""
+
+DESCENDANTS_SQL = """
+    SELECT d.term_id, t.name, c.depth
+    FROM term_order a
+    CROSS JOIN term_intervals i ON i.post = a.post
+    CROSS JOIN term_order d ON d.post BETWEEN i.lo AND i.hi
+    CROSS JOIN term_closure c ON c.descendant = d.post AND c.ancestor = a.post
+    JOIN terms t ON t.term_id = d.term_id
+    WHERE a.term_id = :term_id
+    ORDER BY c.depth, d.term_id
+"""
+
+# Interval labels for a batch of subsumption checks (:terms is a JSON array)
+TERM_ORDER_SQL = """
+    SELECT o.term_id, o.post
+    FROM json_each(:terms) q
+    CROSS JOIN term_order o ON o.term_id = q.value
+"""
+
+TERM_INTERVALS_SQL = """
+    SELECT i.post, i.lo, i.hi
+    FROM json_each(:posts) q
+    CROSS JOIN term_intervals i ON i.post = q.value
+"""
+
+
+def fts_query(text: str, ontology: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression for term_search
+
+    Every word must match a name or synonym of a term in `ontology`; the
+    last word also matches as a prefix, so "lung adeno" finds "lung
+    adenocarcinoma". Returns None if the text has no words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    phrase = " ".join(f'"{word}"' for word in words) + "*"
+    return f'ontology : "{ontology}" AND {{name synonym}} : ({phrase})'
+
+
+# ============================================================================
+# IN-MEMORY TERM INDEX
+# ============================================================================
+
+# SQLite's LOWER() folds ASCII letters only; str.lower() would also fold
+# e.g. "É" and miss what the SQL lookups find (or find what they miss)
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+INDEX_TERMS_SQL = """
+    SELECT ontology, LOWER(name) AS key, term_id, name
+    FROM terms
+    WHERE ontology IN (SELECT value FROM json_each(:ontologies))
+      AND is_obsolete = 0
+    ORDER BY rowid
+"""
+
+# Same order as idx_synonym_lc, so the first row per key is the one
+# TERM_BY_SYNONYM_SQL returns
+INDEX_SYNONYMS_SQL = """
+    SELECT t.ontology, LOWER(s.synonym) AS key, s.term_id
+    FROM synonyms s
+    JOIN terms t ON t.term_id = s.term_id
+    WHERE t.ontology IN (SELECT value FROM json_each(:ontologies))
+      AND t.is_obsolete = 0
+    ORDER BY s.term_id, s.rowid
+"""
+
+
+class TermIndex:
+    """
+    Exact name and synonym lookups for a few ontologies, held in memory
+
+    Loaded once from ontologies.db: each ontology gets a name map and a
+    synonym map from the (ASCII-)lowercased label to a term number, and
+    term numbers index two parallel lists of IDs and names. Labels are
+    interned, so strings shared between ontologies (DOID and MONDO share
+    many names) are stored once. Lookups return the same term as
+    TERM_BY_NAME_SQL / TERM_BY_SYNONYM_SQL, as a dict with term_id and
+    name, without touching SQLite.
+    """
+
+    ONTOLOGIES = ("DOID", "MONDO", "HPO")
+
+    def __init__(self, conn: sqlite3.Connection, ontologies: Iterable[str] = ONTOLOGIES):
+        self.ontologies = tuple(ontologies)
+        self.term_ids: List[str] = []
+        self.names: List[str] = []
+        self._by_name: Dict[str, Dict[str, int]] = {name: {} for name in self.ontologies}
+        self._by_synonym: Dict[str, Dict[str, int]] = {name: {} for name in self.ontologies}
+
+        params = {"ontologies": json.dumps(self.ontologies)}
+        numbers: Dict[str, int] = {}
+        for ontology, key, term_id, name in conn.execute(INDEX_TERMS_SQL, params):
+            numbers[term_id] = len(self.term_ids)
+            self.term_ids.append(term_id)
+            self.names.append(sys.intern(name))
+            self._by_name[ontology].setdefault(sys.intern(key), numbers[term_id])
+
+        for ontology, key, term_id in conn.execute(INDEX_SYNONYMS_SQL, params):
+            self._by_synonym[ontology].setdefault(sys.intern(key), numbers[term_id])
+
+    def term_by_name(self, ontology: str, name: str) -> Optional[Dict]:
+        """Non-obsolete term with this name, ignoring ASCII case"""
+        number = self._by_name[ontology].get(name.translate(ASCII_LOWER))
+        return None if number is None else self._term(number)
+
+    def term_by_synonym(self, ontology: str, name: str) -> Optional[Dict]:
+        """Non-obsolete term with this synonym, ignoring ASCII case"""
+        number = self._by_synonym[ontology].get(name.translate(ASCII_LOWER))
+        return None if number is None else self._term(number)
+
+    def _term(self, number: int) -> Dict:
+        return {"term_id": self.term_ids[number], "name": self.names[number]}
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Entry counts and approximate bytes held (containers plus distinct strings)"""
+        maps = list(self._by_name.values()) + list(self._by_synonym.values())
+        strings = {id(text): text for text in self.term_ids + self.names}
+        for mapping in maps:
+            strings.update((id(key), key) for key in mapping)
+        size = (sum(sys.getsizeof(container) for container in [self.term_ids, self.names] + maps)
+                + sum(sys.getsizeof(text) for text in strings.values()))
+        return {
+            "terms": len(self.term_ids),
+            "names": sum(len(mapping) for mapping in self._by_name.values()),
+            "synonyms": sum(len(mapping) for mapping in self._by_synonym.values()),
+            "bytes": size,
+        }
+
+
+_term_indexes: Dict[str, Tuple[str, TermIndex]] = {}
+_term_indexes_lock = threading.Lock()
+
+
+def load_term_index(db_path: Path) -> TermIndex:
+    """
+    The process-wide TermIndex for a database, loaded on first use
+
+    Reloaded when the database's build fingerprint changes; the index of
+    the previous build is dropped.
+    """
+    conn = connection_manager.get(db_path)
+    fingerprint = connection_manager.fingerprint(conn, db_path)
+    path = str(db_path.resolve())
+    with _term_indexes_lock:
+        loaded = _term_indexes.get(path)
+        if loaded is None or loaded[0] != fingerprint:
+            loaded = _term_indexes[path] = (fingerprint, TermIndex(conn))
+        return loaded[1]
+
+# ============================================================================
+# SEMANTIC SIMILARITY
+# ============================================================================
+
+# Post-order numbers of one ontology are contiguous (index_term_closure()
+# numbers each ontology in one run), so term number = post - first post
+SIMILARITY_TERMS_SQL = """
+    SELECT term_id, post FROM term_order WHERE ontology = :ontology ORDER BY post
+"""
+
+SIMILARITY_CLOSURE_SQL = """
+    SELECT descendant, ancestor FROM term_closure
+    WHERE descendant BETWEEN :first AND :last
+"""
+
+
+class SemanticSimilarity:
+    """
+    Resnik and Lin similarity between terms of one ontology, in NumPy
+
+    Loaded once from the is_a closure: terms are numbered 0..n-1, and each
+    term's ancestors (itself included) are one slice of a flat int32 array
+    (CSR layout). Information content is intrinsic, from the hierarchy
+    alone: IC(t) = -log((descendants(t) + 1) / n), so a root covering the
+    whole ontology scores 0 and leaves score log(n).
+
+    Batch methods expand every pair's ancestor slices into one array and
+    find the common ancestors with a single np.isin; no Python loop runs
+    per pair. Unknown term IDs score NaN.
+    """
+
+    METHODS = ("resnik", "lin")
+
+    def __init__(self, conn: sqlite3.Connection, ontology: str):
+        self.ontology = ontology
+        rows = conn.execute(SIMILARITY_TERMS_SQL, {"ontology": ontology}).fetchall()
+        self.term_ids: List[str] = [row[0] for row in rows]
+        self.numbers: Dict[str, int] = {term_id: number
+                                        for number, term_id in enumerate(self.term_ids)}
+        n = len(self.term_ids)
+        first = rows[0][1] if rows else 0
+
+        flat = np.fromiter(
+            (post for row in conn.execute(SIMILARITY_CLOSURE_SQL,
+                                          {"first": first, "last": first + n - 1})
+             for post in row),
+            dtype=np.int64)
+        descendant = flat[0::2] - first
+        ancestor = flat[1::2] - first
+
+        # Every term counts as its own ancestor (the closure is strict)
+        own = np.arange(n, dtype=np.int64)
+        order = np.argsort(np.concatenate([descendant, own]), kind="stable")
+        self.ancestors = np.concatenate([ancestor, own])[order].astype(np.int32)
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(descendant, minlength=n) + 1, out=self.offsets[1:])
+
+        below = np.bincount(ancestor, minlength=n)
+        self.ic = -np.log((below + 1) / n) if n else np.zeros(0)
+
+    def encode(self, term_ids: Iterable[str]) -> np.ndarray:
+        """Term numbers for IDs, -1 for IDs not in this ontology"""
+        numbers = self.numbers
+        return np.fromiter((numbers.get(term_id, -1) for term_id in term_ids), dtype=np.int64)
+
+    def information_content(self, term_ids: Iterable[str]) -> np.ndarray:
+        """IC of each term (NaN if unknown)"""
+        return self._lookup_ic(self.encode(term_ids))
+
+    def similarity(self, term_a: str, term_b: str, method: str = "lin") -> float:
+        """Similarity of two terms (see similarity_many)"""
+        return float(self.similarity_many([(term_a, term_b)], method)[0])
+
+    def similarity_many(self, pairs: Iterable[Tuple[str, str]],
+                        method: str = "lin") -> np.ndarray:
+        """
+        Similarity of each (term_a, term_b) pair
+
+        Args:
+            pairs: Term ID pairs from this ontology
+            method: "resnik" (IC of the most informative common ancestor)
+                or "lin" (Resnik scaled by the two terms' own IC, 0..1)
+
+        Returns:
+            float64 array, one score per pair; NaN where a term is unknown
+        """
+        pairs = list(pairs)
+        a = self.encode(pair[0] for pair in pairs)
+        b = self.encode(pair[1] for pair in pairs)
+        return self._similarity(a, b, method)
+
+    def set_similarity_many(self, set_pairs: Iterable[Tuple[Iterable[str], Iterable[str]]],
+                            method: str = "lin") -> np.ndarray:
+        """
+        Best-match-average similarity of each (terms_a, terms_b) pair of sets
+
+        Each term is matched to its most similar term in the other set; the
+        score is the mean of the two sets' average best matches. Unknown
+        terms are ignored; a set left empty scores NaN.
+        """
+        sizes_a, sizes_b, terms_a, terms_b = [], [], [], []
+        for set_a, set_b in set_pairs:
+            known_a = [t for t in dict.fromkeys(set_a) if t in self.numbers]
+            known_b = [t for t in dict.fromkeys(set_b) if t in self.numbers]
+            sizes_a.append(len(known_a))
+            sizes_b.append(len(known_b))
+            terms_a.extend(known_a)
+            terms_b.extend(known_b)
+
+        sizes_a = np.array(sizes_a, dtype=np.int64)
+        sizes_b = np.array(sizes_b, dtype=np.int64)
+        a, b = self.encode(terms_a), self.encode(terms_b)
+        starts_a = np.cumsum(sizes_a) - sizes_a
+        starts_b = np.cumsum(sizes_b) - sizes_b
+
+        # Every cross pair within each set pair: row = position in a,
+        # column = position in b
+        cross = sizes_a * sizes_b
+        pair_of = np.repeat(np.arange(len(cross)), cross)
+        within = np.arange(cross.sum()) - np.repeat(np.cumsum(cross) - cross, cross)
+        row = starts_a[pair_of] + within // np.maximum(sizes_b, 1)[pair_of]
+        column = starts_b[pair_of] + within % np.maximum(sizes_b, 1)[pair_of]
+        scores = self._similarity(a[row], b[column], method)
+
+        best_a = np.zeros(len(a))
+        best_b = np.zeros(len(b))
+        np.maximum.at(best_a, row, scores)
+        np.maximum.at(best_b, column, scores)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_a = np.bincount(np.repeat(np.arange(len(sizes_a)), sizes_a), best_a,
+                                 minlength=len(sizes_a)) / sizes_a
+            mean_b = np.bincount(np.repeat(np.arange(len(sizes_b)), sizes_b), best_b,
+                                 minlength=len(sizes_b)) / sizes_b
+        return (mean_a + mean_b) / 2
+
+    def _lookup_ic(self, numbers: np.ndarray) -> np.ndarray:
+        ic = np.full(len(numbers), np.nan)
+        known = numbers >= 0
+        ic[known] = self.ic[numbers[known]]
+        return ic
+
+    def _similarity(self, a: np.ndarray, b: np.ndarray, method: str) -> np.ndarray:
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown similarity method {method!r}; use one of {self.METHODS}")
+        known = (a >= 0) & (b >= 0)
+        pair = np.flatnonzero(known)
+        mica = np.zeros(len(pair))
+        if len(pair):
+            pair_a, slot_a = self._expand(a[pair])
+            pair_b, slot_b = self._expand(b[pair])
+            # One key per (pair, ancestor); keys are unique on each side
+            n = len(self.term_ids)
+            keys_a = pair_a * n + self.ancestors[slot_a]
+            keys_b = pair_b * n + self.ancestors[slot_b]
+            common = np.isin(keys_a, keys_b, assume_unique=True)
+            np.maximum.at(mica, pair_a[common], self.ic[self.ancestors[slot_a[common]]])
+
+        scores = np.full(len(a), np.nan)
+        if method == "resnik":
+            scores[pair] = mica
+        else:
+            own = self.ic[a[pair]] + self.ic[b[pair]]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                lin = np.where(own > 0, 2 * mica / own, 0.0)
+            # Identical terms are fully similar, roots included (IC 0)
+            scores[pair] = np.where(a[pair] == b[pair], 1.0, lin)
+        return scores
+
+    def _expand(self, numbers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(pair index, slot in self.ancestors) for every ancestor of each term"""
+        starts = self.offsets[numbers]
+        counts = self.offsets[numbers + 1] - starts
+        pair = np.repeat(np.arange(len(numbers)), counts)
+        slot = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - starts, counts)
+        return pair, slot
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Term and ancestor-entry counts, and bytes held by the arrays"""
+        return {
+            "terms": len(self.term_ids),
+            "ancestors": len(self.ancestors),
+            "bytes": self.ancestors.nbytes + self.offsets.nbytes + self.ic.nbytes,
+        }
+
+
+_similarities: Dict[Tuple[str, str], Tuple[str, SemanticSimilarity]] = {}
+_similarities_lock = threading.Lock()
+
+
+def load_semantic_similarity(db_path: Path, ontology: str) -> SemanticSimilarity:
+    """
+    The process-wide SemanticSimilarity for an ontology, loaded on first use
+
+    Reloaded when the database's build fingerprint changes, like
+    load_term_index().
+    """
+    conn = connection_manager.get(db_path)
+    fingerprint = connection_manager.fingerprint(conn, db_path)
+    key = (str(db_path.resolve()), ontology)
+    with _similarities_lock:
+        loaded = _similarities.get(key)
+        if loaded is None or loaded[0] != fingerprint:
+            loaded = _similarities[key] = (fingerprint, SemanticSimilarity(conn, ontology))
+        return loaded[1]
+
 
 # ============================================================================
 # BASE NORMALIZER
 # ============================================================================
 
 class BaseNormalizer:
-    """Base class for all local normalizers"""
+    """
+    Base class for all local normalizers
+
+    Results are memoized in `cache` (the shared result_cache by default;
+    None disables caching for this instance). With in_memory=True, exact
+    and synonym term lookups are answered from the process-wide
+    TermIndex instead of SQL.
+    """
+
+    # Whether normalize methods go through the cache at all
+    memoize = True
 
-    def __init__(self, db_path: str = "data/databases/ontologies.db"):
+    def __init__(self, db_path: str = "data/databases/ontologies.db",
+                 cache: Optional[ResultCache] = result_cache, in_memory: bool = False):
         self.db_path = Path(db_path)
-        self.conn = None
+        self.cache = cache
+        self.in_memory = in_memory
+        self.index: Optional[TermIndex] = None
+        self._connected = False
+        # Per thread: set while this thread's normalize_many() computes
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        """
+        The calling thread's pooled connection (None until connect())
+
+        Resolved on every access, so one normalizer can be shared by
+        several threads, and a rebuilt database is picked up.
+        """
+        if not self._connected:
+            return None
+        return connection_manager.get(self.db_path)
 
     def connect(self):
-        """Connect to database"""
+        """Attach this normalizer to the pooled read-only connections"""
         if not self.db_path.exists():
             raise FileNotFoundError(
                 f"Database not found: {self.db_path}\n"
                 "Please run: ./download_ontologies.sh && python local_ontology_parsers.py"
             )
-        self.conn = sqlite3.connect(str(self.db_path))
-        self.conn.row_factory = sqlite3.Row
+        connection_manager.get(self.db_path)
+        self._connected = True
+        if self.in_memory:
+            self.index = load_term_index(self.db_path)
 
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Release the connection (it stays open in the pool for reuse)"""
+        self._connected = False
+
+    def normalize_many(self, items: Iterable[Hashable], **kwargs) -> List[Dict]:
+        """
+        Normalize a batch of inputs, resolving each distinct input once
+
+        Args:
+            items: Inputs as accepted by this normalizer's single-item method
+            **kwargs: Passed through to it (e.g. build= for coordinates)
+
+        Returns:
+            One result per input, in input order; repeated inputs share
+            the same result dictionary
+        """
+        items = list(items)
+        unique = list(dict.fromkeys(items))
+        if self.cache is None or not self.memoize or not self.cache.enabled:
+            resolved = self._normalize_unique(unique, **kwargs)
+            return [resolved[item] for item in items]
+
+        # Serve what the cache has (under the single-item method's keys),
+        # batch-resolve the rest and store it
+        namespace, fingerprint = self._cache_scope(self.batch_method)
+        keys = {item: json.dumps([self._batch_args(item), kwargs], sort_keys=True)
+                for item in unique}
+        resolved = {}
+        for item in unique:
+            result = self.cache.get(namespace, fingerprint, keys[item])
+            if result is not None:
+                resolved[item] = result
+
+        missing = [item for item in unique if item not in resolved]
+        if missing:
+            self._local.computing = True
+            try:
+                computed = self._normalize_unique(missing, **kwargs)
+            finally:
+                self._local.computing = False
+            self.cache.put_many(namespace, fingerprint,
+                                [(keys[item], computed[item]) for item in missing])
+            resolved.update(computed)
+        return [resolved[item] for item in items]
+
+    # The single-item method normalize_many() stands in for, and how a
+    # batch item maps to its positional arguments
+    batch_method = "normalize"
+
+    def _batch_args(self, item: Hashable) -> List:
+        return [item]
+
+    def _cache_scope(self, method_name: str) -> Tuple[str, str]:
+        """(namespace, build fingerprint) for this normalizer's cache keys"""
+        namespace = f"{type(self).__name__}.{method_name}"
+        if not self.conn:
+            self.connect()
+        return namespace, self._build()
+
+    def _build(self) -> str:
+        """Fingerprint of the database build behind this thread's connection"""
+        return connection_manager.fingerprint(self.conn, self.db_path)
+
+    def _normalize_unique(self, items: List[Hashable], **kwargs) -> Dict[Hashable, Dict]:
+        """Normalize distinct inputs; database-backed subclasses batch their SQL"""
+        return {item: self.normalize(item, **kwargs) for item in items}
+
+    def _term_by_name(self, ontology: str, name: str):
+        """Exact (case-insensitive) name match, or None"""
+        if self.index is not None:
+            return self.index.term_by_name(ontology, name)
+        return self.conn.execute(TERM_BY_NAME_SQL,
+                                 {"ontology": ontology, "name": name}).fetchone()
+
+    def _term_by_synonym(self, ontology: str, name: str):
+        """Exact (case-insensitive) synonym match, or None"""
+        if self.index is not None:
+            return self.index.term_by_synonym(ontology, name)
+        return self.conn.execute(TERM_BY_SYNONYM_SQL,
+                                 {"ontology": ontology, "name": name}).fetchone()
+
+    def _terms_by_names(self, ontology: str, names: List[str]) -> Dict[str, sqlite3.Row]:
+        """_term_by_name() for many names, omitting those without a match"""
+        if self.index is not None:
+            return self._index_matches(self.index.term_by_name, ontology, names)
+        return self._first_matches(TERMS_BY_NAMES_SQL, ontology, names)
+
+    def _terms_by_synonyms(self, ontology: str, names: List[str]) -> Dict[str, sqlite3.Row]:
+        """_term_by_synonym() for many names, omitting those without a match"""
+        if self.index is not None:
+            return self._index_matches(self.index.term_by_synonym, ontology, names)
+        return self._first_matches(TERMS_BY_SYNONYMS_SQL, ontology, names)
+
+    @staticmethod
+    def _index_matches(lookup, ontology: str, names: List[str]) -> Dict[str, Dict]:
+        found = {}
+        for name in names:
+            row = lookup(ontology, name)
+            if row is not None:
+                found[name] = row
+        return found
+
+    def _first_matches(self, sql: str, ontology: str,
+                       names: List[str]) -> Dict[str, sqlite3.Row]:
+        """Run a set-based lookup, mapping each matched query string to its row"""
+        found = {}
+        if names:
+            params = {"names": json.dumps(names), "ontology": ontology}
+            for row in self.conn.execute(sql, params):
+                found[row["query"]] = row
+        return found
 
     def __enter__(self):
         self.connect()
@@ -44,16 +1084,95 @@ class BaseNormalizer:
         self.close()
 
 
+# ============================================================================
+# TERM HIERARCHY
+# ============================================================================
+
+class TermNormalizer(BaseNormalizer):
+    """
+    Base for normalizers that resolve to ontology terms
+
+    Adds is_a hierarchy queries over the closure table and interval labels
+    built by OntologyDatabaseBuilder.index_term_closure(). Descendant
+    relations are strict: a term is not its own descendant.
+    """
+
+    # Ontology compared by semantic_similarity() unless one is given
+    similarity_ontology = "DOID"
+
+    def semantic_similarity(self, ontology: Optional[str] = None) -> SemanticSimilarity:
+        """
+        The Resnik/Lin similarity engine for an ontology (loaded on first use)
+
+        >>> engine = DiseaseNormalizer().semantic_similarity()
+        >>> engine.similarity_many([("DOID:3910", "DOID:3908")], method="lin")
+        """
+        return load_semantic_similarity(self.db_path, ontology or self.similarity_ontology)
+
+    def ancestors(self, term_id: str) -> List[Dict]:
+        """All is_a ancestors of a term, nearest first, with their depth"""
+        if not self.conn:
+            self.connect()
+        return [{"id": row["term_id"], "name": row["name"], "depth": row["depth"]}
+                for row in self.conn.execute(ANCESTORS_SQL, {"term_id": term_id})]
+
+    def descendants(self, term_id: str) -> List[Dict]:
+        """All is_a descendants of a term, nearest first, with their depth"""
+        if not self.conn:
+            self.connect()
+        return [{"id": row["term_id"], "name": row["name"], "depth": row["depth"]}
+                for row in self.conn.execute(DESCENDANTS_SQL, {"term_id": term_id})]
+
+    def is_descendant_of(self, term_id: str, ancestor_id: str) -> bool:
+        """Whether term_id is a kind of ancestor_id (e.g. of DOID:162 cancer)"""
+        return self.is_descendant_of_many([(term_id, ancestor_id)])[0]
+
+    def is_descendant_of_many(self, pairs: Iterable[Tuple[str, str]]) -> List[bool]:
+        """
+        is_descendant_of() for a batch of (term_id, ancestor_id) pairs
+
+        Two queries fetch the post-order numbers and ancestor ranges for the
+        whole batch; each check is then a binary search over the ancestor's
+        (usually single) range. Unknown terms are descendants of nothing.
+        """
+        if not self.conn:
+            self.connect()
+        pairs = list(pairs)
+        terms = sorted({term for pair in pairs for term in pair})
+        posts = {row["term_id"]: row["post"]
+                 for row in self.conn.execute(TERM_ORDER_SQL, {"terms": json.dumps(terms)})}
+
+        ancestors = sorted({posts[ancestor] for _, ancestor in pairs if ancestor in posts})
+        ranges: Dict[int, List[Tuple[int, int]]] = {}
+        for row in self.conn.execute(TERM_INTERVALS_SQL, {"posts": json.dumps(ancestors)}):
+            ranges.setdefault(row["post"], []).append((row["lo"], row["hi"]))
+        starts = {}
+        for ancestor, spans in ranges.items():
+            spans.sort()
+            starts[ancestor] = [lo for lo, _ in spans]
+
+        results = []
+        for term_id, ancestor_id in pairs:
+            post, ancestor = posts.get(term_id), posts.get(ancestor_id)
+            if post is None or ancestor is None or post == ancestor:
+                results.append(False)
+                continue
+            index = bisect.bisect_right(starts[ancestor], post) - 1
+            results.append(index >= 0 and ranges[ancestor][index][1] >= post)
+        return results
+
+
 # ============================================================================
 # AGENT 9: DISEASE NORMALIZER
 # ============================================================================
 
-class DiseaseNormalizer(BaseNormalizer):
+class DiseaseNormalizer(TermNormalizer):
     """
     Agent 9: Disease Normalizer
     Normalizes disease names to DOID, MONDO, NCIt
     """
 
+    @memoized
     def normalize(self, disease_name: str) -> Dict:
         """
         Normalize disease name to standard ontologies
@@ -67,6 +1186,33 @@ class DiseaseNormalizer(BaseNormalizer):
         if not self.conn:
             self.connect()
 
+        # Search in DOID first: exact match, then synonym
+        exact = self._term_by_name("DOID", disease_name)
+        synonym = None if exact else self._term_by_synonym("DOID", disease_name)
+
+        # Also search MONDO
+        mondo = self._term_by_name("MONDO", disease_name)
+
+        return self._build_result(disease_name, exact, synonym, mondo)
+
+    def _normalize_unique(self, disease_names: List[str]) -> Dict[str, Dict]:
+        """Exact, synonym and MONDO lookups for all names (three queries in SQL mode)"""
+        if not self.conn:
+            self.connect()
+
+        exact = self._terms_by_names("DOID", disease_names)
+        synonym = self._terms_by_synonyms("DOID",
+                                          [name for name in disease_names if name not in exact])
+        mondo = self._terms_by_names("MONDO", disease_names)
+
+        return {name: self._build_result(name, exact.get(name), synonym.get(name),
+                                         mondo.get(name))
+                for name in disease_names}
+
+    def _build_result(self, disease_name: str, exact: Optional[sqlite3.Row],
+                      synonym: Optional[sqlite3.Row],
+                      mondo: Optional[sqlite3.Row]) -> Dict:
+        """Assemble a result from the lookups, searching partial matches if needed"""
         results = {
             "original_term": disease_name,
             "doid": None,
@@ -77,67 +1223,24 @@ class DiseaseNormalizer(BaseNormalizer):
             "matches": []
         }
 
-        # Search in DOID first
-        cursor = self.conn.cursor()
-
-        # Exact match
-        cursor.execute("""
-            SELECT term_id, name, definition
-            FROM terms
-            WHERE ontology = 'DOID'
-              AND LOWER(name) = LOWER(?)
-              AND is_obsolete = 0
-            LIMIT 1
-        """, (disease_name,))
-
-        row = cursor.fetchone()
-        if row:
-            results["doid"] = row["term_id"]
-            results["doid_name"] = row["name"]
-            results["confidence"] = 1.0
-            results["matches"].append({
-                "ontology": "DOID",
-                "id": row["term_id"],
-                "name": row["name"],
-                "match_type": "exact"
-            })
-
-        # If no exact match, try synonym
-        if not results["doid"]:
-            cursor.execute("""
-                SELECT t.term_id, t.name, s.synonym
-                FROM terms t
-                JOIN synonyms s ON t.term_id = s.term_id
-                WHERE t.ontology = 'DOID'
-                  AND LOWER(s.synonym) = LOWER(?)
-                  AND t.is_obsolete = 0
-                LIMIT 1
-            """, (disease_name,))
-
-            row = cursor.fetchone()
+        for row, confidence, match_type in ((exact, 1.0, "exact"),
+                                            (synonym, 0.95, "synonym")):
             if row:
                 results["doid"] = row["term_id"]
                 results["doid_name"] = row["name"]
-                results["confidence"] = 0.95
+                results["confidence"] = confidence
                 results["matches"].append({
                     "ontology": "DOID",
                     "id": row["term_id"],
                     "name": row["name"],
-                    "match_type": "synonym"
+                    "match_type": match_type
                 })
+                break
 
         # Try partial match if still no result
-        if not results["doid"]:
-            cursor.execute("""
-                SELECT term_id, name
-                FROM terms
-                WHERE ontology = 'DOID'
-                  AND name LIKE ?
-                  AND is_obsolete = 0
-                LIMIT 5
-            """, (f"%{disease_name}%",))
-
-            rows = cursor.fetchall()
+        query = fts_query(disease_name, "DOID")
+        if not results["doid"] and query:
+            rows = self.conn.execute(TERM_SEARCH_SQL, {"query": query, "limit": 5})
             for row in rows:
                 results["matches"].append({
                     "ontology": "DOID",
@@ -146,20 +1249,9 @@ class DiseaseNormalizer(BaseNormalizer):
                     "match_type": "partial"
                 })
 
-        # Also search MONDO
-        cursor.execute("""
-            SELECT term_id, name
-            FROM terms
-            WHERE ontology = 'MONDO'
-              AND LOWER(name) = LOWER(?)
-              AND is_obsolete = 0
-            LIMIT 1
-        """, (disease_name,))
-
-        row = cursor.fetchone()
-        if row:
-            results["mondo_id"] = row["term_id"]
-            results["mondo_name"] = row["name"]
+        if mondo:
+            results["mondo_id"] = mondo["term_id"]
+            results["mondo_name"] = mondo["name"]
 
         return results
 
@@ -174,6 +1266,12 @@ class VariantNormalizer(BaseNormalizer):
     Normalizes variants using SO (Sequence Ontology) and ClinVar
     """
 
+    def connect(self):
+        super().connect()
+        # SO term per inferred variant type, per database build
+        self._so_terms: Dict[Tuple[str, str], Optional[Dict]] = {}
+
+    @memoized
     def normalize(self, gene: str, variant: str) -> Dict:
         """
         Normalize variant information
@@ -188,6 +1286,30 @@ class VariantNormalizer(BaseNormalizer):
         if not self.conn:
             self.connect()
 
+        cursor = self.conn.cursor()
+
+        # Protein and cDNA changes (L858R, p.Leu858Arg, c.2573T>G) are
+        # looked up exactly in the columns parsed from ClinVar Names;
+        # anything else ("Exon 19 Deletion"), and changes whose ClinVar
+        # Names the build could not parse, by name substring
+        parsed = hgvs_parser.parse(variant)
+        rows = []
+        if self._exact_change(parsed):
+            sql = VARIANTS_BY_PROTEIN_SQL if parsed.level == "p" else VARIANTS_BY_CDNA_SQL
+            rows = cursor.execute(sql, {"gene": gene, "change": parsed.format()}).fetchall()
+        if not rows:
+            rows = self._name_matches(cursor, gene, variant)
+
+        return self._result(gene, variant, parsed, rows)
+
+    @staticmethod
+    def _exact_change(parsed: Optional[hgvs_parser.HGVSVariant]) -> bool:
+        """Whether a parsed variant is looked up in the parsed-Name columns"""
+        return parsed is not None and parsed.edit is not None and parsed.level in ("p", "c")
+
+    def _result(self, gene: str, variant: str, parsed: Optional[hgvs_parser.HGVSVariant],
+                rows: List[sqlite3.Row]) -> Dict:
+        """normalize()'s result for a variant and its ClinVar rows"""
         results = {
             "original_gene": gene,
             "original_variant": variant,
@@ -196,41 +1318,45 @@ class VariantNormalizer(BaseNormalizer):
             "confidence": 0.0
         }
 
-        cursor = self.conn.cursor()
+        for row in rows:
+            results["clinvar_matches"].append({
+                "variation_id": row["variation_id"],
+                "name": row["name"],
+                "clinical_significance": row["clinical_significance"],
+                "rs_id": row["rs_id"],
+                "chromosome": row["chromosome"],
+                "position": row["position"],
+                "ref_allele": row["ref_allele"],
+                "alt_allele": row["alt_allele"],
+                "type": row["type"]
+            })
+
+        # Determine variant type from SO
+        variant_type = self._infer_variant_type(variant, parsed)
+        if variant_type:
+            results["variant_type_so"] = self._so_term(variant_type)
+
+        results["confidence"] = 0.8 if results["clinvar_matches"] else 0.3
 
-        # Convert short variant name to potential HGVS patterns
-        # e.g., L858R -> Leu858Arg, L858, 858
+        return results
+
+    def _name_matches(self, cursor: sqlite3.Cursor, gene: str, variant: str) -> List[sqlite3.Row]:
+        """A gene's ClinVar variants whose name contains the variant text"""
         variant_patterns = [
             f"%{variant}%",  # Direct match
             f"%{gene}%{variant}%",  # Gene + variant
         ]
 
-        # If it's a single-letter AA change (e.g., L858R), add 3-letter version
-        import re
-        match = re.match(r'([A-Z])(\d+)([A-Z])$', variant)
-        if match:
-            aa_map = {
-                'A': 'Ala', 'R': 'Arg', 'N': 'Asn', 'D': 'Asp', 'C': 'Cys',
-                'Q': 'Gln', 'E': 'Glu', 'G': 'Gly', 'H': 'His', 'I': 'Ile',
-                'L': 'Leu', 'K': 'Lys', 'M': 'Met', 'F': 'Phe', 'P': 'Pro',
-                'S': 'Ser', 'T': 'Thr', 'W': 'Trp', 'Y': 'Tyr', 'V': 'Val'
-            }
-            from_aa, pos, to_aa = match.groups()
-            if from_aa in aa_map and to_aa in aa_map:
-                hgvs_form = f"{aa_map[from_aa]}{pos}{aa_map[to_aa]}"
-                variant_patterns.append(f"%{hgvs_form}%")
+        # Search ClinVar with multiple patterns (counting stops at the cap)
+        large_gene = cursor.execute(GENE_VARIANT_COUNT_SQL, {
+            "gene": gene, "cap": TRIGRAM_MIN_GENE_VARIANTS,
+        }).fetchone()[0] >= TRIGRAM_MIN_GENE_VARIANTS
 
-        # Search ClinVar with multiple patterns
         all_rows = []
         for pattern in variant_patterns:
-            cursor.execute("""
-                SELECT variation_id, name, clinical_significance, rs_id,
-                       chromosome, position, ref_allele, alt_allele, type
-                FROM variants
-                WHERE UPPER(gene_symbol) = UPPER(?)
-                  AND name LIKE ?
-                LIMIT 10
-            """, (gene, pattern))
+            use_trigrams = large_gene and max(map(len, re.split(r"[%_]", pattern))) >= 3
+            cursor.execute(VARIANTS_BY_NAME_SQL if use_trigrams else VARIANTS_BY_GENE_SQL,
+                           {"gene": gene, "pattern": pattern})
             all_rows.extend(cursor.fetchall())
             if all_rows:  # Stop if we found matches
                 break
@@ -242,58 +1368,76 @@ class VariantNormalizer(BaseNormalizer):
             if row["variation_id"] not in seen_ids:
                 rows.append(row)
                 seen_ids.add(row["variation_id"])
+        return rows
 
-        for row in rows:
-            results["clinvar_matches"].append({
-                "variation_id": row["variation_id"],
-                "name": row["name"],
-                "clinical_significance": row["clinical_significance"],
-                "rs_id": row["rs_id"],
-                "chromosome": row["chromosome"],
-                "position": row["position"],
-                "ref_allele": row["ref_allele"],
-                "alt_allele": row["alt_allele"],
-                "type": row["type"]
-            })
+    def _batch_args(self, pair: Tuple[str, str]) -> List:
+        return list(pair)
 
-        # Determine variant type from SO
-        variant_type = self._infer_variant_type(variant)
-        if variant_type:
-            cursor.execute("""
+    def _normalize_unique(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict]:
+        """
+        Normalize distinct (gene, variant) pairs
+
+        Protein and cDNA changes are resolved by one set-based query per
+        level; only the rest (and changes with no exact match) run the
+        per-pair substring search. SO lookups are shared per variant type.
+        """
+        if not self.conn:
+            self.connect()
+        cursor = self.conn.cursor()
+
+        parsed = {pair: hgvs_parser.parse(pair[1]) for pair in pairs}
+        rows: Dict[Tuple[str, str], List[sqlite3.Row]] = {pair: [] for pair in pairs}
+        for level, sql in (("p", VARIANTS_BY_PROTEINS_SQL), ("c", VARIANTS_BY_CDNAS_SQL)):
+            batch = [pair for pair in pairs
+                     if self._exact_change(parsed[pair]) and parsed[pair].level == level]
+            if batch:
+                changes = json.dumps([[gene, parsed[(gene, variant)].format()]
+                                      for gene, variant in batch])
+                for row in cursor.execute(sql, {"changes": changes}):
+                    rows[batch[row["query"]]].append(row)
+
+        results = {}
+        for gene, variant in pairs:
+            found = rows[(gene, variant)] or self._name_matches(cursor, gene, variant)
+            results[(gene, variant)] = self._result(gene, variant, parsed[(gene, variant)], found)
+        return results
+
+    def _so_term(self, variant_type: str) -> Optional[Dict]:
+        """SO term whose name contains the variant type (cached per build)"""
+        key = (self._build(), variant_type)
+        if key not in self._so_terms:
+            row = self.conn.execute("""
                 SELECT term_id, name, definition
                 FROM terms
                 WHERE ontology = 'SO'
                   AND LOWER(name) LIKE ?
                 LIMIT 1
-            """, (f"%{variant_type}%",))
+            """, (f"%{variant_type}%",)).fetchone()
 
-            row = cursor.fetchone()
-            if row:
-                results["variant_type_so"] = {
-                    "id": row["term_id"],
-                    "name": row["name"],
-                    "definition": row["definition"]
-                }
-
-        results["confidence"] = 0.8 if results["clinvar_matches"] else 0.3
-
-        return results
-
-    def _infer_variant_type(self, variant: str) -> Optional[str]:
-        """Infer variant type from variant string"""
-        # Simple heuristics
-        if re.match(r'^[A-Z]\d+[A-Z]$', variant):  # e.g., L858R
-            return "missense"
-        elif "del" in variant.lower():
-            return "deletion"
-        elif "ins" in variant.lower():
-            return "insertion"
-        elif "dup" in variant.lower():
-            return "duplication"
-        elif "fs" in variant.lower():
-            return "frameshift"
-        elif "*" in variant:
-            return "nonsense"
+            self._so_terms[key] = {
+                "id": row["term_id"],
+                "name": row["name"],
+                "definition": row["definition"]
+            } if row else None
+
+        so_term = self._so_terms[key]
+        return dict(so_term) if so_term else None
+
+    # Fallback for names that are not HGVS ("Exon 19 Deletion"), checked in order
+    VARIANT_KEYWORDS = (("del", "deletion"), ("ins", "insertion"), ("dup", "duplication"),
+                        ("fs", "frameshift"), ("*", "nonsense"))
+
+    def _infer_variant_type(self, variant: str,
+                            parsed: Optional[hgvs_parser.HGVSVariant] = None) -> Optional[str]:
+        """Infer variant type from variant string (or its already-parsed form)"""
+        if parsed is None:
+            parsed = hgvs_parser.parse(variant)
+        if parsed is not None and parsed.variant_type:
+            return parsed.variant_type
+        lowered = variant.lower()
+        for keyword, variant_type in self.VARIANT_KEYWORDS:
+            if keyword in lowered:
+                return variant_type
         return None
 
 
@@ -301,12 +1445,16 @@ class VariantNormalizer(BaseNormalizer):
 # AGENT 14: ONTOLOGY NORMALIZER
 # ============================================================================
 
-class OntologyNormalizer(BaseNormalizer):
+class OntologyNormalizer(TermNormalizer):
     """
     Agent 14: Ontology Normalizer
     Normalizes to GO, HPO, MONDO
     """
 
+    batch_method = "normalize_phenotype"
+    similarity_ontology = "HPO"
+
+    @memoized
     def normalize_gene(self, gene_symbol: str) -> Dict:
         """Normalize gene to GO terms"""
         if not self.conn:
@@ -324,11 +1472,33 @@ class OntologyNormalizer(BaseNormalizer):
 
         return results
 
+    @memoized
     def normalize_phenotype(self, phenotype: str) -> Dict:
         """Normalize phenotype to HPO"""
         if not self.conn:
             self.connect()
 
+        # Try exact match first, then synonym match
+        exact = self._term_by_name("HPO", phenotype)
+        synonym = None if exact else self._term_by_synonym("HPO", phenotype)
+
+        return self._build_phenotype_result(phenotype, exact, synonym)
+
+    def _normalize_unique(self, phenotypes: List[str]) -> Dict[str, Dict]:
+        """normalize_many() maps phenotypes: exact and synonym lookups in two queries"""
+        if not self.conn:
+            self.connect()
+
+        exact = self._terms_by_names("HPO", phenotypes)
+        synonym = self._terms_by_synonyms("HPO",
+                                          [name for name in phenotypes if name not in exact])
+
+        return {name: self._build_phenotype_result(name, exact.get(name), synonym.get(name))
+                for name in phenotypes}
+
+    def _build_phenotype_result(self, phenotype: str, exact: Optional[sqlite3.Row],
+                                synonym: Optional[sqlite3.Row]) -> Dict:
+        """Assemble a result from the lookups, searching partial matches if needed"""
         results = {
             "original_phenotype": phenotype,
             "hpo_id": None,
@@ -337,54 +1507,18 @@ class OntologyNormalizer(BaseNormalizer):
             "confidence": 0.0
         }
 
-        cursor = self.conn.cursor()
+        for row, confidence in ((exact, 1.0), (synonym, 0.95)):
+            if row:
+                results["hpo_id"] = row["term_id"]
+                results["hpo_name"] = row["name"]
+                results["confidence"] = confidence
+                return results
 
-        # Try exact match first
-        cursor.execute("""
-            SELECT term_id, name, definition
-            FROM terms
-            WHERE ontology = 'HPO'
-              AND LOWER(name) = LOWER(?)
-              AND is_obsolete = 0
-            LIMIT 1
-        """, (phenotype,))
-
-        row = cursor.fetchone()
-        if row:
-            results["hpo_id"] = row["term_id"]
-            results["hpo_name"] = row["name"]
-            results["confidence"] = 1.0
-            return results
-
-        # Try synonym match
-        cursor.execute("""
-            SELECT t.term_id, t.name, s.synonym
-            FROM terms t
-            JOIN synonyms s ON t.term_id = s.term_id
-            WHERE t.ontology = 'HPO'
-              AND LOWER(s.synonym) = LOWER(?)
-              AND t.is_obsolete = 0
-            LIMIT 1
-        """, (phenotype,))
-
-        row = cursor.fetchone()
-        if row:
-            results["hpo_id"] = row["term_id"]
-            results["hpo_name"] = row["name"]
-            results["confidence"] = 0.95
-            return results
-
-        # Try partial match in names
-        cursor.execute("""
-            SELECT term_id, name
-            FROM terms
-            WHERE ontology = 'HPO'
-              AND LOWER(name) LIKE LOWER(?)
-              AND is_obsolete = 0
-            LIMIT 5
-        """, (f"%{phenotype}%",))
-
-        rows = cursor.fetchall()
+        # Try partial match in names and synonyms
+        query = fts_query(phenotype, "HPO")
+        rows = []
+        if query:
+            rows = self.conn.execute(TERM_SEARCH_SQL, {"query": query, "limit": 5}).fetchall()
         for row in rows:
             results["hpo_matches"].append({
                 "hpo_id": row["term_id"],
@@ -412,8 +1546,12 @@ class TherapyNormalizer(BaseNormalizer):
     Note: Basic version without NCIt (requires UMLS license)
     """
 
-    def __init__(self, db_path: str = "data/databases/ontologies.db"):
-        super().__init__(db_path)
+    # Pure string rules: recomputing beats a cache hit
+    memoize = False
+
+    def __init__(self, db_path: str = "data/databases/ontologies.db",
+                 cache: Optional[ResultCache] = result_cache):
+        super().__init__(db_path, cache)
         # Common drug name variations
         self.drug_synonyms = {
             "osimertinib": ["tagrisso", "azd9291"],
@@ -483,6 +1621,9 @@ class TrialNormalizer(BaseNormalizer):
     Normalizes clinical trial identifiers
     """
 
+    # Pure string rules: recomputing beats a cache hit
+    memoize = False
+
     def normalize(self, trial_id: str) -> Dict:
         """
         Normalize clinical trial ID
@@ -539,9 +1680,21 @@ class TrialNormalizer(BaseNormalizer):
 class CoordinateNormalizer(BaseNormalizer):
     """
     Agent 13: Coordinate Normalizer
-    Validates and normalizes genomic coordinates and HGVS
+    Validates and normalizes genomic coordinates and HGVS, and resolves
+    genomic positions to ClinVar variants
+
+    Only genomic input touches the database (connected on first use);
+    protein and cDNA HGVS are validated as strings.
     """
 
+    # Mostly string validation: recomputing beats a cache hit
+    memoize = False
+
+    def connect(self):
+        super().connect()
+        # Longest ClinVar location, read once per database build
+        self._spans: Dict[str, int] = {}
+
     def normalize(self, variant_string: str, build: str = "hg38") -> Dict:
         """
         Normalize genomic coordinates
@@ -551,8 +1704,45 @@ class CoordinateNormalizer(BaseNormalizer):
             build: Genome build (hg38, hg19, etc.)
 
         Returns:
-            Dictionary with normalized coordinate information
+            Dictionary with normalized coordinate information; genomic
+            positions also get the ClinVar records found there
+        """
+        return self._normalize_unique([variant_string], build)[variant_string]
+
+    def _normalize_unique(self, items: List[str], build: str = "hg38") -> Dict[str, Dict]:
+        """
+        Normalize distinct variant strings
+
+        Genomic substitutions are matched to ClinVar by one lookup_vcf()
+        call for the whole batch; indels by a range lookup each.
         """
+        results = {}
+        substitutions = []
+        for variant_string in items:
+            results[variant_string], variant = self._parse_coordinates(variant_string, build)
+            if variant is None or variant.level != "g" or variant.chromosome is None \
+                    or build.lower() not in GENOME_ASSEMBLIES:
+                continue
+            # Substitutions sit at the same position in HGVS and VCF, so they
+            # match alleles exactly; indels are anchored differently, so
+            # anything overlapping them is returned
+            if variant.edit == "substitution":
+                substitutions.append((variant_string, variant))
+            else:
+                results[variant_string]["clinvar_matches"] = self.lookup_range(
+                    variant.chromosome, variant.start, variant.end, build)
+
+        if substitutions:
+            matches = self.lookup_vcf([(variant.chromosome, variant.start, variant.ref,
+                                        variant.alt) for _, variant in substitutions], build)
+            for (variant_string, _), found in zip(substitutions, matches):
+                results[variant_string]["clinvar_matches"] = found
+        return results
+
+    @staticmethod
+    def _parse_coordinates(variant_string: str,
+                           build: str) -> Tuple[Dict, Optional[hgvs_parser.HGVSVariant]]:
+        """normalize()'s result without ClinVar matches, and the parsed coordinate"""
         results = {
             "original_string": variant_string,
             "hgvs_validated": False,
@@ -561,48 +1751,114 @@ class CoordinateNormalizer(BaseNormalizer):
             "position": None,
             "ref": None,
             "alt": None,
+            "clinvar_matches": [],
             "confidence": 0.0
         }
 
-        import re
+        variant = hgvs_parser.parse(variant_string)
+        if variant is None:
+            return results, None
+
+        if variant.accession is None and variant.chromosome is not None:
+            # Genomic coordinate: chr7:55249071 A>G, or the simple 7:55249071A>G
+            validated = "chr" in variant_string.lower()
+            results["hgvs_validated"] = validated
+            results["confidence"] = 0.9 if validated else 0.8
+        elif f"{variant.level}." in variant_string:
+            # HGVS: p.Leu858Arg, p.V600E, c.2573T>G, NC_000007.14:g.55191822T>G
+            results["hgvs_validated"] = True
+            results["confidence"] = 1.0
+        else:
+            # Bare protein change (L858R): a variant name, not a coordinate
+            return results, None
 
-        # HGVS protein notation: p.Leu858Arg
-        if variant_string.startswith("p."):
-            # Basic validation
-            pattern = r'p\.[A-Z][a-z]{2}\d+[A-Z][a-z]{2}'
-            if re.match(pattern, variant_string):
-                results["hgvs_validated"] = True
-                results["confidence"] = 1.0
+        if variant.level == "g":
+            results["chromosome"] = variant.chromosome
+            results["position"] = variant.start
+            results["ref"] = variant.ref
+            results["alt"] = variant.alt
 
-        # HGVS cDNA notation: c.2573T>G
-        elif variant_string.startswith("c."):
-            pattern = r'c\.\d+[ACGT]>[ACGT]'
-            if re.match(pattern, variant_string):
-                results["hgvs_validated"] = True
-                results["confidence"] = 1.0
+        return results, variant
 
-        # Genomic coordinate: chr7:55249071 A>G
-        elif "chr" in variant_string.lower():
-            match = re.match(r'chr(\w+):(\d+)\s*([ACGT])>([ACGT])', variant_string, re.IGNORECASE)
-            if match:
-                results["chromosome"] = match.group(1)
-                results["position"] = int(match.group(2))
-                results["ref"] = match.group(3)
-                results["alt"] = match.group(4)
-                results["hgvs_validated"] = True
-                results["confidence"] = 0.9
-
-        # Simple format: 7:55249071A>G
-        else:
-            match = re.match(r'(\d+):(\d+)([ACGT])>([ACGT])', variant_string)
-            if match:
-                results["chromosome"] = match.group(1)
-                results["position"] = int(match.group(2))
-                results["ref"] = match.group(3)
-                results["alt"] = match.group(4)
-                results["confidence"] = 0.8
+    def lookup_range(self, chromosome: str, start: int, stop: Optional[int] = None,
+                     build: str = "hg38") -> List[Dict]:
+        """
+        ClinVar variants overlapping a genomic range
 
-        return results
+        Args:
+            chromosome: Chromosome (7, chr7, X, chrM, ...)
+            start: First position of the range (1-based)
+            stop: Last position, inclusive (defaults to start)
+            build: Genome build (hg38, hg19, etc.)
+
+        Returns:
+            One dictionary per ClinVar record, ordered by position
+        """
+        if not self.conn:
+            self.connect()
+        rows = self.conn.execute(VARIANTS_IN_RANGE_SQL, {
+            "assembly": clinvar_assembly(build),
+            "chromosome": clinvar_chromosome(chromosome),
+            "start": int(start),
+            "stop": int(start if stop is None else stop),
+            "span": self._location_span(),
+        })
+        return [self._clinvar_match(row) for row in rows]
+
+    def lookup_vcf(self, records: Iterable[Tuple], build: str = "hg38") -> List[List[Dict]]:
+        """
+        Resolve VCF-style records to ClinVar variants in one query
+
+        Args:
+            records: (chromosome, position, ref, alt) tuples, positions and
+                alleles as in a VCF. A comma-separated alt matches any of
+                its alleles; a None ref or alt matches any allele.
+            build: Genome build (hg38, hg19, etc.)
+
+        Returns:
+            The ClinVar records at each position with matching alleles,
+            one list per input record, in input order
+        """
+        if not self.conn:
+            self.connect()
+        records = list(records)
+        queries = []
+        for key, (chromosome, position, ref, alt) in enumerate(records):
+            ref = ref.upper() if ref else None
+            for allele in (alt.upper().split(",") if alt else [None]):
+                queries.append([key, clinvar_chromosome(chromosome), int(position),
+                                ref, allele])
+
+        matches = [[] for _ in records]
+        if queries:
+            rows = self.conn.execute(VARIANTS_AT_POSITIONS_SQL, {
+                "records": json.dumps(queries), "assembly": clinvar_assembly(build),
+            })
+            for row in rows:
+                matches[row["query"]].append(self._clinvar_match(row))
+        return matches
+
+    def _location_span(self) -> int:
+        build = self._build()
+        if build not in self._spans:
+            self._spans[build] = self.conn.execute(LOCATION_SPAN_SQL).fetchone()[0]
+        return self._spans[build]
+
+    @staticmethod
+    def _clinvar_match(row: sqlite3.Row) -> Dict:
+        return {
+            "variation_id": row["variation_id"],
+            "name": row["name"],
+            "gene_symbol": row["gene_symbol"],
+            "clinical_significance": row["clinical_significance"],
+            "rs_id": row["rs_id"],
+            "chromosome": row["chromosome"],
+            "start": row["start"],
+            "stop": row["stop"],
+            "ref_allele": row["ref_allele"],
+            "alt_allele": row["alt_allele"],
+            "type": row["type"]
+        }
 
 
 # ============================================================================
@@ -4,24 +4,117 @@ Parses OBO/OWL files and builds searchable local databases
 """
 
 import re
+import io
+import os
+import gc
 import sqlite3
 import json
+import pickle
+import hashlib
+import heapq
+import time
+import threading
+import traceback
+import multiprocessing
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Set
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Set
 from dataclasses import dataclass, field
 from collections import defaultdict
+from itertools import islice
+from operator import itemgetter
+from sys import intern
+from queue import Full
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import gzip
 
+try:
+    from .hgvs_parser import parse_clinvar_name
+except ImportError:     # run as a script from src/normalizers
+    from hgvs_parser import parse_clinvar_name
+
 
 # ============================================================================
 # DATA MODELS
 # ============================================================================
 
-@dataclass
+# Bump whenever parser output or the snapshot layout changes; this
+# invalidates every snapshot written by an older parser
+PARSER_VERSION = 4
+
+# Shared by every term with no synonyms/xrefs/parents/etc.
+_EMPTY: Tuple = ()
+
+
 class OBOTerm:
-    """Represents a single term from an OBO ontology"""
-    id: str
-    name: str
+    """
+    Represents a single term from an OBO ontology
+
+    Slotted and tuple-backed to keep hundreds of thousands of loaded terms
+    small: IDs, namespaces and ontology prefixes are interned, and empty
+    fields share the _EMPTY tuple.
+    """
+
+    __slots__ = ("id", "name", "definition", "synonyms", "xrefs", "is_a",
+                 "namespace", "is_obsolete", "alt_ids", "synonym_scopes",
+                 "relationships", "prefix")
+
+    def __init__(self, id: str, name: str, definition: str = "",
+                 synonyms: Iterable[str] = _EMPTY, xrefs: Iterable[str] = _EMPTY,
+                 is_a: Iterable[str] = _EMPTY, namespace: str = "",
+                 is_obsolete: bool = False, alt_ids: Iterable[str] = _EMPTY,
+                 synonym_scopes: Iterable[str] = _EMPTY,
+                 relationships: Iterable[Tuple[str, str]] = _EMPTY):
+        self.id = intern(id)
+        self.name = name
+        self.definition = definition
+        self.synonyms = tuple(synonyms) or _EMPTY
+        self.xrefs = tuple(xrefs) or _EMPTY
+        self.is_a = tuple(intern(parent_id) for parent_id in is_a) or _EMPTY
+        self.namespace = intern(namespace)
+        self.is_obsolete = is_obsolete
+        self.alt_ids = tuple(alt_ids) or _EMPTY
+        self.synonym_scopes = tuple(intern(scope) for scope in synonym_scopes) or _EMPTY
+        self.relationships = tuple((intern(rel_type), intern(target_id))
+                                   for rel_type, target_id in relationships) or _EMPTY
+        self.prefix = intern(id.partition(":")[0])
+
+    def _astuple(self) -> Tuple:
+        """Constructor arguments, in order (used for pickling and equality)"""
+        return (self.id, self.name, self.definition, self.synonyms, self.xrefs,
+                self.is_a, self.namespace, self.is_obsolete, self.alt_ids,
+                self.synonym_scopes, self.relationships)
+
+    def __reduce__(self):
+        # Positional rebuild is much smaller and faster than pickling slot
+        # state (parse-pool results; snapshots store the tuples themselves)
+        return (_restore_obo_term, self._astuple())
+
+    def __eq__(self, other):
+        if not isinstance(other, OBOTerm):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"OBOTerm(id='{self.id}', name='{self.name}')"
+
+
+def _restore_obo_term(*values) -> OBOTerm:
+    """Rebuild an OBOTerm from _astuple() values without re-normalising them"""
+    term = object.__new__(OBOTerm)
+    (term.id, term.name, term.definition, term.synonyms, term.xrefs,
+     term.is_a, term.namespace, term.is_obsolete, term.alt_ids,
+     term.synonym_scopes, term.relationships) = values
+    term.prefix = intern(term.id.partition(":")[0])
+    return term
+
+
+@dataclass
+class _OBOTermBuilder:
+    """Mutable accumulator for one [Term] stanza while it is being parsed"""
+    id: str = ""
+    name: str = ""
     definition: str = ""
     synonyms: List[str] = field(default_factory=list)
     xrefs: List[str] = field(default_factory=list)
@@ -29,108 +122,422 @@ class OBOTerm:
     namespace: str = ""
     is_obsolete: bool = False
     alt_ids: List[str] = field(default_factory=list)
+    synonym_scopes: List[str] = field(default_factory=list)  # Parallel to synonyms
+    relationships: List[Tuple[str, str]] = field(default_factory=list)  # (type, target)
 
-    def __repr__(self):
-        return f"OBOTerm(id='{self.id}', name='{self.name}')"
+    def build(self) -> OBOTerm:
+        return OBOTerm(self.id, self.name, self.definition, self.synonyms,
+                       self.xrefs, self.is_a, self.namespace, self.is_obsolete,
+                       self.alt_ids, self.synonym_scopes, self.relationships)
 
 
 # ============================================================================
 # OBO PARSER
 # ============================================================================
 
-class OBOParser:
+# Quoted text at the start of def/synonym values; a synonym may be followed
+# by its scope keyword (OBO 1.2 defaults a missing scope to RELATED)
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+_SYNONYM_RE = re.compile(r'"([^"]+)"(?:\s+(EXACT|BROAD|NARROW|RELATED)\b)?')
+
+
+def _tag_id(term: _OBOTermBuilder, value: str):
+    term.id = value
+
+
+def _tag_name(term: _OBOTermBuilder, value: str):
+    term.name = value
+
+
+def _tag_def(term: _OBOTermBuilder, value: str):
+    # Extract definition (remove quotes and metadata)
+    match = _QUOTED_RE.match(value)
+    if match:
+        term.definition = match.group(1)
+
+
+def _tag_synonym(term: _OBOTermBuilder, value: str):
+    match = _SYNONYM_RE.match(value)
+    if match:
+        term.synonyms.append(match.group(1))
+        term.synonym_scopes.append(match.group(2) or "RELATED")
+
+
+def _tag_xref(term: _OBOTermBuilder, value: str):
+    term.xrefs.append(value)
+
+
+def _tag_is_a(term: _OBOTermBuilder, value: str):
+    # "GO:0000001 ! name" -> parent ID is the first token
+    parts = value.split(None, 1)
+    if parts:
+        term.is_a.append(parts[0])
+
+
+def _tag_relationship(term: _OBOTermBuilder, value: str):
+    # "part_of GO:0005634 ! nucleus" -> ("part_of", "GO:0005634")
+    parts = value.split(None, 2)
+    if len(parts) >= 2:
+        term.relationships.append((parts[0], parts[1]))
+
+
+def _tag_namespace(term: _OBOTermBuilder, value: str):
+    term.namespace = value
+
+
+def _tag_is_obsolete(term: _OBOTermBuilder, value: str):
+    term.is_obsolete = (value.lower() == "true")
+
+
+def _tag_alt_id(term: _OBOTermBuilder, value: str):
+    term.alt_ids.append(value)
+
+
+# Tag -> handler; tags not listed here are ignored
+_TAG_HANDLERS = {
+    "id": _tag_id,
+    "name": _tag_name,
+    "def": _tag_def,
+    "synonym": _tag_synonym,
+    "xref": _tag_xref,
+    "is_a": _tag_is_a,
+    "relationship": _tag_relationship,
+    "namespace": _tag_namespace,
+    "is_obsolete": _tag_is_obsolete,
+    "alt_id": _tag_alt_id,
+}
+
+
+def iter_obo_terms(lines: Iterable[str]) -> Iterator[OBOTerm]:
+    """Yield every [Term] stanza found in an iterable of OBO lines"""
+
+    handlers = _TAG_HANDLERS
+    current_term = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Stanza header: "[Term]" opens a term, anything else closes it
+        if line[0] == "[":
+            if current_term is not None and current_term.id:
+                yield current_term.build()
+            current_term = _OBOTermBuilder() if line == "[Term]" else None
+            continue
+
+        if current_term is None:
+            continue
+
+        tag, sep, value = line.partition(":")
+        if not sep:
+            continue
+
+        handler = handlers.get(tag)
+        if handler is not None:
+            handler(current_term, value.strip())
+
+    # Last term
+    if current_term is not None and current_term.id:
+        yield current_term.build()
+
+
+# Read buffer for (decompressed) text input
+READ_BUFFER_SIZE = 1 << 20
+
+
+def is_compressed(filepath: Path) -> bool:
+    """True for .gz/.zst inputs, which are decompressed while streaming"""
+    return filepath.suffix.lower() in ('.gz', '.zst')
+
+
+def open_text(filepath: Path, errors: str = 'strict') -> io.TextIOBase:
     """
-    Fast parser for OBO (Open Biomedical Ontologies) format files
-    Handles: DOID, SO, GO, HPO, MONDO
+    Open a plain, gzip (.gz) or Zstandard (.zst) file as UTF-8 text
+
+    Compressed files are decompressed on the fly through a large read
+    buffer, so parsers can stream them without an uncompressed copy on
+    disk. .zst support needs the optional `zstandard` package.
     """
+    filepath = Path(filepath)
+    suffix = filepath.suffix.lower()
+
+    if suffix == '.gz':
+        raw = gzip.open(filepath, 'rb')
+    elif suffix == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                f"Reading {filepath.name} requires the zstandard package\n"
+                "Please run: pip install zstandard"
+            )
+        raw = zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'),
+                                                         closefd=True)
+    else:
+        return open(filepath, 'r', encoding='utf-8', errors=errors,
+                    buffering=READ_BUFFER_SIZE)
 
-    def __init__(self, filepath: str):
-        self.filepath = Path(filepath)
-        self.terms: Dict[str, OBOTerm] = {}
-        self.name_to_id: Dict[str, str] = {}
-        self.synonym_to_id: Dict[str, List[str]] = defaultdict(list)
+    return io.TextIOWrapper(io.BufferedReader(raw, READ_BUFFER_SIZE),
+                            encoding='utf-8', errors=errors)
 
-    def parse(self) -> Dict[str, OBOTerm]:
-        """Parse OBO file and return dictionary of terms"""
 
-        print(f"📖 Parsing {self.filepath.name}...")
+def find_input_file(directory: Path, filename: str) -> Optional[Path]:
+    """Return directory/filename, or its .gz/.zst variant if only that exists"""
+    for candidate in (filename, f"{filename}.gz", f"{filename}.zst"):
+        path = directory / candidate
+        if path.exists():
+            return path
+    return None
 
-        current_term = None
-        in_term = False
 
-        with open(self.filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line_num, line in enumerate(f, 1):
-                line = line.strip()
+def file_sha256(filepath: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in large blocks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-                # Start of new term
-                if line == "[Term]":
-                    if current_term and current_term.id:
-                        self._add_term(current_term)
-                    current_term = OBOTerm(id="", name="")
-                    in_term = True
-                    continue
 
-                # End of term section
-                elif line.startswith("[") and line != "[Term]":
-                    if current_term and current_term.id:
-                        self._add_term(current_term)
-                    current_term = None
-                    in_term = False
-                    continue
+def read_obo_header(filepath: Path) -> Dict[str, str]:
+    """Header tags (format-version, data-version, ...) before the first stanza"""
+    header = {}
+    with open_text(filepath, errors='ignore') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                break
+            tag, sep, value = line.partition(":")
+            if sep:
+                header.setdefault(tag, value.strip())
+    return header
 
-                # Skip if not in term
-                if not in_term or not current_term:
-                    continue
 
-                # Parse term fields
-                if ":" not in line:
-                    continue
+def clinvar_row_hash(row: Tuple[str, ...]) -> int:
+    """Signed 64-bit content hash of a ClinVar row (CLINVAR_COLUMNS order)"""
+    digest = hashlib.blake2b("\x1f".join(row).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def split_obo_stanzas(filepath: Path, n_chunks: int) -> List[Tuple[int, int]]:
+    """
+    Split an OBO file into at most n_chunks (start, end) byte ranges
+
+    Every range after the first begins on a stanza header line ("[Term]",
+    "[Typedef]", ...), so each range can be parsed independently.
+    """
+    size = filepath.stat().st_size
+    offsets = [0]
+
+    with open(filepath, 'rb') as f:
+        for i in range(1, n_chunks):
+            target = size * i // n_chunks
+            if target <= offsets[-1]:
+                continue
 
-                key, value = line.split(":", 1)
-                value = value.strip()
+            f.seek(target)
+            f.readline()  # Skip the (possibly partial) line at the target
+
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line:
+                    pos = size
+                    break
+                if line.startswith(b"["):
+                    break
+
+            if offsets[-1] < pos < size:
+                offsets.append(pos)
+
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
 
-                if key == "id":
-                    current_term.id = value
 
-                elif key == "name":
-                    current_term.name = value
+def _parse_obo_chunk(task: Tuple[str, int, int]) -> List[OBOTerm]:
+    """Process pool entry point: parse one byte range of an OBO file"""
+    filepath, start, end = task
 
-                elif key == "def":
-                    # Extract definition (remove quotes and metadata)
-                    match = re.match(r'"([^"]+)"', value)
-                    if match:
-                        current_term.definition = match.group(1)
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    return list(iter_obo_terms(data.decode('utf-8', errors='ignore').split("\n")))
+
+
+class OBOParser:
+    """
+    Fast parser for OBO (Open Biomedical Ontologies) format files
+    Handles: DOID, SO, GO, HPO, MONDO
+    """
 
-                elif key == "synonym":
-                    # Extract synonym text
-                    match = re.match(r'"([^"]+)"', value)
-                    if match:
-                        current_term.synonyms.append(match.group(1))
+    def __init__(self, filepath: str, search_index: bool = True):
+        """
+        Args:
+            filepath: Path to the .obo file
+            search_index: Maintain the trigram index used by fuzzy_search.
+                Database builds never search and can skip its cost.
+        """
+        self.filepath = Path(filepath)
+        self.search_index = search_index
+        self.terms: Dict[str, OBOTerm] = {}  # Canonical IDs only
+        self.alt_id_to_id: Dict[str, str] = {}
+        self.name_to_id: Dict[str, str] = {}
+        self.synonym_to_id: Dict[str, List[str]] = defaultdict(list)
 
-                elif key == "xref":
-                    current_term.xrefs.append(value)
+        # Fuzzy search index: entry ordinal -> term / lowered name / lowered
+        # synonyms, plus trigram -> ascending ordinals of entries containing it
+        self._search_terms: List[OBOTerm] = []
+        self._search_names: List[str] = []
+        self._search_synonyms: List[Tuple[str, ...]] = []
+        self._trigram_index: Dict[str, List[int]] = defaultdict(list)
 
-                elif key == "is_a":
-                    # Extract parent ID
-                    parent_id = value.split("!")[0].strip()
-                    current_term.is_a.append(parent_id)
+    def parse(self, workers: int = 1) -> Dict[str, OBOTerm]:
+        """
+        Parse OBO file and return dictionary of terms
 
-                elif key == "namespace":
-                    current_term.namespace = value
+        Args:
+            workers: Number of worker processes. With more than one worker
+                the file is split into stanza-aligned byte ranges that are
+                parsed in a process pool and merged in file order.
+        """
 
-                elif key == "is_obsolete":
-                    current_term.is_obsolete = (value.lower() == "true")
+        print(f"📖 Parsing {self.filepath.name}...")
 
-                elif key == "alt_id":
-                    current_term.alt_ids.append(value)
+        if workers > 1 and is_compressed(self.filepath):
+            # Byte-offset chunking needs a seekable plain-text file
+            print("  ℹ️  Compressed input: parsing serially")
+            workers = 1
 
-        # Add last term
-        if current_term and current_term.id:
-            self._add_term(current_term)
+        if workers > 1:
+            for chunk_terms in self._parse_chunks(workers):
+                for term in chunk_terms:
+                    self._add_term(term)
+        else:
+            with open_text(self.filepath, errors='ignore') as f:
+                for term in iter_obo_terms(f):
+                    self._add_term(term)
 
         print(f"  ✅ Parsed {len(self.terms)} terms")
         return self.terms
 
+    def parse_cached(self, snapshot_dir: str = "data/indices",
+                     workers: int = 1,
+                     sha256: Optional[str] = None) -> Dict[str, OBOTerm]:
+        """
+        Parse OBO file, reusing an on-disk snapshot when one is current
+
+        Snapshots are keyed by the SHA-256 of the source file and by
+        PARSER_VERSION, so editing the file or upgrading the parser
+        invalidates them automatically.
+
+        Args:
+            snapshot_dir: Directory holding the snapshot files
+            workers: Worker processes used if the file must be re-parsed
+            sha256: The file's digest, if the caller already computed it
+        """
+        snapshot_dir = Path(snapshot_dir)
+        digest = sha256 or file_sha256(self.filepath)
+        snapshot_path = snapshot_dir / (
+            f"{self.filepath.name}.{digest[:16]}.v{PARSER_VERSION}.snapshot"
+        )
+
+        if snapshot_path.exists() and self._load_snapshot(snapshot_path, digest):
+            print(f"📦 Loaded {self.filepath.name} snapshot ({len(self.terms)} terms)")
+            return self.terms
+
+        self.parse(workers=workers)
+        self._write_snapshot(snapshot_path, digest)
+        return self.terms
+
+    def _snapshot_state(self) -> Tuple:
+        """
+        Everything a snapshot must restore, as plain builtins
+
+        Terms are stored as their constructor tuples, and the search index
+        refers to them by position, so the pickle holds no classes or
+        functions: a snapshot loads whichever way this module was imported
+        (src.normalizers.local_ontology_parsers, or as a script).
+        """
+        rows: List[Tuple] = []
+        positions: Dict[int, int] = {}
+
+        def position(term: OBOTerm) -> int:
+            if id(term) not in positions:
+                positions[id(term)] = len(rows)
+                rows.append(term._astuple())
+            return positions[id(term)]
+
+        terms = [(term_id, position(term)) for term_id, term in self.terms.items()]
+        search_terms = [position(term) for term in self._search_terms]
+        return (rows, terms, self.alt_id_to_id, self.name_to_id,
+                dict(self.synonym_to_id), search_terms, self._search_names,
+                self._search_synonyms, dict(self._trigram_index))
+
+    def _restore_snapshot_state(self, state: Tuple):
+        (rows, terms, self.alt_id_to_id, self.name_to_id, synonym_to_id,
+         search_terms, self._search_names, self._search_synonyms,
+         trigram_index) = state
+        objects = [_restore_obo_term(*row) for row in rows]
+        self.terms = {term_id: objects[i] for term_id, i in terms}
+        self._search_terms = [objects[i] for i in search_terms]
+        self.synonym_to_id = defaultdict(list, synonym_to_id)
+        self._trigram_index = defaultdict(list, trigram_index)
+
+        # Snapshot was written by a parser that skipped the search index
+        if self.search_index and not self._search_terms:
+            for term in self.terms.values():
+                self._index_for_search(term, term.name.lower())
+
+    def _load_snapshot(self, snapshot_path: Path, digest: str) -> bool:
+        """Restore parser state from a snapshot; False if it is unusable"""
+        # Unpickling creates many small objects; pausing the cyclic GC
+        # roughly halves load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(snapshot_path, 'rb') as f:
+                version, snapshot_digest, state = pickle.load(f)
+        except Exception as e:
+            print(f"  ⚠️  Ignoring unreadable snapshot {snapshot_path.name}: {e}")
+            return False
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        if version != PARSER_VERSION or snapshot_digest != digest:
+            return False
+
+        self._restore_snapshot_state(state)
+        return True
+
+    def _write_snapshot(self, snapshot_path: Path, digest: str):
+        """Atomically write a snapshot and drop stale ones for this file"""
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Only this file's snapshots: "go.obo.*" would also match go.obo.gz's
+        name = self.filepath.name
+        own = re.compile(re.escape(name) + r"\.[0-9a-f]{16}\.v\d+\.snapshot")
+        for stale in snapshot_path.parent.glob(f"{name}.*.v*.snapshot"):
+            if stale != snapshot_path and own.fullmatch(stale.name):
+                stale.unlink()
+
+        tmp_path = snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((PARSER_VERSION, digest, self._snapshot_state()), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+
+    def _parse_chunks(self, workers: int) -> List[List[OBOTerm]]:
+        """Parse stanza-aligned chunks of the file in a process pool"""
+        # Several chunks per worker keeps the pool busy when stanza sizes vary
+        ranges = split_obo_stanzas(self.filepath, workers * 4)
+        tasks = [(str(self.filepath), start, end) for start, end in ranges]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_parse_obo_chunk, tasks))
+
     def _add_term(self, term: OBOTerm):
         """Add term to indices"""
         if term.is_obsolete:
@@ -149,11 +556,32 @@ class OBOParser:
 
         # Index alt IDs
         for alt_id in term.alt_ids:
-            self.terms[alt_id] = term  # Point alt ID to same term
+            self.alt_id_to_id[alt_id] = term.id
+
+        if self.search_index:
+            self._index_for_search(term, name_lower)
+
+    def _index_for_search(self, term: OBOTerm, name_lower: str):
+        """Add a term's lowered name and synonyms to the trigram index"""
+        ordinal = len(self._search_terms)
+        synonyms_lower = tuple(synonym.lower() for synonym in term.synonyms)
+
+        self._search_terms.append(term)
+        self._search_names.append(name_lower)
+        self._search_synonyms.append(synonyms_lower)
+
+        # One pass over all strings; trigrams spanning the NUL separator
+        # can never match a query
+        index = self._trigram_index
+        for trigram in _trigrams("\0".join((name_lower,) + synonyms_lower)):
+            index[trigram].append(ordinal)
 
     def get_term_by_id(self, term_id: str) -> Optional[OBOTerm]:
-        """Get term by ID"""
-        return self.terms.get(term_id)
+        """Get term by ID (alt IDs resolve to their canonical term)"""
+        term = self.terms.get(term_id)
+        if term is None and term_id in self.alt_id_to_id:
+            term = self.terms.get(self.alt_id_to_id[term_id])
+        return term
 
     def get_term_by_name(self, name: str) -> Optional[OBOTerm]:
         """Get term by exact name match"""
@@ -170,41 +598,96 @@ class OBOParser:
         return [self.terms[tid] for tid in term_ids]
 
     def fuzzy_search(self, query: str, limit: int = 10) -> List[Tuple[OBOTerm, float]]:
-        """Fuzzy search for terms (returns term and similarity score)"""
+        """
+        Fuzzy search for terms (returns term and similarity score)
+
+        Scores: 1.0 exact name, 0.9 x coverage for a name containing the
+        query, 0.8 x coverage for a synonym containing it. Candidates come
+        from the trigram index, so only entries that can contain the query
+        are scored.
+        """
         query_lower = query.lower()
+        names = self._search_names
         results = []
 
-        for term in self.terms.values():
-            if term.is_obsolete:
-                continue
+        for ordinal in self._search_candidates(query_lower):
+            term = self._search_terms[ordinal]
+            if self.terms.get(term.id) is not term:
+                continue  # Superseded by a later stanza with the same ID
+
+            name_lower = names[ordinal]
 
             # Exact match
-            if term.name.lower() == query_lower:
+            if name_lower == query_lower:
                 results.append((term, 1.0))
                 continue
 
             # Contains match
-            if query_lower in term.name.lower():
+            if query_lower in name_lower:
                 score = len(query) / len(term.name)
                 results.append((term, score * 0.9))
                 continue
 
             # Synonym match
-            for syn in term.synonyms:
-                if query_lower in syn.lower():
+            for syn in self._search_synonyms[ordinal]:
+                if query_lower in syn:
                     score = len(query) / len(syn)
                     results.append((term, score * 0.8))
                     break
 
-        # Sort by score and limit
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:limit]
+        # Top `limit` by score; ties keep index order like a stable sort
+        return heapq.nlargest(limit, results, key=itemgetter(1))
+
+    def _search_candidates(self, query_lower: str) -> List[int]:
+        """Ascending ordinals of entries that may contain query_lower"""
+        if len(query_lower) < 3:
+            return range(len(self._search_terms))
+
+        postings = []
+        for trigram in _trigrams(query_lower):
+            posting = self._trigram_index.get(trigram)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        # Intersect rarest-first and stop once few candidates remain;
+        # the substring check in fuzzy_search settles the rest
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) <= 32:
+                break
+            candidates = candidates.intersection(posting)
+
+        return sorted(candidates)
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Distinct 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
 
 
 # ============================================================================
 # CLINVAR PARSER
 # ============================================================================
 
+# variants table column -> variant_summary.txt header, in table order
+CLINVAR_COLUMNS = [
+    ('variation_id', 'VariationID'),
+    ('name', 'Name'),
+    ('gene_symbol', 'GeneSymbol'),
+    ('clinical_significance', 'ClinicalSignificance'),
+    ('rs_id', 'RS# (dbSNP)'),
+    ('rcv_accession', 'RCVaccession'),
+    ('chromosome', 'Chromosome'),
+    ('position', 'PositionVCF'),
+    ('ref_allele', 'ReferenceAlleleVCF'),
+    ('alt_allele', 'AlternateAlleleVCF'),
+    ('type', 'Type'),
+    ('assembly', 'Assembly'),
+]
+
+
 class ClinVarParser:
     """
     Parser for ClinVar variant_summary.txt file
@@ -221,7 +704,7 @@ class ClinVarParser:
         print(f"📖 Parsing ClinVar ({self.filepath.name})...")
 
         count = 0
-        with open(self.filepath, 'r', encoding='utf-8') as f:
+        with open_text(self.filepath) as f:
             # Read header
             header = f.readline().strip().split('\t')
 
@@ -265,6 +748,45 @@ class ClinVarParser:
         print(f"  ✅ Parsed {len(self.variants):,} variants")
         return self.variants
 
+    def iter_rows(self, limit: Optional[int] = None) -> Iterator[Tuple[str, ...]]:
+        """
+        Stream variants as tuples in CLINVAR_COLUMNS order
+
+        Column positions are resolved once from the header, and nothing is
+        kept in memory, so the full variant_summary file can be ingested.
+        Columns missing from the header come back as empty strings.
+        """
+
+        print(f"📖 Streaming ClinVar ({self.filepath.name})...")
+
+        count = 0
+        with open_text(self.filepath) as f:
+            header = f.readline().rstrip('\r\n').split('\t')
+            positions = {column: i for i, column in enumerate(header)}
+
+            # Missing columns read an always-empty extra field
+            missing = len(header)
+            indexes = [positions.get(column, missing) for _, column in CLINVAR_COLUMNS]
+            pick = itemgetter(*indexes)
+            pad = [""] if missing in indexes else []
+            id_index = indexes[0]
+
+            for line in f:
+                if limit and count >= limit:
+                    break
+
+                fields = line.rstrip('\r\n').split('\t')
+                if len(fields) < len(header) or not fields[id_index]:
+                    continue
+
+                yield pick(fields + pad if pad else fields)
+
+                count += 1
+                if count % 100000 == 0:
+                    print(f"  ... streamed {count:,} variants")
+
+        print(f"  ✅ Streamed {count:,} variants")
+
     def get_by_variation_id(self, var_id: str) -> Optional[Dict]:
         """Get variant by ClinVar Variation ID"""
         return self.variants.get(var_id)
@@ -276,6 +798,223 @@ class ClinVarParser:
                 if v['gene_symbol'].upper() == gene_upper]
 
 
+# ============================================================================
+# DATABASE ROWS
+# ============================================================================
+
+ONTOLOGY_INSERT_SQL = {
+    "terms": """
+        INSERT OR REPLACE INTO terms
+        (term_id, ontology, name, definition, namespace, is_obsolete)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "synonyms": "INSERT INTO synonyms (term_id, synonym, scope) VALUES (?, ?, ?)",
+    "alt_ids": "INSERT OR REPLACE INTO alt_ids (alt_id, term_id) VALUES (?, ?)",
+    "xrefs": "INSERT INTO xrefs (term_id, xref) VALUES (?, ?)",
+    "relationships": """
+        INSERT INTO relationships (child_id, parent_id, relationship_type)
+        VALUES (?, ?, ?)
+    """,
+}
+
+# Filled from each variant's Name by clinvar_name_columns(), in this order
+CLINVAR_NAME_COLUMNS = ["transcript", "hgvs_gene", "cdna_change",
+                        "protein_change", "protein_change_3"]
+
+VARIANT_INSERT_SQL = """
+    INSERT OR REPLACE INTO variants
+    (variation_id, name, gene_symbol, clinical_significance,
+     rs_id, rcv_accession, chromosome, position, ref_allele,
+     alt_allele, type, assembly, transcript, hgvs_gene, cdna_change,
+     protein_change, protein_change_3, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def clinvar_name_columns(name: str) -> Tuple[Optional[str], ...]:
+    """
+    CLINVAR_NAME_COLUMNS values for a ClinVar Name
+
+    "NM_005228.5(EGFR):c.2573T>G (p.Leu858Arg)" -> ("NM_005228.5", "EGFR",
+    "c.2573T>G", "p.L858R", "p.Leu858Arg"); parts the name lacks are None.
+    """
+    nucleotide, protein = parse_clinvar_name(name)
+    transcript = gene = cdna_change = None
+    if nucleotide is not None:
+        transcript, gene = nucleotide.accession, nucleotide.gene
+        if nucleotide.level == "c":
+            cdna_change = nucleotide.format()
+    if protein is None:
+        return transcript, gene, cdna_change, None, None
+    return transcript, gene, cdna_change, protein.format(), protein.format(three_letter=True)
+
+
+def variant_rows(batch: List[Tuple[str, ...]]) -> List[Tuple]:
+    """ClinVar rows (CLINVAR_COLUMNS order) as VARIANT_INSERT_SQL parameters"""
+    return [row + clinvar_name_columns(row[1]) + (clinvar_row_hash(row),) for row in batch]
+
+
+VARIANT_LOCATION_INSERT_SQL = """
+    INSERT OR REPLACE INTO variant_locations
+    (assembly, chromosome, start, stop, variation_id, ref_allele, alt_allele)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def variant_location_rows(batch: Iterable[Tuple[str, ...]]) -> List[Tuple]:
+    """
+    ClinVar rows (CLINVAR_COLUMNS order) as VARIANT_LOCATION_INSERT_SQL parameters
+
+    Positions are the VCF ones, so a location spans its reference allele.
+    Rows without a usable assembly, chromosome or position (ClinVar writes
+    "na" and -1 for those) are dropped.
+    """
+    locations = []
+    for variation_id, _, _, _, _, _, chromosome, position, ref, alt, _, assembly in batch:
+        if not position.isdigit() or not chromosome or chromosome == "na" \
+                or not assembly or assembly == "na":
+            continue
+        start = int(position)
+        ref = "" if ref == "na" else ref
+        alt = "" if alt == "na" else alt
+        locations.append((assembly, chromosome, start, start + max(len(ref), 1) - 1,
+                          variation_id, ref, alt))
+    return locations
+
+
+def ontology_rows(ontology_name: str,
+                  canonical: List[OBOTerm]) -> Iterator[Tuple[str, Iterator[tuple]]]:
+    """
+    Yield (table, row generator) pairs for one ontology's canonical terms
+
+    Shared by OntologyDatabaseBuilder.insert_ontology() and the pipelined
+    build, so both write exactly the same rows (see ONTOLOGY_INSERT_SQL).
+    """
+    yield "terms", ((term.id, ontology_name, term.name, term.definition,
+                     term.namespace, int(term.is_obsolete)) for term in canonical)
+    yield "synonyms", ((term.id, synonym, scope) for term in canonical
+                       for synonym, scope in zip(term.synonyms, term.synonym_scopes))
+    yield "alt_ids", ((alt_id, term.id) for term in canonical for alt_id in term.alt_ids)
+    yield "xrefs", ((term.id, xref) for term in canonical for xref in term.xrefs)
+    # Hierarchical relationships: is_a edges, then typed relationship: edges
+    yield "relationships", ((term.id, parent_id, 'is_a') for term in canonical
+                            for parent_id in term.is_a)
+    yield "relationships", ((term.id, target_id, relationship_type) for term in canonical
+                            for relationship_type, target_id in term.relationships)
+
+
+# ============================================================================
+# TERM HIERARCHY
+# ============================================================================
+
+@dataclass
+class HierarchyLabels:
+    """is_a closure and interval labels of one ontology (see hierarchy_labels)"""
+    closure: Dict[str, Dict[str, int]]           # descendant -> {ancestor: depth}
+    post: Dict[str, int]                         # term -> post-order number
+    intervals: Dict[str, List[Tuple[int, int]]]  # term -> merged [lo, hi] ranges
+
+
+def _merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def hierarchy_labels(term_ids: Iterable[str],
+                     edges: Iterable[Tuple[str, str]]) -> HierarchyLabels:
+    """
+    Label one ontology's is_a DAG for constant-time subsumption checks
+
+    closure maps every term to all of its ancestors with the length of the
+    shortest is_a path. For the interval labels (Agrawal, Borgida &
+    Jagadish's compressed closure), terms are numbered in post-order over a
+    spanning forest (each term under its first parent), so a tree subtree
+    is one contiguous range; each term then gets its own range merged with
+    its children's ranges. D is a descendant of A (or A itself) iff post[D]
+    falls in one of A's ranges. Ranges merge well because most of a DAG is
+    tree-shaped, so most terms need a single one.
+
+    Args:
+        term_ids: All terms of the ontology
+        edges: (child, parent) is_a pairs; parents outside term_ids are ignored
+
+    Returns:
+        HierarchyLabels; ancestors of terms on an is_a cycle are incomplete
+        (such cycles are errors in the source ontology)
+    """
+    term_ids = sorted(set(term_ids))
+    parents: Dict[str, List[str]] = {term_id: [] for term_id in term_ids}
+    children: Dict[str, List[str]] = {term_id: [] for term_id in term_ids}
+    for child, parent in edges:
+        if child in parents and parent in parents and parent != child:
+            parents[child].append(parent)
+            children[parent].append(child)
+    for term_id in term_ids:
+        parents[term_id].sort()
+        children[term_id].sort()
+
+    # Topological order, parents first (Kahn); terms on cycles go last
+    waiting = {term_id: len(parents[term_id]) for term_id in term_ids}
+    order = [term_id for term_id in term_ids if not waiting[term_id]]
+    for term_id in order:
+        for child in children[term_id]:
+            waiting[child] -= 1
+            if not waiting[child]:
+                order.append(child)
+    if len(order) < len(term_ids):
+        placed = set(order)
+        order.extend(term_id for term_id in term_ids if term_id not in placed)
+
+    closure: Dict[str, Dict[str, int]] = {}
+    for term_id in order:
+        ancestors: Dict[str, int] = {}
+        for parent in parents[term_id]:
+            ancestors[parent] = 1
+            for ancestor, depth in closure.get(parent, {}).items():
+                if depth + 1 < ancestors.get(ancestor, depth + 2):
+                    ancestors[ancestor] = depth + 1
+        ancestors.pop(term_id, None)
+        closure[term_id] = ancestors
+
+    # Post-order over the spanning forest, iteratively (hierarchies are deep)
+    tree_children: Dict[str, List[str]] = defaultdict(list)
+    for term_id in term_ids:
+        if parents[term_id]:
+            tree_children[parents[term_id][0]].append(term_id)
+    post: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    # Roots first, then any term a cycle kept out of reach of one
+    for root in [term_id for term_id in term_ids if not parents[term_id]] + term_ids:
+        if root in low:
+            continue
+        stack = [(root, iter(tree_children[root]))]
+        low[root] = len(post)
+        while stack:
+            term_id, pending = stack[-1]
+            child = next(pending, None)
+            if child is None:
+                post[term_id] = len(post)
+                stack.pop()
+            elif child not in post and child not in low:
+                low[child] = len(post)
+                stack.append((child, iter(tree_children[child])))
+
+    intervals: Dict[str, List[Tuple[int, int]]] = {}
+    for term_id in reversed(order):
+        own = [(low[term_id], post[term_id])]
+        for child in children[term_id]:
+            own.extend(intervals.get(child, ()))
+        intervals[term_id] = _merge_intervals(own)
+
+    return HierarchyLabels(closure, post, intervals)
+
+
 # ============================================================================
 # SQLITE DATABASE BUILDER
 # ============================================================================
@@ -285,9 +1024,18 @@ class OntologyDatabaseBuilder:
     Builds SQLite databases from parsed ontologies for fast querying
     """
 
-    def __init__(self, db_path: str = "data/databases/ontologies.db"):
+    def __init__(self, db_path: str = "data/databases/ontologies.db",
+                 fast_build: bool = False):
+        """
+        Args:
+            db_path: SQLite database file
+            fast_build: Trade crash safety for bulk-load speed (no rollback
+                journal, no fsync, large page cache). A failed write cannot
+                be rolled back, so only use it on a scratch copy.
+        """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fast_build = fast_build
         self.conn = None
 
     def connect(self):
@@ -295,13 +1043,24 @@ class OntologyDatabaseBuilder:
         self.conn = sqlite3.connect(str(self.db_path))
         self.conn.row_factory = sqlite3.Row
 
+        if self.fast_build:
+            self.conn.execute("PRAGMA journal_mode = OFF")
+            self.conn.execute("PRAGMA synchronous = OFF")
+            self.conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+            self.conn.execute("PRAGMA temp_store = MEMORY")
+
     def close(self):
         """Close database connection"""
         if self.conn:
             self.conn.close()
 
     def create_schema(self):
-        """Create database schema"""
+        """
+        Create database tables
+
+        Indices are not created here: loading into bare tables is much
+        faster, so call finalize() once all data has been inserted.
+        """
         cursor = self.conn.cursor()
 
         # Main terms table
@@ -321,6 +1080,7 @@ class OntologyDatabaseBuilder:
             CREATE TABLE IF NOT EXISTS synonyms (
                 term_id TEXT NOT NULL,
                 synonym TEXT NOT NULL,
+                scope TEXT DEFAULT 'RELATED',
                 FOREIGN KEY (term_id) REFERENCES terms(term_id)
             )
         """)
@@ -334,6 +1094,15 @@ class OntologyDatabaseBuilder:
             )
         """)
 
+        # Obsolete/merged IDs that resolve to a canonical term
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS alt_ids (
+                alt_id TEXT PRIMARY KEY,
+                term_id TEXT NOT NULL,
+                FOREIGN KEY (term_id) REFERENCES terms(term_id)
+            )
+        """)
+
         # Hierarchical relationships
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS relationships (
@@ -359,165 +1128,1152 @@ class OntologyDatabaseBuilder:
                 ref_allele TEXT,
                 alt_allele TEXT,
                 type TEXT,
-                assembly TEXT
+                assembly TEXT,
+                transcript TEXT,
+                hgvs_gene TEXT,
+                cdna_change TEXT,
+                protein_change TEXT,
+                protein_change_3 TEXT,
+                content_hash INTEGER
             )
         """)
 
-        # Create indices
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_term_name ON terms(name COLLATE NOCASE)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_term_ontology ON terms(ontology)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_synonym ON synonyms(synonym COLLATE NOCASE)")
+        # Genomic location of every ClinVar record, one row per assembly
+        # (variants keeps one row per variation_id), clustered on
+        # (assembly, chromosome, start) for coordinate and range lookups.
+        # Filled on insert; older databases are backfilled from variants.
+        has_locations = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'variant_locations'").fetchone()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS variant_locations (
+                assembly TEXT NOT NULL,
+                chromosome TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                stop INTEGER NOT NULL,
+                variation_id TEXT NOT NULL,
+                ref_allele TEXT NOT NULL,
+                alt_allele TEXT NOT NULL,
+                PRIMARY KEY (assembly, chromosome, start, variation_id,
+                             ref_allele, alt_allele)
+            ) WITHOUT ROWID
+        """)
+
+        # Which release/file each source was last loaded from
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                version TEXT,
+                sha256 TEXT,
+                file_size INTEGER,
+                file_mtime REAL,
+                parser_version INTEGER,
+                row_count INTEGER,
+                updated_at TEXT
+            )
+        """)
+
+        # Full-text index over term labels, filled by index_term_search():
+        # one row per name (name column) and per synonym (synonym column),
+        # so bm25() length-normalizes each label on its own. ontology is
+        # indexed so a query can be restricted to one ontology in MATCH.
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS term_search USING fts5(
+                term_id UNINDEXED,
+                ontology,
+                name,
+                synonym
+            )
+        """)
+
+        # is_a hierarchy labels, filled by index_term_closure(): each
+        # term's post-order number (unique across ontologies) and descendant
+        # ranges (hierarchy_labels), and every (descendant, ancestor) pair
+        # with its shortest depth. Closure rows hold post-order numbers, not
+        # IDs, and so do interval rows, to stay compact.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS term_closure (
+                descendant INTEGER NOT NULL,
+                ancestor INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (descendant, ancestor)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS term_order (
+                term_id TEXT PRIMARY KEY,
+                ontology TEXT NOT NULL,
+                post INTEGER NOT NULL UNIQUE
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS term_intervals (
+                post INTEGER NOT NULL,
+                lo INTEGER NOT NULL,
+                hi INTEGER NOT NULL,
+                PRIMARY KEY (post, lo)
+            ) WITHOUT ROWID
+        """)
+
+        # Trigram index over ClinVar names for VariantNormalizer's substring
+        # searches; external content, so names are not stored twice.
+        # Filled by index_variant_names().
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS variant_names USING fts5(
+                name,
+                content='variants',
+                content_rowid='rowid',
+                tokenize='trigram'
+            )
+        """)
+
+        # Databases built before content hashing or Name parsing lack the
+        # columns; parsed Names are backfilled once
+        self._ensure_column("variants", "content_hash", "INTEGER")
+        added = [self._ensure_column("variants", column, "TEXT")
+                 for column in CLINVAR_NAME_COLUMNS]
+        if any(added):
+            self.index_variant_changes()
+        if not has_locations:
+            self.index_variant_locations()
+
+        self.conn.commit()
+        print("✅ Database schema created")
+
+    def _ensure_column(self, table: str, column: str, declaration: str) -> bool:
+        """Add a column to an existing table if it is missing; True if added"""
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column in columns:
+            return False
+        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        return True
+
+    def get_source(self, source: str) -> Optional[sqlite3.Row]:
+        """Metadata recorded by record_source(), or None"""
+        return self.conn.execute(
+            "SELECT * FROM sources WHERE source = ?", (source,)
+        ).fetchone()
+
+    def record_source(self, source: str, version: Optional[str],
+                      filepath: Optional[Path] = None, sha256: Optional[str] = None,
+                      row_count: Optional[int] = None):
+        """Record the release a source is synced to (caller commits)"""
+        stat = Path(filepath).stat() if filepath else None
+        self.conn.execute("""
+            INSERT OR REPLACE INTO sources
+            (source, version, sha256, file_size, file_mtime, parser_version,
+             row_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        """, (source, version, sha256,
+              stat.st_size if stat else None, stat.st_mtime if stat else None,
+              PARSER_VERSION, row_count))
+
+    def finalize(self, analyze: bool = True):
+        """
+        Build all query indices, then gather planner statistics
+
+        Run after loading data. ANALYZE gives the query planner row counts
+        for the normalizer queries; incremental builds can pass
+        analyze=False and rely on PRAGMA optimize to refresh them cheaply.
+        """
+        cursor = self.conn.cursor()
+
+        # Expression indexes matching the normalizers' LOWER()/UPPER() lookups
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_term_ontology_name_lc "
+                       "ON terms(ontology, lower(name))")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_synonym_lc "
+                       "ON synonyms(lower(synonym), term_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_gene_uc_name "
+                       "ON variants(upper(gene_symbol), name)")
+        # Superseded by the indexes above (dropped from older databases)
+        for index in ("idx_term_name", "idx_term_ontology", "idx_synonym"):
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_gene ON variants(gene_symbol)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_rs ON variants(rs_id)")
+        # Exact lookups on the changes parsed from ClinVar Names
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_protein_change "
+                       "ON variants(upper(hgvs_gene), protein_change)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_cdna_change "
+                       "ON variants(upper(hgvs_gene), cdna_change)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_transcript "
+                       "ON variants(transcript)")
+        # Longest location, which bounds how far before a range its
+        # overlapping variants can start
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_variant_location_span "
+                       "ON variant_locations(stop - start)")
+        self.conn.commit()
 
+        if analyze:
+            cursor.execute("ANALYZE")
+        cursor.execute("PRAGMA optimize")
         self.conn.commit()
-        print("✅ Database schema created")
+        print("✅ Database indices built and analyzed")
+
+    def index_term_search(self, ontologies: Optional[Iterable[str]] = None):
+        """
+        Rebuild the term_search FTS rows of the given ontologies from terms
+        and synonyms (all ontologies if None, or if the index is empty)
+
+        Run after loading, like finalize(); the caller commits.
+        """
+        cursor = self.conn.cursor()
+        if not cursor.execute("SELECT 1 FROM term_search LIMIT 1").fetchone():
+            ontologies = None
+
+        if ontologies is None:
+            cursor.execute("DELETE FROM term_search")
+            selected = cursor.execute("SELECT DISTINCT ontology FROM terms").fetchall()
+            ontologies = [row[0] for row in selected]
+        else:
+            ontologies = list(ontologies)
+            cursor.executemany("DELETE FROM term_search WHERE term_search MATCH ?",
+                               ((f'ontology : "{ontology}"',) for ontology in ontologies))
+
+        placeholders = ", ".join("?" * len(ontologies))
+        cursor.execute(f"""
+            INSERT INTO term_search (term_id, ontology, name)
+            SELECT term_id, ontology, name
+            FROM terms
+            WHERE ontology IN ({placeholders})
+        """, ontologies)
+        cursor.execute(f"""
+            INSERT INTO term_search (term_id, ontology, synonym)
+            SELECT s.term_id, t.ontology, s.synonym
+            FROM synonyms s
+            JOIN terms t ON t.term_id = s.term_id
+            WHERE t.ontology IN ({placeholders})
+        """, ontologies)
+        print(f"🔎 Indexed term names and synonyms for full-text search "
+              f"({', '.join(ontologies) or 'nothing to index'})")
+
+    def index_term_closure(self, ontologies: Optional[Iterable[str]] = None):
+        """
+        Rebuild the is_a closure and interval labels of the given ontologies
+        (all ontologies if None, or if the tables are empty)
+
+        Run after loading, like index_term_search(); the caller commits.
+        """
+        cursor = self.conn.cursor()
+        if not cursor.execute("SELECT 1 FROM term_order LIMIT 1").fetchone():
+            ontologies = None
+
+        if ontologies is None:
+            for table in ("term_closure", "term_intervals", "term_order"):
+                cursor.execute(f"DELETE FROM {table}")
+            selected = cursor.execute("SELECT DISTINCT ontology FROM terms").fetchall()
+            ontologies = sorted(row[0] for row in selected)
+        else:
+            ontologies = sorted(ontologies)
+            for ontology in ontologies:
+                cursor.execute("""
+                    DELETE FROM term_closure WHERE descendant IN
+                        (SELECT post FROM term_order WHERE ontology = ?)
+                """, (ontology,))
+                cursor.execute("""
+                    DELETE FROM term_intervals WHERE post IN
+                        (SELECT post FROM term_order WHERE ontology = ?)
+                """, (ontology,))
+                cursor.execute("DELETE FROM term_order WHERE ontology = ?", (ontology,))
+
+        pairs = 0
+        for ontology in ontologies:
+            term_ids = [row[0] for row in cursor.execute(
+                "SELECT term_id FROM terms WHERE ontology = ?", (ontology,))]
+            edges = cursor.execute("""
+                SELECT r.child_id, r.parent_id
+                FROM relationships r
+                JOIN terms t ON t.term_id = r.child_id
+                WHERE t.ontology = ? AND r.relationship_type = 'is_a'
+            """, (ontology,)).fetchall()
+            labels = hierarchy_labels(term_ids, edges)
+
+            # Number this ontology after every other one still in the table
+            offset = cursor.execute(
+                "SELECT COALESCE(MAX(post) + 1, 0) FROM term_order").fetchone()[0]
+            post = {term_id: number + offset for term_id, number in labels.post.items()}
+
+            # Rows go in in key order, so the B-trees are only appended to
+            in_order = sorted(post, key=post.__getitem__)
+            cursor.executemany(
+                "INSERT INTO term_order (term_id, ontology, post) VALUES (?, ?, ?)",
+                ((term_id, ontology, post[term_id]) for term_id in in_order))
+            cursor.executemany(
+                "INSERT INTO term_closure (descendant, ancestor, depth) VALUES (?, ?, ?)",
+                ((post[descendant], ancestor, depth) for descendant in in_order
+                 for ancestor, depth in sorted((post[ancestor], depth) for ancestor, depth
+                                               in labels.closure[descendant].items())))
+            cursor.executemany(
+                "INSERT INTO term_intervals (post, lo, hi) VALUES (?, ?, ?)",
+                ((post[term_id], lo + offset, hi + offset)
+                 for term_id in in_order for lo, hi in labels.intervals[term_id]))
+            pairs += sum(len(ancestors) for ancestors in labels.closure.values())
+
+        print(f"🌳 Indexed is_a hierarchies ({', '.join(ontologies) or 'nothing to index'}): "
+              f"{pairs:,} ancestor pairs")
+
+    def index_variant_changes(self, batch_size: int = 10000):
+        """
+        Recompute the CLINVAR_NAME_COLUMNS of every variant from its Name
+
+        Inserts fill these columns themselves; this backfills databases
+        built before they existed. Rowids are kept, so the variant_names
+        index stays valid. The caller commits.
+        """
+        cursor = self.conn.cursor()
+        rows = cursor.execute("SELECT rowid, name FROM variants").fetchall()
+        assignments = ", ".join(f"{column} = ?" for column in CLINVAR_NAME_COLUMNS)
+        for start in range(0, len(rows), batch_size):
+            self.conn.executemany(
+                f"UPDATE variants SET {assignments} WHERE rowid = ?",
+                [clinvar_name_columns(name or "") + (rowid,)
+                 for rowid, name in rows[start:start + batch_size]])
+        print(f"🧬 Parsed {len(rows):,} ClinVar names into HGVS columns")
+
+    def index_variant_locations(self, batch_size: int = 10000):
+        """
+        Rebuild variant_locations from the variants table
+
+        Loads fill variant_locations themselves, with every assembly of
+        each record; this backfills databases built before the table
+        existed, which only kept one assembly per variant. The caller commits.
+        """
+        self.conn.execute("DELETE FROM variant_locations")
+        columns = ", ".join(column for column, _ in CLINVAR_COLUMNS)
+        rows = self.conn.execute(f"SELECT {columns} FROM variants")
+        total = 0
+        while True:
+            batch = [tuple("" if value is None else str(value) for value in row)
+                     for row in rows.fetchmany(batch_size)]
+            if not batch:
+                break
+            locations = variant_location_rows(batch)
+            self.conn.executemany(VARIANT_LOCATION_INSERT_SQL, locations)
+            total += len(locations)
+        if total:
+            print(f"📍 Indexed {total:,} ClinVar variant locations")
+
+    def index_variant_names(self, force: bool = True):
+        """
+        Rebuild the variant_names trigram index from the variants table
+
+        INSERT OR REPLACE gives rewritten variants new rowids, so run this
+        after a full ClinVar load (refresh_clinvar() keeps the index in step
+        itself). With force=False it only rebuilds an index that is out of
+        step with the table (e.g. a database built before the index
+        existed). The caller commits.
+        """
+        if not force and self._variant_names_in_sync():
+            return
+
+        self.conn.execute("INSERT INTO variant_names(variant_names) VALUES('rebuild')")
+        print("🔎 Indexed ClinVar names for substring search")
 
-    def insert_ontology(self, ontology_name: str, terms: Dict[str, OBOTerm]):
+    def _variant_names_in_sync(self) -> bool:
+        """Whether variant_names indexes exactly as many rows as variants holds"""
+        cursor = self.conn.cursor()
+        indexed = cursor.execute("SELECT COUNT(*) FROM variant_names_docsize").fetchone()[0]
+        return indexed == cursor.execute("SELECT COUNT(*) FROM variants").fetchone()[0]
+
+    def insert_ontology(self, ontology_name: str, terms: Dict[str, OBOTerm],
+                        commit: bool = True):
         """Insert ontology terms into database"""
         cursor = self.conn.cursor()
 
-        print(f"💾 Inserting {ontology_name} ({len(terms)} terms)...")
+        # Alias keys (old-style terms dicts) are stored via term.alt_ids
+        canonical = [term for term_id, term in terms.items() if term_id == term.id]
 
-        for term_id, term in terms.items():
-            # Insert main term
-            cursor.execute("""
-                INSERT OR REPLACE INTO terms
-                (term_id, ontology, name, definition, namespace, is_obsolete)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (term.id, ontology_name, term.name, term.definition,
-                  term.namespace, int(term.is_obsolete)))
-
-            # Insert synonyms
-            for synonym in term.synonyms:
-                cursor.execute("""
-                    INSERT INTO synonyms (term_id, synonym)
-                    VALUES (?, ?)
-                """, (term.id, synonym))
+        print(f"💾 Inserting {ontology_name} ({len(canonical)} terms)...")
 
-            # Insert xrefs
-            for xref in term.xrefs:
-                cursor.execute("""
-                    INSERT INTO xrefs (term_id, xref)
-                    VALUES (?, ?)
-                """, (term.id, xref))
+        # One executemany per table, fed by generators so no row lists are built
+        for table, rows in ontology_rows(ontology_name, canonical):
+            cursor.executemany(ONTOLOGY_INSERT_SQL[table], rows)
 
-            # Insert hierarchical relationships
-            for parent_id in term.is_a:
-                cursor.execute("""
-                    INSERT INTO relationships (child_id, parent_id, relationship_type)
-                    VALUES (?, ?, 'is_a')
-                """, (term.id, parent_id))
+        if commit:
+            self.conn.commit()
+        print(f"  ✅ Inserted {len(canonical)} terms")
+
+    def delete_ontology(self, ontology_name: str):
+        """Delete an ontology's terms and dependent rows (caller commits)"""
+        cursor = self.conn.cursor()
+        owned = "SELECT term_id FROM terms WHERE ontology = ?"
+
+        cursor.execute(f"DELETE FROM synonyms WHERE term_id IN ({owned})", (ontology_name,))
+        cursor.execute(f"DELETE FROM xrefs WHERE term_id IN ({owned})", (ontology_name,))
+        cursor.execute(f"DELETE FROM alt_ids WHERE term_id IN ({owned})", (ontology_name,))
+        cursor.execute(f"DELETE FROM relationships WHERE child_id IN ({owned})", (ontology_name,))
+        cursor.execute("DELETE FROM terms WHERE ontology = ?", (ontology_name,))
+
+    def replace_ontology(self, ontology_name: str, terms: Dict[str, OBOTerm],
+                         version: Optional[str] = None,
+                         filepath: Optional[Path] = None,
+                         sha256: Optional[str] = None):
+        """
+        Swap in a new version of one ontology inside a single transaction
+
+        The old rows in terms, synonyms, xrefs, alt_ids and relationships
+        are deleted, the new terms inserted and the source fingerprint
+        recorded; readers see either the old or the new ontology.
+        """
+        self.delete_ontology(ontology_name)
+        self.insert_ontology(ontology_name, terms, commit=False)
+        self.record_source(ontology_name, version, filepath, sha256,
+                           sum(1 for term_id, term in terms.items() if term_id == term.id))
+        self.conn.commit()
+
+    def source_is_current(self, source: str, filepath: Path) -> Tuple[bool, str]:
+        """
+        Check a source file against its recorded fingerprint
+
+        Unchanged size and mtime short-circuit without hashing; otherwise
+        the SHA-256 decides (a touched-but-identical file is re-stamped).
+        A different PARSER_VERSION always counts as changed.
+
+        Returns:
+            (is_current, sha256 or "" when the hash was not needed)
+        """
+        previous = self.get_source(source)
+        if previous is None or previous["parser_version"] != PARSER_VERSION:
+            return False, file_sha256(filepath)
+
+        stat = filepath.stat()
+        if previous["file_size"] == stat.st_size and previous["file_mtime"] == stat.st_mtime:
+            return True, previous["sha256"] or ""
+
+        digest = file_sha256(filepath)
+        if digest != previous["sha256"]:
+            return False, digest
 
+        self.record_source(source, previous["version"], filepath, digest,
+                           previous["row_count"])
         self.conn.commit()
-        print(f"  ✅ Inserted {len(terms)} terms")
+        return True, digest
 
     def insert_clinvar(self, variants: Dict[str, Dict]):
-        """Insert ClinVar variants into database"""
+        """Insert ClinVar variants parsed by ClinVarParser.parse()"""
+        self.insert_clinvar_rows((
+            var['variation_id'],
+            var['name'],
+            var['gene_symbol'],
+            var['clinical_significance'],
+            var['rs_id'],
+            var['rcv_accession'],
+            var['chromosome'],
+            var['position_vcf'],
+            var['reference_allele'],
+            var['alternate_allele'],
+            var['type'],
+            var['assembly']
+        ) for var in variants.values())
+
+    def insert_variant_batch(self, batch: List[Tuple[str, ...]]):
+        """Write one batch of ClinVar rows, with parsed Names and content hashes (caller commits)"""
+        self.conn.executemany(VARIANT_INSERT_SQL, variant_rows(batch))
+        self.conn.executemany(VARIANT_LOCATION_INSERT_SQL, variant_location_rows(batch))
+
+    def insert_clinvar_rows(self, rows: Iterable[Tuple[str, ...]],
+                            batch_size: int = 10000, commit: bool = True):
+        """
+        Insert ClinVar rows (CLINVAR_COLUMNS order) from any iterable
+
+        Rows are consumed in fixed-size batches, so a ClinVarParser.iter_rows()
+        stream is ingested with flat memory. Each batch is committed unless
+        commit is False.
+        """
+        rows = iter(rows)
+        total = 0
+
+        print("💾 Inserting ClinVar variants...")
+
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            self.insert_variant_batch(batch)
+            if commit:
+                self.conn.commit()
+
+            total += len(batch)
+            if total % 100000 < batch_size:
+                print(f"  ... inserted {total:,} variants")
+
+        print(f"  ✅ Inserted {total:,} variants")
+        return total
+
+    def delete_clinvar(self):
+        """Delete every ClinVar variant and its locations (caller commits)"""
+        self.conn.execute("DELETE FROM variants")
+        self.conn.execute("DELETE FROM variant_locations")
+
+    def replace_clinvar(self, rows: Iterable[Tuple[str, ...]],
+                        release: Optional[str] = None,
+                        filepath: Optional[Path] = None,
+                        sha256: Optional[str] = None) -> int:
+        """
+        Swap in a full ClinVar release inside a single transaction
+
+        Variants missing from the new release go with the old rows; readers
+        see either the old or the new release. Returns the rows loaded.
+        """
+        self.delete_clinvar()
+        total = self.insert_clinvar_rows(rows, commit=False)
+        self.record_source("ClinVar", release, filepath, sha256, total)
+        self.conn.commit()
+        return total
+
+    def begin_clinvar_refresh(self):
+        """Create (or empty) the TEMP staging table used by refresh_clinvar()"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS clinvar_incoming (
+                variation_id TEXT PRIMARY KEY,
+                name TEXT,
+                gene_symbol TEXT,
+                clinical_significance TEXT,
+                rs_id TEXT,
+                rcv_accession TEXT,
+                chromosome TEXT,
+                position TEXT,
+                ref_allele TEXT,
+                alt_allele TEXT,
+                type TEXT,
+                assembly TEXT,
+                transcript TEXT,
+                hgvs_gene TEXT,
+                cdna_change TEXT,
+                protein_change TEXT,
+                protein_change_3 TEXT,
+                content_hash INTEGER
+            )
+        """)
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS clinvar_locations_incoming (
+                assembly TEXT NOT NULL,
+                chromosome TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                stop INTEGER NOT NULL,
+                variation_id TEXT NOT NULL,
+                ref_allele TEXT NOT NULL,
+                alt_allele TEXT NOT NULL,
+                PRIMARY KEY (assembly, chromosome, start, variation_id,
+                             ref_allele, alt_allele)
+            ) WITHOUT ROWID
+        """)
+        # variation_ids a refresh rewrites, so their names can be reindexed
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS clinvar_changed (
+                variation_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("DELETE FROM clinvar_incoming")
+        cursor.execute("DELETE FROM clinvar_locations_incoming")
+        cursor.execute("DELETE FROM clinvar_changed")
+
+    def stage_clinvar_batch(self, batch: List[Tuple[str, ...]]):
+        """Stage one batch of a ClinVar release for refresh_clinvar()"""
+        # Same last-row-wins rule as the full build for repeated IDs
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO clinvar_incoming
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, variant_rows(batch))
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO clinvar_locations_incoming
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, variant_location_rows(batch))
+
+    def apply_clinvar_refresh(self, release: Optional[str] = None,
+                              filepath: Optional[Path] = None,
+                              sha256: Optional[str] = None) -> Dict[str, int]:
+        """
+        Diff the staged release against `variants` and apply it (caller commits)
+
+        The variant_names index is updated for the rewritten and retracted
+        rows only, unless it was already out of step (index_variant_names()
+        then rebuilds it).
+
+        Returns:
+            Counts of staged, inserted, updated and deleted variants
+        """
         cursor = self.conn.cursor()
+        names_in_sync = self._variant_names_in_sync()
+
+        stats = {
+            "staged": cursor.execute("SELECT COUNT(*) FROM clinvar_incoming").fetchone()[0],
+        }
+        stats["inserted"], stats["updated"] = cursor.execute("""
+            SELECT COALESCE(SUM(v.variation_id IS NULL), 0),
+                   COALESCE(SUM(v.variation_id IS NOT NULL), 0)
+            FROM clinvar_incoming i
+            LEFT JOIN variants v ON v.variation_id = i.variation_id
+            WHERE v.content_hash IS NOT i.content_hash
+        """).fetchone()
 
-        print(f"💾 Inserting ClinVar ({len(variants):,} variants)...")
-
-        batch_size = 10000
-        batch = []
-
-        for var_id, var in variants.items():
-            batch.append((
-                var['variation_id'],
-                var['name'],
-                var['gene_symbol'],
-                var['clinical_significance'],
-                var['rs_id'],
-                var['rcv_accession'],
-                var['chromosome'],
-                var['position_vcf'],
-                var['reference_allele'],
-                var['alternate_allele'],
-                var['type'],
-                var['assembly']
-            ))
-
-            if len(batch) >= batch_size:
-                cursor.executemany("""
-                    INSERT OR REPLACE INTO variants
-                    (variation_id, name, gene_symbol, clinical_significance,
-                     rs_id, rcv_accession, chromosome, position, ref_allele,
-                     alt_allele, type, assembly)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, batch)
-                self.conn.commit()
-                print(f"  ... inserted {len(batch):,} variants")
-                batch = []
-
-        # Insert remaining
-        if batch:
-            cursor.executemany("""
-                INSERT OR REPLACE INTO variants
-                (variation_id, name, gene_symbol, clinical_significance,
-                 rs_id, rcv_accession, chromosome, position, ref_allele,
-                 alt_allele, type, assembly)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, batch)
-            self.conn.commit()
+        cursor.execute("""
+            INSERT INTO clinvar_changed
+            SELECT i.variation_id
+            FROM clinvar_incoming i
+            LEFT JOIN variants v ON v.variation_id = i.variation_id
+            WHERE v.content_hash IS NOT i.content_hash
+        """)
+
+        # Unindex the names of rows about to be rewritten or retracted
+        # (an external-content 'delete' must see the indexed values)
+        if names_in_sync:
+            cursor.execute("""
+                INSERT INTO variant_names(variant_names, rowid, name)
+                SELECT 'delete', v.rowid, v.name
+                FROM variants v
+                WHERE v.variation_id IN (SELECT variation_id FROM clinvar_changed)
+                   OR v.variation_id NOT IN (SELECT variation_id FROM clinvar_incoming)
+            """)
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO variants
+            (variation_id, name, gene_symbol, clinical_significance,
+             rs_id, rcv_accession, chromosome, position, ref_allele,
+             alt_allele, type, assembly, transcript, hgvs_gene, cdna_change,
+             protein_change, protein_change_3, content_hash)
+            SELECT i.*
+            FROM clinvar_changed c
+            JOIN clinvar_incoming i ON i.variation_id = c.variation_id
+        """)
+
+        cursor.execute("""
+            DELETE FROM variants
+            WHERE variation_id NOT IN (SELECT variation_id FROM clinvar_incoming)
+        """)
+        stats["deleted"] = cursor.rowcount
+
+        if names_in_sync:
+            cursor.execute("""
+                INSERT INTO variant_names(rowid, name)
+                SELECT v.rowid, v.name
+                FROM clinvar_changed c
+                JOIN variants v ON v.variation_id = c.variation_id
+            """)
+
+        # Locations are diffed row by row: every assembly's row is staged,
+        # while content_hash only covers the one variants keeps
+        cursor.execute("""
+            DELETE FROM variant_locations
+            WHERE NOT EXISTS (
+                SELECT 1 FROM clinvar_locations_incoming i
+                WHERE i.assembly = variant_locations.assembly
+                  AND i.chromosome = variant_locations.chromosome
+                  AND i.start = variant_locations.start
+                  AND i.variation_id = variant_locations.variation_id
+                  AND i.ref_allele = variant_locations.ref_allele
+                  AND i.alt_allele = variant_locations.alt_allele
+            )
+        """)
+        cursor.execute("""
+            INSERT OR IGNORE INTO variant_locations
+            SELECT * FROM clinvar_locations_incoming
+        """)
+
+        self.record_source("ClinVar", release, filepath, sha256, stats["staged"])
+        cursor.execute("DELETE FROM clinvar_incoming")
+        cursor.execute("DELETE FROM clinvar_locations_incoming")
+        cursor.execute("DELETE FROM clinvar_changed")
+
+        print(f"  ✅ {stats['inserted']:,} new, {stats['updated']:,} changed, "
+              f"{stats['deleted']:,} retracted ({stats['staged']:,} in release)")
+        return stats
+
+    def refresh_clinvar(self, rows: Iterable[Tuple[str, ...]],
+                        release: Optional[str] = None,
+                        filepath: Optional[Path] = None,
+                        sha256: Optional[str] = None,
+                        batch_size: int = 10000) -> Dict[str, int]:
+        """
+        Incrementally sync the variants table to a new ClinVar release
+
+        Rows are staged in a TEMP table with their content hashes. Only
+        new or changed variation_ids are written to `variants`, and
+        variation_ids missing from the release are deleted, all in one
+        transaction. The release is recorded in the sources table.
+
+        Returns:
+            Counts of staged, inserted, updated and deleted variants
+        """
+        rows = iter(rows)
+
+        print(f"🔄 Refreshing ClinVar to release {release or 'unknown'}...")
+
+        self.begin_clinvar_refresh()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            self.stage_clinvar_batch(batch)
+
+        stats = self.apply_clinvar_refresh(release, filepath, sha256)
+        self.conn.commit()
+        return stats
+
+
+# ============================================================================
+# BUILD PLANNING AND PIPELINE
+# ============================================================================
 
-        print(f"  ✅ Inserted {len(variants):,} variants")
+BUILD_ONTOLOGIES = [
+    ("DOID", "doid.obo"),
+    ("SO", "so.obo"),
+    ("GO", "go.obo"),
+    ("HPO", "hp.obo"),
+    ("MONDO", "mondo.obo"),
+]
+
+# Rows per queued batch in the pipelined build
+PIPELINE_BATCH_SIZE = 10000
+
+
+@dataclass
+class _BuildTask:
+    """One source that needs to be (re)written during a build"""
+    kind: str                      # "ontology" or "clinvar"
+    source: str                    # sources-table key (ontology name or "ClinVar")
+    filepath: Path
+    sha256: str
+    refresh: bool = False          # ClinVar only: diff against the live table
+    release: Optional[str] = None  # ClinVar only
+
+
+def _plan_build(db_builder: OntologyDatabaseBuilder, ontology_dir: Path,
+                incremental: bool, clinvar_release: Optional[str]) -> List[_BuildTask]:
+    """Decide which sources to rebuild, printing the ones that are skipped"""
+    tasks = []
+
+    for ont_name, filename in BUILD_ONTOLOGIES:
+        filepath = find_input_file(ontology_dir, filename)
+        if not filepath:
+            print(f"⚠️  {filename} not found, skipping")
+            continue
+
+        is_current, digest = db_builder.source_is_current(ont_name, filepath)
+        if incremental and is_current:
+            print(f"⏭️  {ont_name} unchanged, skipping")
+            continue
+        tasks.append(_BuildTask("ontology", ont_name, filepath, digest))
+
+    clinvar_path = find_input_file(ontology_dir, "clinvar_summary.txt")
+    if clinvar_path:
+        release = clinvar_release or time.strftime(
+            "%Y-%m-%d", time.localtime(clinvar_path.stat().st_mtime))
+        is_current, digest = db_builder.source_is_current("ClinVar", clinvar_path)
+        previous = db_builder.get_source("ClinVar") if incremental else None
+
+        if previous and is_current:
+            print(f"⏭️  ClinVar unchanged (release {previous['version']}), skipping")
+        else:
+            tasks.append(_BuildTask("clinvar", "ClinVar", clinvar_path, digest,
+                                    refresh=bool(previous), release=release))
+    else:
+        print("⚠️  clinvar_summary.txt not found, skipping")
+
+    return tasks
+
+
+def _load_ontology_terms(task: _BuildTask, snapshot_dir: Optional[str],
+                         workers: int = 1) -> Dict[str, OBOTerm]:
+    """Parse one ontology, going through the snapshot cache when enabled"""
+    parser = OBOParser(str(task.filepath), search_index=False)
+    if snapshot_dir:
+        return parser.parse_cached(snapshot_dir, workers=workers, sha256=task.sha256)
+    return parser.parse(workers=workers)
+
+
+def _run_serial_task(db_builder: OntologyDatabaseBuilder, task: _BuildTask,
+                     snapshot_dir: Optional[str], workers: int, stage: Dict):
+    """Parse and write one source on the calling thread, filling `stage` timings"""
+    if task.kind == "ontology":
+        start = time.perf_counter()
+        terms = _load_ontology_terms(task, snapshot_dir, workers)
+        version = read_obo_header(task.filepath).get("data-version")
+        stage["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        db_builder.replace_ontology(task.source, terms, version, task.filepath, task.sha256)
+        stage["write"] = time.perf_counter() - start
+        stage["records"] = sum(1 for term_id, term in terms.items() if term_id == term.id)
+        return
+
+    # ClinVar is streamed, so reading and writing are not separable here
+    start = time.perf_counter()
+    rows = ClinVarParser(str(task.filepath)).iter_rows()
+    if task.refresh:
+        stage["records"] = db_builder.refresh_clinvar(
+            rows, task.release, task.filepath, task.sha256)["staged"]
+    else:
+        stage["records"] = db_builder.replace_clinvar(
+            rows, task.release, task.filepath, task.sha256)
+    stage["parse"] = None
+    stage["write"] = time.perf_counter() - start
+
+
+# Row queue shared with producer processes (set by _init_pipeline_producer)
+_pipeline_queue = None
+
+
+def _init_pipeline_producer(queue):
+    global _pipeline_queue
+    _pipeline_queue = queue
+
+
+def _queue_rows(source: str, table: str, rows: Iterable[tuple],
+                batch_size: int) -> Tuple[int, float]:
+    """Queue rows in batches; returns (row count, seconds blocked on a full queue)"""
+    rows = iter(rows)
+    count = 0
+    waited = 0.0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        start = time.perf_counter()
+        _pipeline_queue.put(("rows", source, table, batch))
+        waited += time.perf_counter() - start
+        count += len(batch)
+    return count, waited
+
+
+def _produce_ontology(task: _BuildTask, snapshot_dir: Optional[str], batch_size: int):
+    """Producer process: parse one ontology and queue its rows for the writer"""
+    try:
+        start = time.perf_counter()
+        terms = _load_ontology_terms(task, snapshot_dir)
+        canonical = [term for term_id, term in terms.items() if term_id == term.id]
+
+        waited = 0.0
+        for table, rows in ontology_rows(task.source, canonical):
+            waited += _queue_rows(task.source, table, rows, batch_size)[1]
+
+        _pipeline_queue.put(("done", task.source, {
+            "parse": time.perf_counter() - start - waited,
+            "records": len(canonical),
+            "version": read_obo_header(task.filepath).get("data-version"),
+        }))
+    except Exception:
+        _pipeline_queue.put(("error", task.source, traceback.format_exc()))
+
+
+def _produce_clinvar(task: _BuildTask, batch_size: int):
+    """Producer process: stream ClinVar rows to the writer"""
+    try:
+        start = time.perf_counter()
+        rows = ClinVarParser(str(task.filepath)).iter_rows()
+        count, waited = _queue_rows(task.source, "variants", rows, batch_size)
+        _pipeline_queue.put(("done", task.source, {
+            "parse": time.perf_counter() - start - waited,
+            "records": count,
+        }))
+    except Exception:
+        _pipeline_queue.put(("error", task.source, traceback.format_exc()))
+
+
+class _PipelineWriter(threading.Thread):
+    """
+    The single SQLite writer of a pipelined build
+
+    Drains ("rows" | "done" | "error", source, ...) messages from the
+    producers' queue into one transaction, committed only if every source
+    finished cleanly. After the first failure it keeps draining (without
+    writing) so no producer stays blocked on a full queue.
+    """
+
+    def __init__(self, db_path: str, fast_build: bool, tasks: List[_BuildTask],
+                 queue, timings: Dict[str, Dict]):
+        super().__init__(name="sqlite-writer", daemon=True)
+        self.db_path = db_path
+        self.fast_build = fast_build
+        self.tasks = {task.source: task for task in tasks}
+        self.queue = queue
+        self.timings = timings
+        self.errors: List[str] = []
+        self.committed = False
+
+    def run(self):
+        builder = OntologyDatabaseBuilder(self.db_path, fast_build=self.fast_build)
+        started: Set[str] = set()
+        finished: Set[str] = set()
+
+        try:
+            try:
+                builder.connect()
+            except Exception:
+                self.errors.append(f"writer: {traceback.format_exc()}")
+
+            # A source can be reported twice (its "done", then a dead pool)
+            while len(finished) < len(self.tasks):
+                kind, source, *payload = self.queue.get()
+                if kind != "rows":
+                    finished.add(source)
+                if kind == "error":
+                    self.errors.append(f"{source}: {payload[0]}")
+                    continue
+                if self.errors:
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    self._write(builder, started, kind, source, payload)
+                except Exception:
+                    self.errors.append(f"{source}: {traceback.format_exc()}")
+                self.timings[source]["write"] += time.perf_counter() - start
+
+            if not self.errors:
+                builder.conn.commit()
+                self.committed = True
+            elif builder.conn is not None:
+                builder.conn.rollback()
+        except Exception:
+            self.errors.append(f"writer: {traceback.format_exc()}")
+        finally:
+            builder.close()
+
+    def _write(self, builder: OntologyDatabaseBuilder, started: Set[str],
+               kind: str, source: str, payload: list):
+        task = self.tasks[source]
+
+        if source not in started:
+            started.add(source)
+            if task.kind == "ontology":
+                builder.delete_ontology(source)
+            elif task.refresh:
+                builder.begin_clinvar_refresh()
+            else:
+                builder.delete_clinvar()
+
+        if kind == "rows":
+            table, batch = payload
+            if table != "variants":
+                builder.conn.executemany(ONTOLOGY_INSERT_SQL[table], batch)
+            elif task.refresh:
+                builder.stage_clinvar_batch(batch)
+            else:
+                builder.insert_variant_batch(batch)
+            return
+
+        info = payload[0]
+        stage = self.timings[source]
+        stage["parse"] = info["parse"]
+        stage["records"] = info["records"]
+
+        if task.kind == "ontology":
+            builder.record_source(source, info["version"], task.filepath,
+                                  task.sha256, info["records"])
+            print(f"  ✅ Wrote {source} ({info['records']:,} terms)")
+        elif task.refresh:
+            builder.apply_clinvar_refresh(task.release, task.filepath, task.sha256)
+        else:
+            builder.record_source("ClinVar", task.release, task.filepath,
+                                  task.sha256, info["records"])
+            print(f"  ✅ Wrote ClinVar ({info['records']:,} variants)")
+
+
+def _put_while_alive(queue, writer: threading.Thread, message: tuple,
+                     poll_s: float = 1.0):
+    """Queue a message for the writer, giving up once it has stopped reading"""
+    while writer.is_alive():
+        try:
+            queue.put(message, timeout=poll_s)
+            return
+        except Full:
+            continue
+
+
+def _run_build_pipeline(db_path: str, fast_build: bool, tasks: List[_BuildTask],
+                        jobs: int, snapshot_dir: Optional[str],
+                        timings: Dict[str, Dict],
+                        batch_size: int = PIPELINE_BATCH_SIZE):
+    """
+    Parse sources in `jobs` producer processes while one thread writes
+
+    Producers hand row batches to the writer through a bounded queue
+    (jobs * 4 batches), so memory stays flat however far parsing runs
+    ahead of SQLite.
+    """
+    queue = multiprocessing.Queue(maxsize=jobs * 4)
+    writer = _PipelineWriter(db_path, fast_build, tasks, queue, timings)
+    writer.start()
+
+    # Longest source first: ClinVar streams for the whole build
+    ordered = sorted(tasks, key=lambda task: task.kind != "clinvar")
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_pipeline_producer,
+                             initargs=(queue,)) as pool:
+        futures = {}
+        for task in ordered:
+            if task.kind == "ontology":
+                future = pool.submit(_produce_ontology, task, snapshot_dir, batch_size)
+            else:
+                future = pool.submit(_produce_clinvar, task, batch_size)
+            futures[future] = task.source
+
+        # Producers report their own errors; this only sees a dead pool
+        for future in as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                _put_while_alive(queue, writer, ("error", futures[future], repr(error)))
+
+    writer.join()
+    if not writer.committed:
+        raise RuntimeError("Pipelined build failed, nothing was committed:\n"
+                           + "\n".join(writer.errors))
+
+
+def copy_database(source: Path, target: Path):
+    """
+    Make target a consistent copy of the SQLite database at source
+
+    Uses the online backup API, so readers of source may stay connected.
+    A missing source leaves no target, for a build to start from scratch.
+    """
+    target.unlink(missing_ok=True)
+    if not source.exists():
+        return
+
+    src = sqlite3.connect(str(source))
+    dst = sqlite3.connect(str(target))
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def print_stage_timings(timings: Dict[str, Dict], finalize_s: float, total_s: float):
+    """Print the per-source parse/write report of a build"""
+    print(f"{'stage':<12}{'records':>12}{'parse s':>10}{'write s':>10}")
+    print("-" * 44)
+    for source, stage in timings.items():
+        parse_s = "-" if stage["parse"] is None else f"{stage['parse']:.2f}"
+        print(f"{source:<12}{stage['records']:>12,}{parse_s:>10}{stage['write']:>10.2f}")
+    print(f"{'finalize':<12}{'':>12}{'':>10}{finalize_s:>10.2f}")
+    print(f"{'total':<12}{'':>12}{'':>10}{total_s:>10.2f}")
 
 
 # ============================================================================
 # MAIN BUILD FUNCTION
 # ============================================================================
 
-def build_local_databases():
-    """Main function to build all local databases"""
+def build_local_databases(workers: int = 1,
+                          snapshot_dir: Optional[str] = "data/indices",
+                          fast_build: bool = False,
+                          incremental: bool = False,
+                          clinvar_release: Optional[str] = None,
+                          jobs: int = 1,
+                          ontology_dir: Path = Path("data/ontologies"),
+                          db_path: str = "data/databases/ontologies.db"):
+    """
+    Main function to build all local databases
+
+    Args:
+        workers: Worker processes used to parse each OBO file (serial
+            build only)
+        snapshot_dir: Where parsed-ontology snapshots are cached
+            (None always re-parses from text)
+        fast_build: Bulk-load with unsafe PRAGMAs (see OntologyDatabaseBuilder)
+            into db_path + ".building", which replaces db_path only if the
+            build succeeds; ignored for incremental builds
+        incremental: Update an existing database in place: only ontologies
+            whose file changed are re-parsed and replaced, and ClinVar is
+            synced with refresh_clinvar() instead of being rewritten
+        clinvar_release: Release label recorded for ClinVar (defaults to
+            the input file's modification date)
+        jobs: Producer processes for a pipelined build. With jobs > 1 every
+            source is parsed concurrently and a single writer thread loads
+            the rows in one transaction; 1 builds source by source.
+        ontology_dir: Directory holding the input files
+        db_path: SQLite database to build
+    """
+
+    start_time = time.perf_counter()
 
     print("="*80)
     print("ONCOCITE - Building Local Ontology Databases")
     print("="*80)
     print()
 
-    ontology_dir = Path("data/ontologies")
+    ontology_dir = Path(ontology_dir)
+    fast_build = fast_build and not incremental
+    db_path = Path(db_path)
+
+    # Without a rollback journal a failed build cannot be undone, so a fast
+    # build works on a scratch copy that replaces db_path only once finished
+    build_path = db_path.with_name(db_path.name + ".building") if fast_build else db_path
+    if fast_build:
+        copy_database(db_path, build_path)
 
     # Initialize database builder
-    db_builder = OntologyDatabaseBuilder()
-    db_builder.connect()
-    db_builder.create_schema()
-
-    # Parse and insert each ontology
-    ontologies = [
-        ("DOID", "doid.obo"),
-        ("SO", "so.obo"),
-        ("GO", "go.obo"),
-        ("HPO", "hp.obo"),
-        ("MONDO", "mondo.obo"),
-    ]
-
-    for ont_name, filename in ontologies:
-        filepath = ontology_dir / filename
-        if filepath.exists():
-            parser = OBOParser(str(filepath))
-            terms = parser.parse()
-            db_builder.insert_ontology(ont_name, terms)
+    db_builder = OntologyDatabaseBuilder(build_path, fast_build=fast_build)
+    try:
+        db_builder.connect()
+        db_builder.create_schema()
+
+        tasks = _plan_build(db_builder, ontology_dir, incremental, clinvar_release)
+        timings = {task.source: {"parse": 0.0, "write": 0.0, "records": 0} for task in tasks}
+
+        if jobs > 1 and tasks:
+            print(f"🚀 Pipelined build: {len(tasks)} sources, {jobs} producer processes")
+            db_builder.close()
+            _run_build_pipeline(db_builder.db_path, fast_build, tasks, jobs,
+                                snapshot_dir, timings)
+            db_builder.connect()
         else:
-            print(f"⚠️  {filename} not found, skipping")
-
-    # Parse and insert ClinVar (limit to 500k for speed)
-    clinvar_path = ontology_dir / "clinvar_summary.txt"
-    if clinvar_path.exists():
-        clinvar_parser = ClinVarParser(str(clinvar_path))
-        variants = clinvar_parser.parse(limit=500000)  # Limit for faster processing
-        db_builder.insert_clinvar(variants)
-    else:
-        print("⚠️  clinvar_summary.txt not found, skipping")
+            for task in tasks:
+                _run_serial_task(db_builder, task, snapshot_dir, workers, timings[task.source])
+
+        print("🔧 Building indices...")
+        finalize_start = time.perf_counter()
+        db_builder.index_term_search(task.source for task in tasks if task.kind == "ontology")
+        db_builder.index_term_closure(task.source for task in tasks if task.kind == "ontology")
+        # Refreshes keep the name index in step; full loads rewrite it
+        db_builder.index_variant_names(
+            force=any(task.kind == "clinvar" and not task.refresh for task in tasks))
+        db_builder.finalize(analyze=not incremental)
+        finalize_s = time.perf_counter() - finalize_start
+    except BaseException:
+        db_builder.close()
+        if fast_build:
+            build_path.unlink(missing_ok=True)
+        raise
 
     db_builder.close()
+    if fast_build:
+        os.replace(build_path, db_path)
 
     print()
     print("="*80)
     print("✅ LOCAL DATABASE BUILD COMPLETE")
     print("="*80)
-    print(f"Database location: {db_builder.db_path}")
+    print(f"Database location: {db_path}")
+    print_stage_timings(timings, finalize_s, time.perf_counter() - start_time)
     print()
 
 
 if __name__ == "__main__":
-    build_local_databases()
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Build the local ontology database")
+    arg_parser.add_argument("--workers", type=int, default=1,
+                            help="worker processes per OBO parse")
+    arg_parser.add_argument("--jobs", type=int, default=1,
+                            help="parse all sources concurrently in N processes "
+                                 "feeding a single database writer")
+    arg_parser.add_argument("--no-snapshots", action="store_true",
+                            help="always re-parse OBO files from text")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="update an existing database in place")
+    arg_parser.add_argument("--fast-build", action="store_true",
+                            help="bulk-load without journal or fsync into a scratch "
+                                 "file that replaces the database on success")
+    arg_parser.add_argument("--clinvar-release",
+                            help="ClinVar release label to record (default: file date)")
+    args = arg_parser.parse_args()
+
+    build_local_databases(workers=args.workers,
+                          snapshot_dir=None if args.no_snapshots else "data/indices",
+                          fast_build=args.fast_build,
+                          incremental=args.incremental,
+                          clinvar_release=args.clinvar_release,
+                          jobs=args.jobs)
@@ -0,0 +1,159 @@
+"""
+Tests for the HGVS variant parser and the normalizers that use it
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.normalizers.hgvs_parser import HGVSVariant, parse, parse_many
+from src.normalizers.local_normalizers import (
+    CoordinateNormalizer,
+    VariantNormalizer,
+    connection_manager,
+)
+from src.normalizers.local_ontology_parsers import OntologyDatabaseBuilder
+
+
+@pytest.mark.parametrize("text, canonical, three_letter, variant_type", [
+    # Protein: one- and three-letter codes, CIViC short forms
+    ("L858R", "p.L858R", "p.Leu858Arg", "missense"),
+    ("p.Leu858Arg", "p.L858R", "p.Leu858Arg", "missense"),
+    ("p.(Val600Glu)", "p.V600E", "p.Val600Glu", "missense"),
+    ("R213X", "p.R213*", "p.Arg213Ter", "nonsense"),
+    ("p.Trp288=", "p.W288=", "p.Trp288=", "synonymous"),
+    ("V600", "p.V600", "p.Val600", None),
+    ("E746_A750del", "p.E746_A750del", "p.Glu746_Ala750del", "deletion"),
+    ("E746_A750delinsQ", "p.E746_A750delinsQ", "p.Glu746_Ala750delinsGln", "delins"),
+    ("p.Asp770_Asn771insAsnProGly", "p.D770_N771insNPG", "p.Asp770_Asn771insAsnProGly",
+     "insertion"),
+    ("A767_V769dup", "p.A767_V769dup", "p.Ala767_Val769dup", "duplication"),
+    ("P95fs", "p.P95fs", "p.Pro95fs", "frameshift"),
+    ("p.Arg97ProfsTer23", "p.R97Pfs*23", "p.Arg97ProfsTer23", "frameshift"),
+    ("p.*110Glnext*17", "p.*110Qext*17", "p.Ter110GlnextTer17", "stop_lost"),
+    ("p.Met1ext-5", "p.M1ext-5", "p.Met1ext-5", "start_lost"),
+    # cDNA and genomic
+    ("c.2573T>G", "c.2573T>G", "c.2573T>G", "SNV"),
+    ("c.1234+5G>A", "c.1234+5G>A", "c.1234+5G>A", "SNV"),
+    ("c.-12A>G", "c.-12A>G", "c.-12A>G", "SNV"),
+    ("c.2235_2249del15", "c.2235_2249del", "c.2235_2249del", "deletion"),
+    ("c.2300_2301insGCA", "c.2300_2301insGCA", "c.2300_2301insGCA", "insertion"),
+    ("c.100_102delinsTT", "c.100_102delinsTT", "c.100_102delinsTT", "delins"),
+    ("c.76dup", "c.76dup", "c.76dup", "duplication"),
+    ("g.55191822_55191823insA", "g.55191822_55191823insA", "g.55191822_55191823insA",
+     "insertion"),
+])
+def test_parse_and_format(text, canonical, three_letter, variant_type):
+    variant = parse(text)
+    assert variant.format() == canonical
+    assert variant.format(three_letter=True) == three_letter
+    assert variant.variant_type == variant_type
+    # The canonical form parses back to the same change
+    reparsed = parse(canonical)
+    assert (reparsed.format(), reparsed.variant_type) == (canonical, variant_type)
+
+
+@pytest.mark.parametrize("text", [
+    "", "Amplification", "Exon 19 Deletion", "EML4-ALK", "exon19del", "p.Invalid",
+    "B600Z", "c.123ins", "V600_K601E", "E750_A746del", "c.2573T>", "x.123A>G",
+])
+def test_non_variants_do_not_parse(text):
+    assert parse(text) is None
+
+
+def test_references_genes_and_positions():
+    variant = parse("NM_005228.5(EGFR):c.2573T>G")
+    assert (variant.accession, variant.gene, variant.level) == ("NM_005228.5", "EGFR", "c")
+    assert (variant.start, variant.end, variant.ref, variant.alt) == (2573, 2573, "T", "G")
+
+    variant = parse("NC_000007.14:g.55191822T>G")
+    assert (variant.chromosome, variant.start) == ("7", 55191822)
+    assert parse("NC_000023.11:g.100A>G").chromosome == "X"
+
+    variant = parse("chr7:55249071 A>G")
+    assert (variant.level, variant.chromosome, variant.start, variant.ref, variant.alt) == (
+        "g", "7", 55249071, "A", "G")
+
+    variant = parse("BRAF V600E")
+    assert (variant.gene, variant.ref, variant.start, variant.alt) == ("BRAF", "V", 600, "E")
+
+    variant = parse("c.1234+5_1236-2del")
+    assert (variant.start, variant.start_offset, variant.end, variant.end_offset) == (
+        1234, 5, 1236, -2)
+
+    variant = parse("p.Arg97ProfsTer23")
+    assert (variant.alt, variant.ter) == ("P", 23)
+    assert variant.as_dict()["variant_type"] == "frameshift"
+
+
+def test_parse_many_shares_repeated_results():
+    column = ["L858R", None, "Amplification", float("nan"), "L858R", "c.2573T>G"]
+    parsed = parse_many(column)
+    assert parsed[0] is parsed[4]
+    assert parsed[1] is parsed[2] is parsed[3] is None
+    assert parsed[5] == parse("c.2573T>G")
+    assert isinstance(parsed[0], HGVSVariant)
+    assert not hasattr(parsed[0], "__dict__")
+
+
+def test_coordinate_normalizer(tmp_path):
+    # Genomic positions are looked up in ClinVar; an empty database will do
+    builder = OntologyDatabaseBuilder(str(tmp_path / "ontologies.db"))
+    builder.connect()
+    builder.create_schema()
+    builder.close()
+    normalizer = CoordinateNormalizer(str(tmp_path / "ontologies.db"), cache=None)
+
+    result = normalizer.normalize("chr7:55249071A>G")
+    assert (result["hgvs_validated"], result["confidence"]) == (True, 0.9)
+    assert (result["chromosome"], result["position"], result["ref"], result["alt"]) == (
+        "7", 55249071, "A", "G")
+    result = normalizer.normalize("7:55249071A>G")
+    assert (result["hgvs_validated"], result["confidence"], result["position"]) == (
+        False, 0.8, 55249071)
+
+    # One-letter protein HGVS and indels now validate too
+    for text in ("p.Leu858Arg", "p.V600E", "c.2573T>G", "c.2235_2249del15",
+                 "p.Glu746_Ala750del"):
+        assert normalizer.normalize(text)["hgvs_validated"], text
+
+    result = normalizer.normalize("NC_000007.14:g.55191822T>G")
+    assert (result["chromosome"], result["position"]) == ("7", 55191822)
+
+    for text in ("p.Invalid", "L858R", "invalid_variant", ""):
+        result = normalizer.normalize(text)
+        assert (result["hgvs_validated"], result["confidence"]) == (False, 0.0), text
+    connection_manager.close_all()
+
+
+def test_coordinate_normalizer_validates_hgvs_without_a_database(tmp_path):
+    normalizer = CoordinateNormalizer(str(tmp_path / "missing.db"))
+    for text in ("p.Leu858Arg", "c.2573T>G", "L858R", "invalid_variant"):
+        result = normalizer.normalize(text)
+        assert result["clinvar_matches"] == [], text
+    assert normalizer.normalize("c.2573T>G")["hgvs_validated"]
+    assert [result["confidence"] for result in normalizer.normalize_many(
+        ["p.Leu858Arg", "p.Leu858Arg"])] == [1.0, 1.0]
+    assert normalizer.conn is None
+
+    # Genomic positions need ClinVar
+    with pytest.raises(FileNotFoundError):
+        normalizer.normalize("chr7:55191822 T>G")
+
+
+def test_variant_type_inference():
+    infer = VariantNormalizer(cache=None)._infer_variant_type
+    assert infer("L858R") == "missense"
+    assert infer("R248*") == "nonsense"
+    assert infer("E746_A750delinsQ") == "delins"
+    assert infer("P95fs") == "frameshift"
+    # Names outside the grammar fall back to keywords
+    assert infer("Exon 19 Deletion") == "deletion"
+    assert infer("Exon 20 Insertion") == "insertion"
+    assert infer("Amplification") is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,665 @@
+"""
+Tests for the local normalizers
+Builds a small ontologies.db from inline fixtures, so no downloads are needed
+"""
+
+import math
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.normalizers import local_normalizers
+from src.normalizers.local_normalizers import (
+    TERM_BY_NAME_SQL,
+    TERM_BY_SYNONYM_SQL,
+    TERMS_BY_NAMES_SQL,
+    TERMS_BY_SYNONYMS_SQL,
+    VARIANTS_AT_POSITIONS_SQL,
+    VARIANTS_BY_CDNA_SQL,
+    VARIANTS_BY_CDNAS_SQL,
+    VARIANTS_BY_GENE_SQL,
+    VARIANTS_BY_NAME_SQL,
+    VARIANTS_BY_PROTEIN_SQL,
+    VARIANTS_BY_PROTEINS_SQL,
+    VARIANTS_IN_RANGE_SQL,
+    CoordinateNormalizer,
+    DiseaseNormalizer,
+    OntologyNormalizer,
+    ResultCache,
+    TermIndex,
+    TherapyNormalizer,
+    TrialNormalizer,
+    VariantNormalizer,
+    connection_manager,
+    result_cache,
+)
+from src.normalizers.local_ontology_parsers import OBOParser, OntologyDatabaseBuilder
+
+
+DOID_OBO = """format-version: 1.2
+
+[Term]
+id: DOID:162
+name: cancer
+synonym: "malignant tumor" EXACT []
+synonym: "malignant neoplasm" BROAD []
+
+[Term]
+id: DOID:1324
+name: lung cancer
+synonym: "lung neoplasm" EXACT []
+is_a: DOID:162 ! cancer
+
+[Term]
+id: DOID:3910
+name: lung adenocarcinoma
+is_a: DOID:1324 ! lung cancer
+
+[Term]
+id: DOID:1612
+name: breast cancer
+is_a: DOID:162 ! cancer
+"""
+
+MONDO_OBO = """format-version: 1.2
+
+[Term]
+id: MONDO:0005061
+name: lung adenocarcinoma
+"""
+
+HPO_OBO = """format-version: 1.2
+
+[Term]
+id: HP:0001250
+name: Seizure
+synonym: "Seizures" EXACT []
+synonym: "Epileptic seizure" EXACT []
+
+[Term]
+id: HP:0002069
+name: Bilateral tonic-clonic seizure
+is_a: HP:0001250 ! Seizure
+"""
+
+SO_OBO = """format-version: 1.2
+
+[Term]
+id: SO:0001583
+name: missense_variant
+def: "A sequence variant that changes one or more bases." []
+"""
+
+CLINVAR_ROWS = [
+    ("16609", "NM_005228.5(EGFR):c.2573T>G (p.Leu858Arg)", "EGFR", "drug response",
+     "121434568", "RCV000016609", "7", "55191822", "T", "G",
+     "single nucleotide variant", "GRCh38"),
+    ("13961", "NM_004333.6(BRAF):c.1799T>A (p.Val600Glu)", "BRAF", "Pathogenic",
+     "113488022", "RCV000013961", "7", "140753336", "A", "T",
+     "single nucleotide variant", "GRCh38"),
+]
+
+# Unrelated genes, so the planner sees a table worth indexing
+FILLER_ROWS = [
+    (str(100000 + i), f"NM_{i:06d}.1(GENE{i}):c.{i}A>G", f"GENE{i}", "Benign",
+     "", "", "1", str(1000 + i), "A", "G", "single nucleotide variant", "GRCh38")
+    for i in range(200)
+]
+
+
+# Edge cases for lookup parity: a name repeated up to case, a synonym on
+# two terms (the later-inserted one sorts first), an obsolete duplicate
+# and non-ASCII case, which SQLite's LOWER() does not fold
+DOID_EDGE_CASES = """
+[Term]
+id: DOID:9001
+name: Cancer
+synonym: "lung neoplasm" EXACT []
+
+[Term]
+id: DOID:0050
+name: Ménière disease
+synonym: "MÉNIÈRE DISEASE" EXACT []
+synonym: "malignant tumor" EXACT []
+
+[Term]
+id: DOID:9002
+name: lung adenocarcinoma
+is_obsolete: true
+"""
+
+
+def build_database(db_path: Path, doid_obo: str = DOID_OBO):
+    """Build a small ontologies.db the same way the real build does"""
+    builder = OntologyDatabaseBuilder(str(db_path))
+    builder.connect()
+    builder.create_schema()
+    for ontology, text in (("DOID", doid_obo), ("MONDO", MONDO_OBO),
+                           ("HPO", HPO_OBO), ("SO", SO_OBO)):
+        obo_path = db_path.parent / f"{ontology.lower()}.obo"
+        obo_path.write_text(text)
+        builder.insert_ontology(ontology, OBOParser(str(obo_path)).parse())
+    builder.insert_clinvar_rows(CLINVAR_ROWS + FILLER_ROWS)
+    builder.index_term_search()
+    builder.index_term_closure()
+    builder.index_variant_names()
+    builder.finalize()
+    builder.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "ontologies.db"
+    build_database(path)
+    yield path
+    connection_manager.close_all()
+    result_cache.clear()
+
+
+def test_normalizers_share_one_read_only_connection(db_path):
+    with DiseaseNormalizer(str(db_path)) as disease, \
+            OntologyNormalizer(str(db_path)) as ontology:
+        assert disease.conn is ontology.conn
+        assert disease.conn.execute("PRAGMA mmap_size").fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            disease.conn.execute("DELETE FROM terms")
+
+    # Closing a normalizer leaves the pooled connection usable
+    with DiseaseNormalizer(str(db_path)) as disease:
+        assert disease.normalize("lung adenocarcinoma")["doid"] == "DOID:3910"
+
+
+def test_connections_are_per_thread(db_path):
+    main_conn = connection_manager.get(db_path)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(connection_manager.get(db_path)))
+    thread.start()
+    thread.join()
+
+    assert seen[0] is not main_conn
+    assert connection_manager.get(db_path) is main_conn
+
+
+def test_one_normalizer_can_be_shared_by_threads(db_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with DiseaseNormalizer(str(db_path), cache=None) as disease:
+        names = ["lung adenocarcinoma", "lung cancer", "cancer", "breast cancer"] * 4
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(disease.normalize, names))
+        assert [result["doid"] for result in results] == [
+            disease.normalize(name)["doid"] for name in names]
+
+
+def test_rebuilt_database_gets_a_new_connection(db_path):
+    before = connection_manager.get(db_path)
+    db_path.unlink()
+    build_database(db_path)
+    with VariantNormalizer(str(db_path)) as variant:
+        assert variant.conn is not before
+        assert variant.normalize("BRAF", "V600E")["clinvar_matches"]
+
+    # The connection to the replaced file was closed, not leaked
+    with pytest.raises(sqlite3.ProgrammingError):
+        before.execute("SELECT 1")
+    assert before not in connection_manager._opened
+
+
+@pytest.mark.parametrize("sql, params, index", [
+    (TERM_BY_NAME_SQL, {"ontology": "DOID", "name": "Lung Cancer"},
+     "idx_term_ontology_name_lc"),
+    (TERM_BY_SYNONYM_SQL, {"ontology": "HPO", "name": "SEIZURES"}, "idx_synonym_lc"),
+    (VARIANTS_BY_GENE_SQL, {"gene": "egfr", "pattern": "%L858R%"},
+     "idx_variant_gene_uc_name"),
+    (VARIANTS_BY_PROTEIN_SQL, {"gene": "egfr", "change": "p.L858R"},
+     "idx_variant_protein_change"),
+    (VARIANTS_BY_CDNA_SQL, {"gene": "egfr", "change": "c.2573T>G"},
+     "idx_variant_cdna_change"),
+])
+def test_lookups_search_their_expression_index(db_path, sql, params, index):
+    conn = connection_manager.get(db_path)
+    plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    assert any(detail.startswith("SEARCH") and index in detail for detail in plan), plan
+    assert not any(detail.startswith("SCAN") for detail in plan), plan
+
+
+def test_variant_name_search_uses_trigram_index(db_path, monkeypatch):
+    conn = connection_manager.get(db_path)
+    params = {"gene": "EGFR", "pattern": "%Leu858Arg%"}
+    plan = [row["detail"] for row in conn.execute(
+        "EXPLAIN QUERY PLAN " + VARIANTS_BY_NAME_SQL, params)]
+
+    assert plan[0].startswith("SCAN f VIRTUAL TABLE"), plan
+    assert "INTEGER PRIMARY KEY" in plan[1], plan
+    assert [row["variation_id"] for row in conn.execute(VARIANTS_BY_NAME_SQL, params)] == ["16609"]
+
+    # Large genes go through the trigram index, small ones (and patterns
+    # too short for trigrams) through the gene index, with the same answers
+    with VariantNormalizer(str(db_path), cache=None) as variant:
+        for threshold in (1, 2000):
+            monkeypatch.setattr(local_normalizers, "TRIGRAM_MIN_GENE_VARIANTS", threshold)
+            for gene, name, expected in (("BRAF", "V600E", "13961"),
+                                         ("BRAF", "T>", "13961"),
+                                         ("EGFR", "L858R", "16609")):
+                matches = variant.normalize(gene, name)["clinvar_matches"]
+                assert [match["variation_id"] for match in matches] == [expected]
+
+
+def test_hgvs_changes_are_looked_up_exactly(db_path, monkeypatch):
+    with VariantNormalizer(str(db_path), cache=None) as variant:
+        # Every spelling of the change resolves through the parsed columns
+        for name in ("L858R", "p.L858R", "p.Leu858Arg", "Leu858Arg", "c.2573T>G"):
+            matches = variant.normalize("EGFR", name)["clinvar_matches"]
+            assert [match["variation_id"] for match in matches] == ["16609"], name
+        assert variant.normalize("EGFR", "L858Q")["clinvar_matches"] == []
+        assert variant.normalize("BRAF", "L858R")["clinvar_matches"] == []
+
+        # No substring search runs for them
+        monkeypatch.setattr(VariantNormalizer, "_name_matches", None)
+        assert variant.normalize("BRAF", "V600E")["clinvar_matches"][0]["variation_id"] == "13961"
+
+
+def test_unparsed_clinvar_names_fall_back_to_name_search(db_path):
+    # A ClinVar Name outside the HGVS grammar has no parsed columns
+    builder = OntologyDatabaseBuilder(str(db_path))
+    builder.connect()
+    builder.insert_clinvar_rows([
+        ("70000", "NM_000546.6(TP53):c.743G>A; R248Q", "TP53", "Pathogenic", "", "", "17",
+         "7674220", "C", "T", "single nucleotide variant", "GRCh38")])
+    builder.index_variant_names()
+    builder.close()
+
+    with VariantNormalizer(str(db_path), cache=None) as variant:
+        matches = variant.normalize("TP53", "R248Q")["clinvar_matches"]
+        assert [match["variation_id"] for match in matches] == ["70000"]
+
+
+def test_coordinate_lookups(db_path, monkeypatch):
+    conn = connection_manager.get(db_path)
+    params = {"assembly": "GRCh38", "chromosome": "7", "start": 55191800,
+              "stop": 55191900, "span": 0}
+    plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + VARIANTS_IN_RANGE_SQL,
+                                                  params)]
+    assert plan[0].startswith("SEARCH l USING PRIMARY KEY (assembly=? AND chromosome=? "
+                              "AND start>? AND start<?)"), plan
+    params = {"assembly": "GRCh38", "records": '[[0, "7", 55191822, "T", "G"]]'}
+    plan = [row["detail"] for row in conn.execute(
+        "EXPLAIN QUERY PLAN " + VARIANTS_AT_POSITIONS_SQL, params)]
+    assert plan[0].startswith("SCAN q VIRTUAL TABLE"), plan
+    assert "(assembly=? AND chromosome=? AND start=?)" in plan[1], plan
+
+    # A 10 bp deletion starting before the EGFR SNV, on both assemblies
+    builder = OntologyDatabaseBuilder(str(db_path))
+    builder.connect()
+    builder.insert_clinvar_rows([
+        ("50000", "NM_005228.5(EGFR):c.2566_2574del", "EGFR", "Pathogenic", "", "", "7",
+         str(55191815 + offset), "CTTGGTGCTGA", "C", "Deletion", assembly)
+        for offset, assembly in ((0, "GRCh38"), (-67000, "GRCh37"))])
+    builder.finalize()
+    builder.close()
+
+    with CoordinateNormalizer(str(db_path)) as coordinate:
+        result = coordinate.normalize("chr7:55191822 T>G")
+        assert [match["variation_id"] for match in result["clinvar_matches"]] == ["16609"]
+        assert result["clinvar_matches"][0]["clinical_significance"] == "drug response"
+        assert coordinate.normalize("chr7:55191822 T>C")["clinvar_matches"] == []
+        assert coordinate.normalize("chr7:55191822 T>G", "hg19")["clinvar_matches"] == []
+
+        # Ranges find everything overlapping them, including records that
+        # start earlier; each assembly has its own positions
+        assert [match["variation_id"] for match in coordinate.lookup_range(
+            "chr7", 55191822)] == ["50000", "16609"]
+        assert [(match["start"], match["stop"]) for match in coordinate.lookup_range(
+            "7", 55124800, 55124830, build="GRCh37")] == [(55124815, 55124825)]
+        assert coordinate.lookup_range("7", 55191826, 55191900) == []
+
+        # VCF batches: multi-allelic alts, chr prefixes and unknown alleles
+        matches = coordinate.lookup_vcf([
+            ("chr7", 55191822, "T", "C,G"),
+            ("7", 140753336, "A", "T"),
+            ("7", 55191815, "CTTGGTGCTGA", "C"),
+            ("7", 140753336, None, None),
+            ("X", 1, "A", "G"),
+        ])
+        assert [[match["variation_id"] for match in found] for found in matches] == [
+            ["16609"], ["13961"], ["50000"], ["13961"], []]
+        assert coordinate.lookup_vcf([]) == []
+
+        # normalize_many() resolves all substitutions with one lookup_vcf()
+        calls = []
+        lookup_vcf = CoordinateNormalizer.lookup_vcf
+        monkeypatch.setattr(CoordinateNormalizer, "lookup_vcf",
+                            lambda self, records, build: calls.append(records)
+                            or lookup_vcf(self, records, build))
+        results = coordinate.normalize_many(["chr7:55191822 T>G", "chr7:140753336A>T",
+                                             "p.V600E", "chr7:1A>G"])
+        assert [len(result["clinvar_matches"]) for result in results] == [1, 1, 0, 0]
+        assert len(calls) == 1 and len(calls[0]) == 3
+        with pytest.raises(ValueError):
+            coordinate.lookup_range("7", 1, build="hg99")
+
+
+def test_case_insensitive_lookups(db_path):
+    with DiseaseNormalizer(str(db_path)) as disease:
+        result = disease.normalize("LUNG Adenocarcinoma")
+        assert (result["doid"], result["mondo_id"]) == ("DOID:3910", "MONDO:0005061")
+        assert disease.normalize("Malignant Tumor")["confidence"] == 0.95
+
+    with OntologyNormalizer(str(db_path)) as ontology:
+        assert ontology.normalize_phenotype("seizures")["hpo_id"] == "HP:0001250"
+
+    with VariantNormalizer(str(db_path)) as variant:
+        matches = variant.normalize("egfr", "L858R")["clinvar_matches"]
+        assert [match["variation_id"] for match in matches] == ["16609"]
+
+
+def test_partial_matches_use_full_text_search(db_path):
+    with DiseaseNormalizer(str(db_path)) as disease:
+        matches = disease.normalize("Lung")["matches"]
+        assert [match["id"] for match in matches] == ["DOID:1324", "DOID:3910"]
+        assert {match["match_type"] for match in matches} == {"partial"}
+
+        # Last word matches as a prefix; punctuation never reaches MATCH
+        assert disease.normalize('lung "adeno')["matches"][0]["id"] == "DOID:3910"
+        assert disease.normalize("()")["matches"] == []
+
+    with OntologyNormalizer(str(db_path)) as ontology:
+        result = ontology.normalize_phenotype("tonic clonic")
+        assert (result["hpo_id"], result["confidence"]) == ("HP:0002069", 0.7)
+
+        # Synonym-only hit
+        assert ontology.normalize_phenotype("epileptic")["hpo_id"] == "HP:0001250"
+
+
+def test_normalize_many_matches_one_at_a_time(db_path):
+    diseases = ["lung adenocarcinoma", "MALIGNANT TUMOR", "lung", "nothing here",
+                "", "lung adenocarcinoma", "Lung Neoplasm"]
+    phenotypes = ["Seizure", "seizures", "tonic", "unknown", "Seizure"]
+    variants = [("EGFR", "L858R"), ("BRAF", "V600E"), ("EGFR", "L858R"), ("KRAS", "G12C"),
+                ("egfr", "c.2573T>G"), ("BRAF", "p.Val600Glu"), ("EGFR", "Leu858Arg"),
+                ("EGFR", "Exon 19 Deletion"), ("BRAF", "c.1799T>C")]
+
+    with DiseaseNormalizer(str(db_path), cache=None) as disease:
+        results = disease.normalize_many(iter(diseases))
+        assert results == [disease.normalize(name) for name in diseases]
+        assert results[0] is results[5]
+
+    with OntologyNormalizer(str(db_path), cache=None) as ontology:
+        assert (ontology.normalize_many(phenotypes)
+                == [ontology.normalize_phenotype(name) for name in phenotypes])
+
+    with VariantNormalizer(str(db_path), cache=None) as variant:
+        assert (variant.normalize_many(variants)
+                == [variant.normalize(gene, name) for gene, name in variants])
+
+    therapies = ["Tagrisso", "osimertinib", "unknown drug", "Tagrisso"]
+    assert (TherapyNormalizer(cache=None).normalize_many(therapies)
+            == [TherapyNormalizer(cache=None).normalize(name) for name in therapies])
+    trials = ["NCT01234567", "nct01234567", "see NCT01234567"]
+    assert (TrialNormalizer(cache=None).normalize_many(trials)
+            == [TrialNormalizer(cache=None).normalize(trial) for trial in trials])
+    coordinates = ["chr7:g.55191822T>G", "7:55249071A>G", "chr7:55191822T>G",
+                   "NC_000007.14:g.140753336A>T", "NC_000007.14:g.55191822del",
+                   "p.Leu858Arg", "L858R", "chr7:g.55191822T>G"]
+    with CoordinateNormalizer(str(db_path), cache=None) as coordinate:
+        results = coordinate.normalize_many(coordinates, build="hg38")
+        assert results == [coordinate.normalize(coord, "hg38") for coord in coordinates]
+        assert [len(result["clinvar_matches"]) for result in results] == [1, 0, 1, 1, 1,
+                                                                         0, 0, 1]
+
+
+@pytest.mark.parametrize("sql, index", [
+    (TERMS_BY_NAMES_SQL, "idx_term_ontology_name_lc"),
+    (TERMS_BY_SYNONYMS_SQL, "idx_synonym_lc"),
+])
+def test_batch_lookups_probe_the_index_per_query(db_path, sql, index):
+    conn = connection_manager.get(db_path)
+    params = {"names": '["Seizure", "lung cancer"]', "ontology": "HPO"}
+    plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    assert plan[0].startswith("SCAN q VIRTUAL TABLE"), plan
+    assert any(detail.startswith("SEARCH") and index in detail for detail in plan), plan
+
+
+@pytest.mark.parametrize("sql, index", [
+    (VARIANTS_BY_PROTEINS_SQL, "idx_variant_protein_change"),
+    (VARIANTS_BY_CDNAS_SQL, "idx_variant_cdna_change"),
+])
+def test_batch_variant_lookups_probe_the_index_per_change(db_path, sql, index):
+    conn = connection_manager.get(db_path)
+    params = {"changes": '[["EGFR", "p.L858R"], ["BRAF", "c.1799T>A"]]'}
+    plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    assert plan[0].startswith("SCAN q VIRTUAL TABLE"), plan
+    assert any(detail.startswith("SEARCH") and index in detail for detail in plan), plan
+
+
+def test_batched_variants_skip_the_name_search(db_path, monkeypatch):
+    calls = []
+    original = VariantNormalizer._name_matches
+    monkeypatch.setattr(VariantNormalizer, "_name_matches",
+                        lambda self, cursor, gene, variant: calls.append(variant)
+                        or original(self, cursor, gene, variant))
+    with VariantNormalizer(str(db_path), cache=None) as variant:
+        results = variant.normalize_many([("EGFR", "L858R"), ("BRAF", "c.1799T>A"),
+                                          ("EGFR", "Exon 19 Deletion")])
+    assert [len(result["clinvar_matches"]) for result in results] == [1, 1, 0]
+    assert calls == ["Exon 19 Deletion"]
+
+
+def test_results_are_memoized_per_database_build(db_path):
+    cache = ResultCache(maxsize=2)
+    with DiseaseNormalizer(str(db_path), cache=cache) as disease:
+        first = disease.normalize("lung adenocarcinoma")
+        first["doid"] = "changed by the caller"
+        assert disease.normalize("lung adenocarcinoma")["doid"] == "DOID:3910"
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+        # normalize_many() shares the single-item entries
+        disease.normalize_many(["lung adenocarcinoma", "cancer"])
+        disease.normalize("cancer")
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (3, 2)
+
+        # Bounded: the least recently used entry goes first
+        disease.normalize("breast cancer")
+        assert cache.stats()["size"] == 2
+        disease.normalize("lung adenocarcinoma")
+        assert cache.stats()["misses"] == 4
+
+    # A rebuilt database has a new fingerprint, so nothing is reused
+    db_path.unlink()
+    build_database(db_path)
+    with DiseaseNormalizer(str(db_path), cache=cache) as disease:
+        disease.normalize("breast cancer")
+    assert cache.stats()["misses"] == 5
+
+    # Normalizers that never touch the database are not memoized
+    TherapyNormalizer(cache=cache).normalize_many(["Tagrisso", "Tagrisso"])
+    assert cache.stats()["misses"] == 5
+
+
+def test_batch_bypasses_the_cache_only_on_its_own_thread(db_path):
+    cache = ResultCache()
+    with DiseaseNormalizer(str(db_path), cache=cache) as disease:
+        computing, release = threading.Event(), threading.Event()
+        normalize_unique = disease._normalize_unique
+
+        def slow_normalize_unique(items, **kwargs):
+            computing.set()
+            release.wait(5)
+            return normalize_unique(items, **kwargs)
+
+        disease._normalize_unique = slow_normalize_unique
+        batch = threading.Thread(target=disease.normalize_many, args=(["lung cancer"],))
+        batch.start()
+        assert computing.wait(5)
+
+        # Another thread's single lookups still go through the cache
+        disease.normalize("cancer")
+        disease.normalize("cancer")
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+        release.set()
+        batch.join()
+        # The batch stored its result once, under the single-item key
+        disease.normalize("lung cancer")
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 2)
+
+
+def test_persistent_result_cache(db_path, tmp_path):
+    cache_path = tmp_path / "cache" / "results.db"
+    with VariantNormalizer(str(db_path), cache=ResultCache(path=str(cache_path))) as variant:
+        expected = variant.normalize("EGFR", "L858R")
+
+    # A new process (here: a new cache) reads the stored result
+    cache = ResultCache(path=str(cache_path))
+    with VariantNormalizer(str(db_path), cache=cache) as variant:
+        assert variant.normalize_many([("EGFR", "L858R")]) == [expected]
+    assert (cache.stats()["disk_hits"], cache.stats()["misses"]) == (1, 0)
+
+    # After a rebuild the stale row is neither served nor kept
+    db_path.unlink()
+    build_database(db_path)
+    cache.clear()
+    with VariantNormalizer(str(db_path), cache=cache) as variant:
+        variant.normalize("BRAF", "V600E")
+    assert cache.stats()["disk_hits"] == 0
+    rows = sqlite3.connect(cache_path).execute("SELECT key FROM result_cache").fetchall()
+    assert rows == [('[["BRAF", "V600E"], {}]',)]
+    cache.configure(path=None)
+
+
+def test_in_memory_index_matches_sql_lookups(tmp_path):
+    db_path = tmp_path / "ontologies.db"
+    build_database(db_path, DOID_OBO + DOID_EDGE_CASES)
+    conn = connection_manager.get(db_path)
+    labels = [row[0] for row in conn.execute(
+        "SELECT name FROM terms UNION ALL SELECT synonym FROM synonyms")]
+    queries = ["", "unknown", "lung", "ménière disease", "MÉNIÈRE DISEASE"] + [
+        variant for label in labels
+        for variant in (label, label.upper(), label.lower(), label.title())]
+
+    try:
+        with DiseaseNormalizer(str(db_path), cache=None) as sql, \
+                DiseaseNormalizer(str(db_path), cache=None, in_memory=True) as memory:
+            assert [memory.normalize(name) for name in queries] == \
+                [sql.normalize(name) for name in queries]
+            assert memory.normalize_many(queries) == sql.normalize_many(queries)
+            assert memory.normalize("lung neoplasm")["doid"] == "DOID:1324"
+            assert memory.normalize("MALIGNANT TUMOR")["doid"] == "DOID:0050"
+
+        with OntologyNormalizer(str(db_path), cache=None) as sql, \
+                OntologyNormalizer(str(db_path), cache=None, in_memory=True) as memory:
+            assert [memory.normalize_phenotype(name) for name in queries] == \
+                [sql.normalize_phenotype(name) for name in queries]
+            assert memory.normalize_many(queries) == sql.normalize_many(queries)
+
+            # Exact and synonym hits never reach SQLite
+            statements = []
+            memory.conn.set_trace_callback(statements.append)
+            assert memory.normalize_many(["seizure", "EPILEPTIC SEIZURE"])[1]["confidence"] == 0.95
+            memory.conn.set_trace_callback(None)
+            assert statements == []
+
+            usage = memory.index.memory_usage()
+            assert (usage["terms"], usage["synonyms"]) == (9, 6)
+            assert usage["bytes"] > 0
+    finally:
+        connection_manager.close_all()
+
+
+def test_in_memory_index_is_loaded_once_per_build(db_path):
+    with DiseaseNormalizer(str(db_path), in_memory=True) as first, \
+            OntologyNormalizer(str(db_path), in_memory=True) as second:
+        assert isinstance(first.index, TermIndex)
+        assert first.index is second.index
+
+    db_path.unlink()
+    build_database(db_path)
+    with DiseaseNormalizer(str(db_path), in_memory=True) as disease:
+        assert disease.index is not first.index
+        assert disease.normalize("Lung Cancer")["doid"] == "DOID:1324"
+
+
+def test_hierarchy_queries(tmp_path):
+    db_path = tmp_path / "ontologies.db"
+    # Under lung cancer in the spanning tree, and under breast cancer too
+    build_database(db_path, DOID_OBO + "\n[Term]\nid: DOID:5000\nname: combined carcinoma\n"
+                   "is_a: DOID:1324\nis_a: DOID:1612\n")
+
+    try:
+        with DiseaseNormalizer(str(db_path)) as disease:
+            assert disease.ancestors("DOID:3910") == [
+                {"id": "DOID:1324", "name": "lung cancer", "depth": 1},
+                {"id": "DOID:162", "name": "cancer", "depth": 2},
+            ]
+            assert [(term["id"], term["depth"]) for term in disease.descendants("DOID:162")] == [
+                ("DOID:1324", 1), ("DOID:1612", 1), ("DOID:3910", 2), ("DOID:5000", 2)]
+            assert [term["id"] for term in disease.descendants("DOID:1612")] == ["DOID:5000"]
+            assert disease.descendants("DOID:3910") == disease.ancestors("DOID:162") == []
+
+            assert disease.is_descendant_of("DOID:3910", "DOID:162")
+            pairs = [("DOID:5000", "DOID:1612"), ("DOID:5000", "DOID:1324"),
+                     ("DOID:162", "DOID:3910"), ("DOID:3910", "DOID:1612"),
+                     ("DOID:162", "DOID:162"), ("DOID:3910", "DOID:unknown"),
+                     ("HP:0002069", "DOID:162")]
+            assert disease.is_descendant_of_many(pairs) == [
+                True, True, False, False, False, False, False]
+
+        with OntologyNormalizer(str(db_path)) as ontology:
+            assert ontology.is_descendant_of("HP:0002069", "HP:0001250")
+            assert [term["id"] for term in ontology.ancestors("HP:0002069")] == ["HP:0001250"]
+
+        conn = connection_manager.get(db_path)
+        for sql in (local_normalizers.ANCESTORS_SQL, local_normalizers.DESCENDANTS_SQL):
+            plan = [row["detail"] for row in conn.execute(
+                "EXPLAIN QUERY PLAN " + sql, {"term_id": "DOID:162"})]
+            assert not any(detail.startswith("SCAN") for detail in plan), plan
+    finally:
+        connection_manager.close_all()
+
+
+def test_semantic_similarity(db_path):
+    with DiseaseNormalizer(str(db_path)) as disease:
+        engine = disease.semantic_similarity()
+        assert disease.semantic_similarity() is engine
+
+    # 4 DOID terms: cancer covers all of them, lung cancer half
+    ic = engine.information_content(["DOID:162", "DOID:1324", "DOID:3910", "DOID:unknown"])
+    assert ic[:3] == pytest.approx([0, math.log(2), math.log(4)])
+    assert math.isnan(ic[3])
+
+    pairs = [("DOID:3910", "DOID:1324"), ("DOID:3910", "DOID:1612"),
+             ("DOID:162", "DOID:162"), ("DOID:3910", "DOID:unknown"), ("HP:0001250", "DOID:162")]
+    resnik = engine.similarity_many(pairs, method="resnik")
+    lin = engine.similarity_many(pairs, method="lin")
+    assert resnik[:3] == pytest.approx([math.log(2), 0, 0])
+    assert lin[:3] == pytest.approx([2 / 3, 0, 1])
+    assert all(math.isnan(score) for score in [*resnik[3:], *lin[3:]])
+    assert engine.similarity("DOID:1324", "DOID:3910") == pytest.approx(2 / 3)
+    with pytest.raises(ValueError):
+        engine.similarity_many(pairs, method="jaccard")
+
+    # Best match average: 3910 best matches 1324 (2/3); 1324 and 1612
+    # best match 3910 with 2/3 and 0
+    scores = engine.set_similarity_many([
+        (["DOID:3910"], ["DOID:1324", "DOID:1612"]),
+        (["DOID:1324", "DOID:1612"], ["DOID:1612", "DOID:1324", "DOID:unknown"]),
+        (["DOID:unknown"], ["DOID:162"]),
+    ])
+    assert scores[:2] == pytest.approx([0.5, 1])
+    assert math.isnan(scores[2])
+
+    with OntologyNormalizer(str(db_path)) as ontology:
+        phenotypes = ontology.semantic_similarity()
+        assert phenotypes.ontology == "HPO"
+        assert phenotypes.similarity("HP:0002069", "HP:0002069") == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
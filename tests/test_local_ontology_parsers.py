@@ -0,0 +1,596 @@
+"""
+Tests for the local ontology parsers and database builder
+Uses a small inline OBO file, so no downloaded ontologies are needed
+"""
+
+import gzip
+import sqlite3
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.normalizers.local_ontology_parsers import (
+    ClinVarParser,
+    OBOParser,
+    OntologyDatabaseBuilder,
+    build_local_databases,
+    hierarchy_labels,
+    split_obo_stanzas,
+)
+
+
+SAMPLE_OBO = """format-version: 1.2
+data-version: releases/2024-01-01
+ontology: doid
+
+[Term]
+id: DOID:162
+name: cancer
+def: "A disease of cellular proliferation." [url:http://example.org]
+synonym: "malignant tumor" EXACT []
+synonym: "malignant neoplasm" BROAD []
+xref: NCI:C9305
+is_a: DOID:14566 ! disease of cellular proliferation
+
+[Term]
+id: DOID:14566
+name: disease of cellular proliferation
+
+[Term]
+id: DOID:1324
+name: lung cancer
+alt_id: DOID:13075
+synonym: "lung neoplasm" EXACT []
+is_a: DOID:162 ! cancer
+relationship: located_in UBERON:0002048 ! lung
+
+[Term]
+id: DOID:3910
+name: lung adenocarcinoma
+is_a: DOID:1324 ! lung cancer
+
+[Term]
+id: DOID:0000000
+name: obsolete thing
+is_obsolete: true
+
+[Typedef]
+id: located_in
+name: located in
+"""
+
+
+def write_sample(tmp_path: Path) -> Path:
+    path = tmp_path / "sample.obo"
+    path.write_text(SAMPLE_OBO)
+    return path
+
+
+def test_parse_builds_indices(tmp_path):
+    parser = OBOParser(str(write_sample(tmp_path)))
+    terms = parser.parse()
+
+    assert "DOID:0000000" not in terms
+    assert terms["DOID:162"].definition == "A disease of cellular proliferation."
+    assert terms["DOID:3910"].is_a == ("DOID:1324",)
+    assert parser.get_term_by_name("Lung Cancer").id == "DOID:1324"
+    assert [t.id for t in parser.search_by_synonym("malignant tumor")] == ["DOID:162"]
+
+
+def test_malformed_tags_are_skipped(tmp_path):
+    path = tmp_path / "malformed.obo"
+    path.write_text("[Term]\nid: DOID:1\nname: one\nis_a:\nrelationship: part_of\n"
+                    "is_a: DOID:2 ! two\n\n[Term]\nid: DOID:2\nname: two\n")
+    terms = OBOParser(str(path)).parse()
+
+    assert terms["DOID:1"].is_a == ("DOID:2",)
+    assert terms["DOID:1"].relationships == ()
+
+
+def test_alt_ids_are_aliases_not_terms(tmp_path):
+    parser = OBOParser(str(write_sample(tmp_path)))
+    terms = parser.parse()
+
+    assert "DOID:13075" not in terms
+    assert parser.alt_id_to_id == {"DOID:13075": "DOID:1324"}
+    assert parser.get_term_by_id("DOID:13075") is terms["DOID:1324"]
+
+
+def test_insert_ontology_writes_each_term_once(tmp_path):
+    parser = OBOParser(str(write_sample(tmp_path)))
+    terms = parser.parse()
+
+    builder = OntologyDatabaseBuilder(str(tmp_path / "ontologies.db"))
+    builder.connect()
+    builder.create_schema()
+    builder.insert_ontology("DOID", terms)
+    builder.finalize()
+    builder.close()
+
+    conn = sqlite3.connect(str(tmp_path / "ontologies.db"))
+    count = lambda sql: conn.execute(sql).fetchone()[0]
+    assert count("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_synonym_lc'") == 1
+    assert count("SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'terms'") > 0
+    assert count("SELECT COUNT(*) FROM terms") == 4
+    assert count("SELECT COUNT(*) FROM synonyms WHERE term_id = 'DOID:1324'") == 1
+    assert count("SELECT COUNT(*) FROM relationships WHERE child_id = 'DOID:1324'") == 2
+    assert conn.execute("SELECT term_id FROM alt_ids WHERE alt_id = 'DOID:13075'").fetchone() == ("DOID:1324",)
+    assert conn.execute(
+        "SELECT scope FROM synonyms WHERE synonym = 'malignant neoplasm'"
+    ).fetchone() == ("BROAD",)
+    conn.close()
+
+
+def test_synonym_scopes_and_relationships(tmp_path):
+    parser = OBOParser(str(write_sample(tmp_path)))
+    terms = parser.parse()
+
+    assert terms["DOID:162"].synonyms == ("malignant tumor", "malignant neoplasm")
+    assert terms["DOID:162"].synonym_scopes == ("EXACT", "BROAD")
+    assert terms["DOID:1324"].relationships == (("located_in", "UBERON:0002048"),)
+
+
+def test_fuzzy_search_uses_trigram_candidates(tmp_path):
+    parser = OBOParser(str(write_sample(tmp_path)))
+    parser.parse()
+
+    results = parser.fuzzy_search("LUNG", limit=5)
+    assert [(t.id, round(score, 3)) for t, score in results] == [
+        ("DOID:1324", 0.327),  # "lung cancer", shortest name first
+        ("DOID:3910", 0.189),  # "lung adenocarcinoma"
+    ]
+    assert parser.fuzzy_search("cancer")[0] == (parser.terms["DOID:162"], 1.0)
+    assert parser.fuzzy_search("malignant")[0][0].id == "DOID:162"  # via synonym
+    assert parser.fuzzy_search("zzz") == []
+
+
+def test_split_obo_stanzas_aligns_to_headers(tmp_path):
+    path = write_sample(tmp_path)
+    data = path.read_bytes()
+
+    ranges = split_obo_stanzas(path, 8)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[start:start + 1] == b"["
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    path = write_sample(tmp_path)
+
+    serial = OBOParser(str(path))
+    serial.parse()
+    parallel = OBOParser(str(path))
+    parallel.parse(workers=2)
+
+    assert list(parallel.terms) == list(serial.terms)
+    assert parallel.name_to_id == serial.name_to_id
+    assert parallel.synonym_to_id == serial.synonym_to_id
+
+
+def test_snapshot_roundtrip_and_invalidation(tmp_path, capsys):
+    path = write_sample(tmp_path)
+    snapshot_dir = tmp_path / "indices"
+
+    first = OBOParser(str(path))
+    first.parse_cached(str(snapshot_dir))
+    cached = OBOParser(str(path))
+    cached.parse_cached(str(snapshot_dir))
+
+    assert "Loaded sample.obo snapshot" in capsys.readouterr().out
+    assert cached.terms == first.terms
+    assert cached.name_to_id == first.name_to_id
+    assert cached.synonym_to_id == first.synonym_to_id
+
+    # The snapshot holds no module-qualified callables, so the module run
+    # as a script (imported as local_ontology_parsers) loads it too
+    script = ("import sys; from local_ontology_parsers import OBOParser; "
+              "OBOParser(sys.argv[1]).parse_cached(sys.argv[2])")
+    output = subprocess.run(
+        [sys.executable, "-c", script, str(path), str(snapshot_dir)],
+        cwd=Path(__file__).parent.parent / "src" / "normalizers",
+        capture_output=True, text=True, check=True).stdout
+    assert "Loaded sample.obo snapshot" in output, output
+
+    # A compressed copy of the input keeps a snapshot of its own
+    gz_path = path.with_name("sample.obo.gz")
+    gz_path.write_bytes(gzip.compress(path.read_bytes()))
+    OBOParser(str(gz_path)).parse_cached(str(snapshot_dir))
+    gz_snapshots = list(snapshot_dir.glob("sample.obo.gz.*.snapshot"))
+    assert len(gz_snapshots) == 1
+
+    # Changing the file must invalidate (and replace) the old snapshot
+    path.write_text(SAMPLE_OBO.replace("name: cancer", "name: malignant disease"))
+    changed = OBOParser(str(path))
+    changed.parse_cached(str(snapshot_dir))
+
+    assert "snapshot" not in capsys.readouterr().out
+    assert changed.terms["DOID:162"].name == "malignant disease"
+    assert len(list(snapshot_dir.glob("sample.obo.*.v*.snapshot"))) == 2
+    assert all(snapshot.exists() for snapshot in gz_snapshots)
+
+    # A snapshot written without the search index still serves fuzzy_search
+    OBOParser(str(path), search_index=False).parse_cached(str(snapshot_dir / "bare"))
+    searchable = OBOParser(str(path))
+    searchable.parse_cached(str(snapshot_dir / "bare"))
+    assert searchable.fuzzy_search("malignant disease")[0][1] == 1.0
+
+
+CLINVAR_HEADER = [
+    "#AlleleID", "Type", "Name", "GeneSymbol", "ClinicalSignificance",
+    "RS# (dbSNP)", "RCVaccession", "Assembly", "Chromosome", "VariationID",
+    "PositionVCF", "ReferenceAlleleVCF", "AlternateAlleleVCF",
+]
+
+CLINVAR_ROWS = [
+    ["31", "single nucleotide variant", "NM_005228.5(EGFR):c.2573T>G (p.Leu858Arg)",
+     "EGFR", "drug response", "121434568", "RCV000016609", "GRCh38", "7", "16609",
+     "55191822", "T", "G"],
+    ["32", "single nucleotide variant", "NM_004333.6(BRAF):c.1799T>A (p.Val600Glu)",
+     "BRAF", "Pathogenic", "113488022", "RCV000013961", "GRCh38", "7", "13961",
+     "140753336", "A", "T"],
+    # No VariationID: skipped
+    ["33", "Deletion", "some deletion", "TP53", "", "", "", "GRCh38", "17", "",
+     "7673776", "", ""],
+]
+
+
+def write_clinvar(tmp_path: Path) -> Path:
+    path = tmp_path / "clinvar_summary.txt"
+    lines = ["\t".join(CLINVAR_HEADER)] + ["\t".join(row) for row in CLINVAR_ROWS]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_clinvar_rows_stream_into_database(tmp_path):
+    rows = list(ClinVarParser(str(write_clinvar(tmp_path))).iter_rows())
+
+    assert rows[0][:4] == ("16609", "NM_005228.5(EGFR):c.2573T>G (p.Leu858Arg)",
+                           "EGFR", "drug response")
+    assert rows[1][7:] == ("140753336", "A", "T", "single nucleotide variant", "GRCh38")
+    assert len(rows) == 2
+
+    builder = OntologyDatabaseBuilder(str(tmp_path / "ontologies.db"))
+    builder.connect()
+    builder.create_schema()
+    builder.insert_clinvar_rows(iter(rows), batch_size=1)
+
+    assert builder.conn.execute("SELECT COUNT(*) FROM variants").fetchone()[0] == 2
+    # Names are parsed into their HGVS parts on insert
+    assert tuple(builder.conn.execute("""
+        SELECT transcript, hgvs_gene, cdna_change, protein_change, protein_change_3
+        FROM variants WHERE variation_id = '16609'
+    """).fetchone()) == ("NM_005228.5", "EGFR", "c.2573T>G", "p.L858R", "p.Leu858Arg")
+    builder.close()
+
+
+def test_parsed_columns_and_locations_are_backfilled_on_upgrade(tmp_path):
+    rows = list(ClinVarParser(str(write_clinvar(tmp_path))).iter_rows())
+    db_path = tmp_path / "ontologies.db"
+    builder = OntologyDatabaseBuilder(str(db_path))
+    builder.connect()
+    builder.create_schema()
+    builder.insert_clinvar_rows(rows)
+    # A database from before the columns and locations existed
+    for column in ("transcript", "hgvs_gene", "cdna_change", "protein_change",
+                   "protein_change_3"):
+        builder.conn.execute(f"ALTER TABLE variants DROP COLUMN {column}")
+    builder.conn.execute("DROP TABLE variant_locations")
+    builder.conn.commit()
+    builder.close()
+
+    builder = OntologyDatabaseBuilder(str(db_path))
+    builder.connect()
+    builder.create_schema()
+    assert [tuple(row) for row in builder.conn.execute(
+        "SELECT variation_id, protein_change, cdna_change FROM variants ORDER BY 1"
+    )] == [("13961", "p.V600E", "c.1799T>A"), ("16609", "p.L858R", "c.2573T>G")]
+    assert [tuple(row) for row in builder.conn.execute(
+        "SELECT * FROM variant_locations ORDER BY start"
+    )] == [("GRCh38", "7", 55191822, 55191822, "16609", "T", "G"),
+           ("GRCh38", "7", 140753336, 140753336, "13961", "A", "T")]
+
+    # Refreshes write the parsed columns too (staging has the same layout)
+    new_variant = ("99999", "NM_000546.6(TP53):c.743G>A (p.Arg248Gln)") + rows[0][2:]
+    builder.refresh_clinvar(rows + [new_variant])
+    assert tuple(builder.conn.execute(
+        "SELECT hgvs_gene, protein_change_3 FROM variants WHERE variation_id = '99999'"
+    ).fetchone()) == ("TP53", "p.Arg248Gln")
+    builder.close()
+
+
+def test_refresh_clinvar_applies_only_the_diff(tmp_path):
+    rows = list(ClinVarParser(str(write_clinvar(tmp_path))).iter_rows())
+
+    builder = OntologyDatabaseBuilder(str(tmp_path / "ontologies.db"))
+    builder.connect()
+    builder.create_schema()
+    builder.insert_clinvar_rows(rows)
+
+    reclassified = rows[1][:3] + ("Likely pathogenic",) + rows[1][4:]
+    new_variant = ("99999",) + rows[0][1:]
+    stats = builder.refresh_clinvar([reclassified, new_variant], release="2024-02")
+
+    assert stats == {"staged": 2, "inserted": 1, "updated": 1, "deleted": 1}
+    variants = dict(builder.conn.execute(
+        "SELECT variation_id, clinical_significance FROM variants"
+    ).fetchall())
+    assert variants == {"13961": "Likely pathogenic", "99999": "drug response"}
+    assert builder.get_source("ClinVar")["version"] == "2024-02"
+    # Locations follow the release: 16609's is gone, 99999 took its position
+    assert [tuple(row) for row in builder.conn.execute(
+        "SELECT variation_id, assembly, start FROM variant_locations ORDER BY start"
+    )] == [("99999", "GRCh38", 55191822), ("13961", "GRCh38", 140753336)]
+
+    # Re-applying the same release writes nothing
+    stats = builder.refresh_clinvar([reclassified, new_variant], release="2024-02")
+    assert stats == {"staged": 2, "inserted": 0, "updated": 0, "deleted": 0}
+
+    # variants keeps one row per variation_id, locations one per assembly
+    grch37 = rows[1][:7] + ("140453136",) + rows[1][8:11] + ("GRCh37",)
+    builder.refresh_clinvar([grch37, reclassified, new_variant], release="2024-03")
+    assert [tuple(row) for row in builder.conn.execute(
+        "SELECT assembly, start FROM variant_locations WHERE variation_id = '13961' "
+        "ORDER BY assembly"
+    )] == [("GRCh37", 140453136), ("GRCh38", 140753336)]
+    builder.close()
+
+
+def test_refresh_clinvar_keeps_the_name_index_in_step(tmp_path, capsys):
+    rows = list(ClinVarParser(str(write_clinvar(tmp_path))).iter_rows())
+
+    builder = OntologyDatabaseBuilder(str(tmp_path / "ontologies.db"))
+    builder.connect()
+    builder.create_schema()
+    builder.insert_clinvar_rows(rows)
+    builder.index_variant_names()
+
+    renamed = rows[1][:1] + ("NM_004333.6(BRAF):c.1798G>A (p.Val600Met)",) + rows[1][2:]
+    new_variant = ("99999", "NM_000546.6(TP53):c.743G>A (p.Arg248Gln)") + rows[0][2:]
+    builder.refresh_clinvar([renamed, new_variant])
+    capsys.readouterr()
+    builder.index_variant_names(force=False)
+    assert "Indexed ClinVar names" not in capsys.readouterr().out
+
+    # The index matches the table (raises if any entry is stale)
+    builder.conn.execute("INSERT INTO variant_names(variant_names, rank) "
+                         "VALUES('integrity-check', 1)")
+    search = lambda text: [row[0] for row in builder.conn.execute(
+        "SELECT v.variation_id FROM variant_names f JOIN variants v ON v.rowid = f.rowid "
+        "WHERE f.name LIKE ? ORDER BY 1", (f"%{text}%",))]
+    assert search("Val600") == ["13961"]
+    assert search("Val600Glu") == search("Leu858Arg") == []
+    assert search("Arg248Gln") == ["99999"]
+    builder.close()
+
+
+def test_replace_ontology_swaps_only_that_ontology(tmp_path):
+    path = write_sample(tmp_path)
+    hpo_path = tmp_path / "hp.obo"
+    hpo_path.write_text("[Term]\nid: HP:0001250\nname: Seizure\n"
+                        "synonym: \"Seizures\" EXACT []\nis_a: HP:0012638\n")
+
+    builder = OntologyDatabaseBuilder(str(tmp_path / "ontologies.db"))
+    builder.connect()
+    builder.create_schema()
+    builder.replace_ontology("DOID", OBOParser(str(path)).parse(),
+                             "releases/2024-01-01", path, "abc")
+    builder.replace_ontology("HPO", OBOParser(str(hpo_path)).parse())
+    assert builder.source_is_current("DOID", path) == (True, "abc")
+
+    # Re-loading DOID replaces its rows and leaves HPO alone
+    path.write_text(SAMPLE_OBO.replace('synonym: "lung neoplasm" EXACT []\n', ""))
+    is_current, digest = builder.source_is_current("DOID", path)
+    assert not is_current and len(digest) == 64
+
+    builder.replace_ontology("DOID", OBOParser(str(path)).parse(),
+                             "releases/2024-02-01", path, digest)
+    count = lambda sql: builder.conn.execute(sql).fetchone()[0]
+    assert count("SELECT COUNT(*) FROM synonyms") == 3  # 2 DOID + 1 HPO
+    assert count("SELECT COUNT(*) FROM relationships") == 5
+    assert count("SELECT COUNT(*) FROM terms WHERE ontology = 'HPO'") == 1
+    assert builder.get_source("DOID")["version"] == "releases/2024-02-01"
+    builder.close()
+
+
+def test_hierarchy_labels_answer_subsumption():
+    # A diamond (D under B and C) plus a shortcut edge from E to the root A
+    edges = [("B", "A"), ("C", "A"), ("D", "B"), ("D", "C"), ("E", "D"), ("E", "A"),
+             ("F", "C"), ("X", "outside"), ("X", "X")]
+    labels = hierarchy_labels("ABCDEFGX", edges)
+
+    assert labels.closure["E"] == {"D": 1, "A": 1, "B": 2, "C": 2}
+    assert labels.closure["X"] == labels.closure["G"] == {}
+    reachable = {term: set(ancestors) | {term} for term, ancestors in labels.closure.items()}
+    for ancestor in "ABCDEFGX":
+        for term in "ABCDEFGX":
+            inside = any(lo <= labels.post[term] <= hi for lo, hi in labels.intervals[ancestor])
+            assert inside == (ancestor in reachable[term]), (ancestor, term)
+    # D sits under B in the spanning tree, so C needs a second range
+    assert len(labels.intervals["C"]) == 2
+
+    # A cycle in a broken ontology does not hang the build
+    cyclic = hierarchy_labels(["P", "Q", "R"], [("P", "Q"), ("Q", "P"), ("R", "P")])
+    assert cyclic.closure["R"]["P"] == 1 and set(cyclic.post) == {"P", "Q", "R"}
+
+
+def test_gzip_inputs_parse_like_plain_text(tmp_path):
+    plain = write_sample(tmp_path)
+    compressed = tmp_path / "sample.obo.gz"
+    compressed.write_bytes(gzip.compress(plain.read_bytes()))
+
+    expected = OBOParser(str(plain))
+    expected.parse()
+    parser = OBOParser(str(compressed))
+    parser.parse(workers=2)  # Falls back to serial for compressed input
+
+    assert parser.terms == expected.terms
+    assert parser.synonym_to_id == expected.synonym_to_id
+
+    clinvar = write_clinvar(tmp_path)
+    clinvar_gz = tmp_path / "clinvar_summary.txt.gz"
+    clinvar_gz.write_bytes(gzip.compress(clinvar.read_bytes()))
+
+    assert (list(ClinVarParser(str(clinvar_gz)).iter_rows())
+            == list(ClinVarParser(str(clinvar)).iter_rows()))
+
+
+def test_pipelined_build_matches_serial_build(tmp_path):
+    ontology_dir = tmp_path / "ontologies"
+    ontology_dir.mkdir()
+    (ontology_dir / "doid.obo").write_text(SAMPLE_OBO)
+    (ontology_dir / "hp.obo").write_text("[Term]\nid: HP:0001250\nname: Seizure\n"
+                                         "synonym: \"Seizures\" EXACT []\n")
+    write_clinvar(tmp_path).rename(ontology_dir / "clinvar_summary.txt")
+
+    def dump(db_path):
+        conn = sqlite3.connect(db_path)
+        tables = {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall())
+                  for table in ("terms", "synonyms", "xrefs", "alt_ids",
+                                "relationships", "variants", "variant_locations",
+                                "term_order", "term_intervals")}
+        tables["term_closure"] = sorted(conn.execute("""
+            SELECT d.term_id, a.term_id, c.depth
+            FROM term_closure c
+            JOIN term_order d ON d.post = c.descendant
+            JOIN term_order a ON a.post = c.ancestor
+        """).fetchall())
+        tables["term_search"] = sorted(conn.execute(
+            "SELECT term_id, ontology, coalesce(name, synonym) FROM term_search").fetchall())
+        tables["sources"] = sorted(conn.execute(
+            "SELECT source, version, sha256, row_count FROM sources").fetchall())
+        conn.close()
+        return tables
+
+    serial_db, pipelined_db = str(tmp_path / "serial.db"), str(tmp_path / "pipelined.db")
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir, db_path=serial_db)
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir,
+                          db_path=pipelined_db, jobs=2)
+
+    fast_db = str(tmp_path / "fast.db")
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir,
+                          db_path=fast_db, jobs=2, fast_build=True)
+
+    expected = dump(serial_db)
+    assert dump(pipelined_db) == expected
+    assert dump(fast_db) == expected
+    assert not Path(fast_db + ".building").exists()
+    assert len(expected["terms"]) == 5 and len(expected["variants"]) == 2
+    assert len(expected["variant_locations"]) == 2
+    assert len(expected["term_search"]) == 5 + len(expected["synonyms"])
+    assert ("DOID:3910", "DOID:14566", 3) in expected["term_closure"]
+
+    # An incremental pipelined rebuild of one changed file keeps the rest
+    (ontology_dir / "hp.obo").write_text("[Term]\nid: HP:0001250\nname: Seizure\n")
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir,
+                          db_path=pipelined_db, jobs=2, incremental=True)
+    rebuilt = dump(pipelined_db)
+    assert len(rebuilt["synonyms"]) == len(expected["synonyms"]) - 1
+    assert len(rebuilt["term_search"]) == len(expected["term_search"]) - 1
+    assert rebuilt["variants"] == expected["variants"]
+    assert rebuilt["term_closure"] == expected["term_closure"]
+
+
+@pytest.mark.parametrize("jobs,fast_build", [(1, False), (2, False), (1, True), (2, True)])
+def test_full_rebuild_drops_variants_missing_from_a_smaller_release(tmp_path, capsys,
+                                                                   jobs, fast_build):
+    ontology_dir = tmp_path / "ontologies"
+    ontology_dir.mkdir()
+    clinvar = write_clinvar(tmp_path).rename(ontology_dir / "clinvar_summary.txt")
+    db_path = str(tmp_path / "ontologies.db")
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir, db_path=db_path)
+
+    # The next release retracts BRAF V600E (VariationID 13961)
+    lines = clinvar.read_text().splitlines()
+    clinvar.write_text("\n".join(line for line in lines if "\t13961\t" not in line) + "\n")
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir, db_path=db_path,
+                          jobs=jobs, fast_build=fast_build)
+
+    def contents():
+        conn = sqlite3.connect(db_path)
+        found = (
+            conn.execute("SELECT variation_id FROM variants").fetchall(),
+            conn.execute("SELECT variation_id FROM variant_locations").fetchall(),
+            conn.execute("SELECT row_count FROM sources WHERE source = 'ClinVar'").fetchone(),
+            conn.execute("SELECT rowid FROM variant_names WHERE variant_names MATCH 'BRAF'")
+                .fetchall(),
+        )
+        conn.close()
+        return found
+
+    assert contents() == ([("16609",)], [("16609",)], (1,), [])
+
+    capsys.readouterr()
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir, db_path=db_path,
+                          incremental=True)
+    assert "ClinVar unchanged" in capsys.readouterr().out
+    assert contents() == ([("16609",)], [("16609",)], (1,), [])
+
+
+@pytest.mark.parametrize("fast_build", [False, True])
+def test_failed_pipelined_build_leaves_the_database_untouched(tmp_path, monkeypatch,
+                                                              fast_build):
+    ontology_dir = tmp_path / "ontologies"
+    ontology_dir.mkdir()
+    (ontology_dir / "doid.obo").write_text(SAMPLE_OBO)
+    write_clinvar(tmp_path).rename(ontology_dir / "clinvar_summary.txt")
+    db_path = tmp_path / "ontologies.db"
+    build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir,
+                          db_path=str(db_path), jobs=2)
+    before = db_path.read_bytes()
+
+    # A one-page cache makes the writer spill pages mid-build, as big builds do
+    connect = OntologyDatabaseBuilder.connect
+
+    def connect_with_small_cache(self):
+        connect(self)
+        self.conn.execute("PRAGMA cache_size = 1")
+
+    monkeypatch.setattr(OntologyDatabaseBuilder, "connect", connect_with_small_cache)
+
+    # DOID gets rewritten, then the ClinVar producer dies on a truncated .gz
+    (ontology_dir / "doid.obo").write_text(SAMPLE_OBO.replace("name: ", "name: renamed "))
+    clinvar = ontology_dir / "clinvar_summary.txt"
+    packed = gzip.compress(clinvar.read_bytes())
+    clinvar.unlink()
+    (ontology_dir / "clinvar_summary.txt.gz").write_bytes(packed[:len(packed) // 2])
+
+    with pytest.raises(RuntimeError, match="nothing was committed"):
+        build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir,
+                              db_path=str(db_path), jobs=2, fast_build=fast_build)
+
+    assert db_path.read_bytes() == before
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["ontologies", "ontologies.db"]
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT name FROM terms WHERE term_id = 'DOID:162'").fetchone() == ("cancer",)
+    assert conn.execute("SELECT count(*) FROM variants").fetchone() == (2,)
+    conn.close()
+
+
+def test_pipelined_build_fails_when_the_writer_cannot_connect(tmp_path, monkeypatch):
+    ontology_dir = tmp_path / "ontologies"
+    ontology_dir.mkdir()
+    (ontology_dir / "doid.obo").write_text(SAMPLE_OBO)
+    write_clinvar(tmp_path).rename(ontology_dir / "clinvar_summary.txt")
+    connect = OntologyDatabaseBuilder.connect
+
+    def connect_outside_writer(self):
+        if threading.current_thread().name == "sqlite-writer":
+            raise sqlite3.OperationalError("unable to open database file")
+        connect(self)
+
+    monkeypatch.setattr(OntologyDatabaseBuilder, "connect", connect_outside_writer)
+
+    with pytest.raises(RuntimeError, match="unable to open database file"):
+        build_local_databases(snapshot_dir=None, ontology_dir=ontology_dir,
+                              db_path=str(tmp_path / "ontologies.db"), jobs=2)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))